@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Out-of-Core Archive Processing
+Many navigation files as one lazy, chunked position dataset (dask/xarray)
+"""
+
+import argparse
+import functools
+import os
+import threading
+import time
+import tracemalloc
+
+import dask
+import dask.array as da
+import numpy as np
+import xarray as xr
+from find_eph import ephemeris_table
+from gps_time import gps_time_from_calendar
+from positions import position_cube
+from readrinex import read_nav_header, readrinex
+from satpos import PRECISIONS
+
+WEEK = 604800.0
+GPS_EPOCH = np.datetime64("1980-01-06T00:00:00", "ns")
+TABLE_CACHE = 4  # parsed days kept per process
+
+
+_table_locks = {}  # nav file -> lock held while that file is parsed
+_table_locks_guard = threading.Lock()
+
+
+@functools.lru_cache(maxsize=TABLE_CACHE)
+def _load_table(nav_file):
+    nav_data = readrinex(nav_file)
+    if nav_data is None:
+        raise ValueError(f"Failed to load RINEX file {nav_file}")
+    return ephemeris_table(nav_data)
+
+
+def _day_table(nav_file):
+    """
+    Ephemeris table of one file, parsed once when a block first needs it
+
+    Blocks of the same day wait for the parse instead of repeating it;
+    blocks of other days parse their own files meanwhile.
+    """
+    with _table_locks_guard:
+        lock = _table_locks.setdefault(nav_file, threading.Lock())
+    with lock:
+        return _load_table(nav_file)
+
+
+def archive_days(files):
+    """
+    Navigation files sorted by day, from their headers only
+
+    Parameters:
+    -----------
+    files : list of str
+        RINEX navigation files, one per day
+
+    Returns:
+    --------
+    files : list of str
+        The files in date order
+    day_start : numpy.ndarray
+        (days,) start of each day in GPS seconds since the GPS epoch
+    """
+    starts = {}
+    for nav_file in files:
+        date = read_nav_header(nav_file).date
+        if date is None:
+            raise ValueError(f"Could not extract date from {nav_file}")
+        week, sow = gps_time_from_calendar(*date)
+        start = week * WEEK + sow
+        if start in starts:
+            raise ValueError(f"{nav_file} and {starts[start]} cover the same day")
+        starts[start] = nav_file
+    order = sorted(starts)
+    return [starts[s] for s in order], np.array(order, dtype=np.float64)
+
+
+def _positions_block(t, files, day_start, prn, precision):
+    """Position cube of one block of epochs (all in one day)"""
+    day = np.searchsorted(day_start, t[0], side="right") - 1
+    week_start = np.floor(day_start[day] / WEEK) * WEEK
+    return position_cube(_day_table(files[day]), t - week_start, prn, precision)
+
+
+def open_archive(
+    files, interval=30, chunk_epochs=None, max_prn=32, precision="float64"
+):
+    """
+    Satellite positions of a multi-day archive as a lazy chunked Dataset
+
+    Only the headers are read here. Each dask block holds chunk_epochs
+    epochs of one day and parses that day's file when it is computed
+    (map_blocks), so memory follows the chunk size, not the archive size.
+
+    Parameters:
+    -----------
+    files : list of str
+        RINEX navigation files, one per day
+    interval : int
+        Seconds between epochs (must divide a day)
+    chunk_epochs : int, optional
+        Epochs per block (must divide the epochs of a day); one day by
+        default
+    max_prn : int
+        Highest GPS PRN
+    precision : str
+        Precision tier of satpos.satpos_batch
+
+    Returns:
+    --------
+    ds : xarray.Dataset
+        x, y, z (time, sv) in meters as dask arrays, NaN where a satellite
+        has no ephemeris; time is GPS time
+    """
+    if 86400 % interval:
+        raise ValueError(f"Interval {interval} s does not divide a day")
+    per_day = 86400 // interval
+    chunk_epochs = per_day if chunk_epochs is None else min(chunk_epochs, per_day)
+    if per_day % chunk_epochs:
+        raise ValueError(f"chunk_epochs {chunk_epochs} does not divide {per_day}")
+
+    files, day_start = archive_days(files)
+    seconds = (day_start[:, None] + np.arange(0, 86400, interval)).ravel()
+    prn = np.arange(1, max_prn + 1)
+    cube = da.map_blocks(
+        _positions_block,
+        da.from_array(seconds, chunks=chunk_epochs),
+        files=tuple(files),
+        day_start=day_start,
+        prn=prn,
+        precision=precision,
+        new_axis=[1, 2],
+        chunks=((chunk_epochs,) * (len(seconds) // chunk_epochs), (max_prn,), (3,)),
+        dtype=np.float64,
+    )
+    epochs = GPS_EPOCH + (seconds * 1e9).astype("timedelta64[ns]")
+    coords = {"time": epochs, "sv": [f"G{p:02d}" for p in prn]}
+    return xr.Dataset(
+        {
+            name: (("time", "sv"), cube[..., k], {"units": "m"})
+            for k, name in enumerate("xyz")
+        },
+        coords=coords,
+        attrs={
+            "interval": interval,
+            "precision": precision,
+            "files": ",".join(os.path.basename(f) for f in files),
+        },
+    )
+
+
+def write_archive(ds, path, scheduler="threads", workers=None):
+    """
+    Compute a lazy archive Dataset block by block into Zarr or NetCDF
+
+    Parameters:
+    -----------
+    ds : xarray.Dataset
+        From open_archive
+    path : str
+        Output store: a .zarr directory, otherwise a NetCDF file
+    scheduler : str
+        Local dask scheduler: 'threads', 'processes' or 'synchronous'
+    workers : int, optional
+        Scheduler workers (dask default when None)
+    """
+    with dask.config.set(scheduler=scheduler, num_workers=workers):
+        if path.endswith(".zarr"):
+            ds.to_zarr(path, mode="w")
+        else:
+            chunks = (ds.chunks["time"][0], ds.sizes["sv"])
+            encoding = {name: {"chunksizes": chunks, "zlib": True} for name in ds}
+            ds.to_netcdf(path, encoding=encoding)
+
+
+def open_positions(path):
+    """Lazily open a store written by write_archive (chunked as written)"""
+    if path.endswith(".zarr"):
+        return xr.open_zarr(path)
+    return xr.open_dataset(path, chunks={})
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Positions of a multi-day nav archive, computed out of core"
+    )
+    parser.add_argument(
+        "--files", type=str, nargs="+", required=True, help="Daily nav files"
+    )
+    parser.add_argument("--interval", type=int, default=30, help="Seconds per epoch")
+    parser.add_argument(
+        "--chunk_epochs", type=int, default=None, help="Epochs per block (one day)"
+    )
+    parser.add_argument("--max_prn", type=int, default=32, help="Highest GPS PRN")
+    parser.add_argument(
+        "--precision",
+        type=str,
+        default="float64",
+        choices=list(PRECISIONS),
+        help="Kepler solver precision tier",
+    )
+    parser.add_argument(
+        "--scheduler",
+        type=str,
+        default="threads",
+        choices=["threads", "processes", "synchronous"],
+        help="Local dask scheduler",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Scheduler workers")
+    parser.add_argument(
+        "--out",
+        type=str,
+        default="results/archive.zarr",
+        help="Output store (.zarr directory or NetCDF file)",
+    )
+    args = parser.parse_args()
+
+    ds = open_archive(
+        args.files, args.interval, args.chunk_epochs, args.max_prn, args.precision
+    )
+    blocks = len(ds.chunks["time"])
+    print(
+        f"{len(args.files)} files: {ds.sizes['time']} epochs x {ds.sizes['sv']} "
+        f"satellites in {blocks} blocks of {ds.chunks['time'][0]} epochs"
+    )
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    write_archive(ds, args.out, args.scheduler, args.workers)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    cells = ds.sizes["time"] * ds.sizes["sv"]
+    print(
+        f"{cells} positions in {elapsed:.2f} s ({cells / elapsed:.0f}/s), "
+        f"peak traced memory {peak / 1e6:.1f} MB"
+    )
+    print(f"✓ Saved: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
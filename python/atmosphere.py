@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+Atmospheric Delays
+Klobuchar ionosphere and Saastamoinen troposphere over (epoch, site, SV) arrays
+
+@author: Based on the IS-GPS-200 ionospheric model and Saastamoinen (1972)
+"""
+
+import argparse
+import itertools
+import os
+import time
+import tracemalloc
+
+import numpy as np
+from csvio import open_text
+from ecef_to_lla import lla_to_ecef
+from find_eph import ephemeris_table
+from geometry import enu_matrix
+from gnss import sv_code
+from gpsweekcal import gpsweekcal
+from positions import iter_position_chunks
+from readrinex import read_nav
+
+C = 299792458.0  # Speed of light (m/s)
+
+
+def klobuchar(lat, lon, elevation, azimuth, tow, alpha, beta):
+    """
+    GPS broadcast (Klobuchar) ionospheric delay on L1 (IS-GPS-200)
+
+    All inputs broadcast against each other.
+
+    Parameters:
+    -----------
+    lat, lon : float or array
+        Receiver geodetic latitude and longitude in degrees
+    elevation, azimuth : float or array
+        Satellite look angles in degrees
+    tow : float or array
+        GPS seconds of week
+    alpha, beta : array
+        (4,) ION ALPHA and ION BETA coefficients from the nav header
+
+    Returns:
+    --------
+    delay : numpy.ndarray
+        Slant delay in meters
+    """
+    el = np.asarray(elevation) / 180.0  # semicircles
+    az = np.radians(azimuth)
+
+    psi = 0.0137 / (el + 0.11) - 0.022  # Earth-centred angle
+    phi_i = np.clip(np.asarray(lat) / 180.0 + psi * np.cos(az), -0.416, 0.416)
+    lam_i = np.asarray(lon) / 180.0 + psi * np.sin(az) / np.cos(phi_i * np.pi)
+    phi_m = phi_i + 0.064 * np.cos((lam_i - 1.617) * np.pi)  # geomagnetic
+
+    t = np.mod(4.32e4 * lam_i + tow, 86400.0)  # local time at the pierce point
+    amp = np.maximum(np.polyval(np.asarray(alpha)[::-1], phi_m), 0.0)
+    per = np.maximum(np.polyval(np.asarray(beta)[::-1], phi_m), 72000.0)
+    x = 2.0 * np.pi * (t - 50400.0) / per
+    slant = 1.0 + 16.0 * (0.53 - el) ** 3
+
+    day = np.where(np.abs(x) < 1.57, amp * (1.0 - x**2 / 2.0 + x**4 / 24.0), 0.0)
+    return C * slant * (5e-9 + day)
+
+
+def saastamoinen(lat, height, elevation, humidity=0.7):
+    """
+    Saastamoinen tropospheric delay with a standard atmosphere
+
+    Pressure, temperature and water vapour follow the standard atmosphere
+    at the receiver height. All inputs broadcast against each other.
+
+    Parameters:
+    -----------
+    lat : float or array
+        Receiver geodetic latitude in degrees
+    height : float or array
+        Receiver ellipsoidal height in meters
+    elevation : float or array
+        Satellite elevation in degrees
+    humidity : float
+        Relative humidity (0-1)
+
+    Returns:
+    --------
+    delay : numpy.ndarray
+        Slant delay (hydrostatic + wet) in meters, 0 for heights outside
+        -100 m..10 km or satellites below the horizon
+    """
+    height = np.asarray(height, dtype=np.float64)
+    el = np.radians(elevation)
+    hgt = np.maximum(height, 0.0)
+
+    pressure = 1013.25 * (1.0 - 2.2557e-5 * hgt) ** 5.2568
+    temperature = 15.0 - 6.5e-3 * hgt + 273.16
+    vapour = (
+        6.108
+        * humidity
+        * np.exp((17.15 * temperature - 4684.0) / (temperature - 38.45))
+    )
+
+    sin_el = np.sin(el)
+    hydrostatic = (
+        0.0022768
+        * pressure
+        / (1.0 - 0.00266 * np.cos(2.0 * np.radians(lat)) - 0.00028 * hgt / 1e3)
+    )
+    wet = 0.002277 * (1255.0 / temperature + 0.05) * vapour
+    valid = (height >= -100.0) & (height <= 1e4) & (sin_el > 0)
+    return np.where(valid, (hydrostatic + wet) / np.where(valid, sin_el, 1.0), 0.0)
+
+
+def positions_from_rows(svpos):
+    """
+    Position cube from rinexnav output rows
+
+    Parameters:
+    -----------
+    svpos : numpy.ndarray
+        (rows, 5) [time, sv, X, Y, Z] as written to results/<name>.csv,
+        dense or sparse
+
+    Returns:
+    --------
+    tow : numpy.ndarray
+        (epochs,) times
+    sv : numpy.ndarray
+        (svs,) satellite numbers (GPS PRN or gnss.sv_code)
+    cube : numpy.ndarray
+        (epochs, svs, 3) positions in meters, NaN for missing rows
+    """
+    tow, it = np.unique(svpos[:, 0], return_inverse=True)
+    sv, isv = np.unique(svpos[:, 1], return_inverse=True)
+    cube = np.full((len(tow), len(sv), 3), np.nan)
+    cube[it, isv] = svpos[:, 2:5]
+    return tow, sv, cube
+
+
+def iter_position_table(table, tow, chunk_epochs=240):
+    """
+    Position cubes of every satellite of an ephemeris table, in blocks of
+    epochs
+
+    Parameters:
+    -----------
+    table : dict
+        Output of find_eph.ephemeris_table
+    tow : numpy.ndarray
+        (epochs,) GPS seconds of week
+    chunk_epochs : int
+        Epochs per block
+
+    Yields:
+    -------
+    tow, sv, cube
+        Block times, gnss.sv_code of the satellites and (block, svs, 3)
+        positions, as from positions_from_rows
+    """
+    sv = np.unique(table["sv"])
+    codes = sv_code(sv)
+    for t, cube in iter_position_chunks(table, tow, sv, chunk_epochs):
+        yield t, codes, cube
+
+
+def iter_position_csv(csv_file, chunk_rows=200000):
+    """
+    Stream a rinexnav position CSV as cubes of whole epochs
+
+    Parameters:
+    -----------
+    csv_file : str
+        results/<name>.csv rows of [time, sv, X, Y, Z] in time order (.gz
+        and .zst files are decompressed on the fly)
+    chunk_rows : int
+        Lines read per block
+
+    Yields:
+    -------
+    tow, sv, cube
+        As returned by positions_from_rows for each block
+    """
+    pending = np.empty((0, 5))
+    with open_text(csv_file) as f:
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if lines:
+                rows = np.vstack([pending, np.loadtxt(lines, delimiter=",", ndmin=2)])
+                # The last epoch may continue in the next block
+                last = rows[:, 0] == rows[-1, 0]
+                pending, rows = rows[last], rows[~last]
+            else:
+                rows, pending = pending, pending[:0]
+            if len(rows):
+                yield positions_from_rows(rows)
+            if not lines:
+                return
+
+
+def iter_delays(
+    chunks, sites, alpha, beta, elev_mask=10.0, max_memory_mb=256, timings=None
+):
+    """
+    Ionospheric and tropospheric delays for every (epoch, site, SV) triple
+
+    Satellite positions arrive in chunks; each chunk is split into blocks
+    of epochs sized so that the temporary arrays of a block stay under
+    max_memory_mb. Both models are evaluated only for triples above the
+    elevation mask.
+
+    Parameters:
+    -----------
+    chunks : iterable
+        (tow, sv, cube) tuples, e.g. from iter_position_csv, or
+        positions.iter_position_chunks output with sv added
+    sites : numpy.ndarray
+        (sites, 3) receiver latitude, longitude (degrees) and height (m)
+    alpha, beta : array
+        Klobuchar coefficients (NavHeader.ion_alpha / ion_beta)
+    elev_mask : float
+        Elevation mask in degrees
+    max_memory_mb : float
+        Budget for the temporary arrays of one block
+    timings : dict, optional
+        Accumulates seconds spent in 'geometry', 'iono' and 'tropo'
+
+    Yields:
+    -------
+    tow : numpy.ndarray
+        (block,) times
+    sv : numpy.ndarray
+        (svs,) satellite numbers
+    delays : dict
+        'elevation', 'azimuth', 'iono' and 'tropo', each (block, sites, svs)
+        with NaN below the mask or without a position
+    """
+    sites = np.atleast_2d(np.asarray(sites, dtype=np.float64))
+    lat, lon, hgt = sites[:, 0], sites[:, 1], sites[:, 2]
+    rx_xyz = np.column_stack(lla_to_ecef(lat, lon, hgt))
+    enu = enu_matrix(lat, lon)
+    if timings is None:
+        timings = {}
+    for key in ("geometry", "iono", "tropo"):
+        timings.setdefault(key, 0.0)
+
+    for tow, sv, cube in chunks:
+        # Rough bytes of temporaries per triple: diff, enu, angles, models
+        block = max(1, int(max_memory_mb * 1e6 // (len(sites) * len(sv) * 8 * 40)))
+        for e0 in range(0, len(tow), block):
+            t0 = time.perf_counter()
+            diff = cube[e0 : e0 + block, None, :, :] - rx_xyz[None, :, None, :]
+            local = np.einsum("cij,ecsj->ecsi", enu, diff)
+            horizontal = np.hypot(local[..., 0], local[..., 1])
+            elevation = np.degrees(np.arctan2(local[..., 2], horizontal))
+            azimuth = np.mod(np.degrees(np.arctan2(local[..., 0], local[..., 1])), 360)
+            visible = elevation >= elev_mask  # False for NaN positions
+            e, c, s = np.nonzero(visible)
+            el, az = elevation[visible], azimuth[visible]
+            t1 = time.perf_counter()
+
+            iono = np.full(visible.shape, np.nan)
+            iono[visible] = klobuchar(lat[c], lon[c], el, az, tow[e0 + e], alpha, beta)
+            t2 = time.perf_counter()
+            tropo = np.full(visible.shape, np.nan)
+            tropo[visible] = saastamoinen(lat[c], hgt[c], el)
+            t3 = time.perf_counter()
+
+            timings["geometry"] += t1 - t0
+            timings["iono"] += t2 - t1
+            timings["tropo"] += t3 - t2
+            elevation[~visible] = np.nan
+            azimuth[~visible] = np.nan
+            yield tow[e0 : e0 + block], sv, {
+                "elevation": elevation,
+                "azimuth": azimuth,
+                "iono": iono,
+                "tropo": tropo,
+            }
+
+
+def grid_sites(step, alt=0.0):
+    """(sites, 3) latitude, longitude and height of a global grid"""
+    lats = np.arange(-90.0 + step / 2, 90.0, step)
+    lons = np.arange(-180.0, 180.0, step)
+    lat, lon = np.meshgrid(lats, lons, indexing="ij")
+    return np.column_stack([lat.ravel(), lon.ravel(), np.full(lat.size, alt)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Klobuchar and Saastamoinen delays for many sites and satellites"
+    )
+    parser.add_argument(
+        "--file",
+        type=str,
+        default="data/brdc0680.20n",
+        help="RINEX navigation file (ION ALPHA/BETA header)",
+    )
+    parser.add_argument(
+        "--csv",
+        type=str,
+        default=None,
+        help="Position CSV written by rinexnav.py (default: compute from --file)",
+    )
+    parser.add_argument(
+        "--interval", type=int, default=30, help="Seconds per epoch without --csv"
+    )
+    parser.add_argument(
+        "--sites",
+        type=str,
+        default=None,
+        help="Text file of lat,lon,height lines (default: global grid)",
+    )
+    parser.add_argument("--step", type=float, default=10.0, help="Grid step (degrees)")
+    parser.add_argument("--alt", type=float, default=0.0, help="Grid height (m)")
+    parser.add_argument(
+        "--elev_mask", type=float, default=10.0, help="Elevation mask in degrees"
+    )
+    parser.add_argument(
+        "--chunk_epochs", type=int, default=240, help="Epochs per position chunk"
+    )
+    parser.add_argument(
+        "--chunk_rows", type=int, default=200000, help="CSV lines per read"
+    )
+    parser.add_argument(
+        "--max_memory", type=float, default=256, help="Block memory budget in MB"
+    )
+    parser.add_argument(
+        "--out", action="store_true", help="Write the delays of visible triples (CSV)"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        header, nav_data = read_nav(args.file)
+    except Exception as e:
+        print(f"Failed to read {args.file}: {e}")
+        return 1
+    if header.ion_alpha is None or header.ion_beta is None:
+        print(f"{args.file} has no ION ALPHA/ION BETA header lines")
+        return 1
+
+    if args.sites is not None:
+        sites = np.loadtxt(args.sites, delimiter=",", ndmin=2)
+    else:
+        sites = grid_sites(args.step, args.alt)
+
+    if args.csv is not None:
+        chunks = iter_position_csv(args.csv, args.chunk_rows)
+    else:
+        table = ephemeris_table(nav_data)
+        tow = gpsweekcal(header.date, args.interval)[:, 1].astype(float)
+        chunks = iter_position_table(table, tow, args.chunk_epochs)
+
+    os.makedirs("results", exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.csv or args.file))[0]
+    out_filename = f"results/{name}_atmosphere.csv"
+    out = open(out_filename, "w") if args.out else None
+
+    timings = {}
+    triples = visible = 0
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        for tow, codes, delays in iter_delays(
+            chunks,
+            sites,
+            header.ion_alpha,
+            header.ion_beta,
+            args.elev_mask,
+            args.max_memory,
+            timings,
+        ):
+            ok = np.isfinite(delays["iono"])
+            triples += ok.size
+            visible += int(ok.sum())
+            if out is not None:
+                e, c, s = np.nonzero(ok)
+                rows = np.column_stack(
+                    [tow[e], sites[c, 0], sites[c, 1], codes[s]]
+                    + [delays[k][ok] for k in ("elevation", "azimuth", "iono", "tropo")]
+                )
+                np.savetxt(out, rows, delimiter=",", fmt="%.4f")
+    finally:
+        if out is not None:
+            out.close()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{triples} (epoch, site, SV) triples, {visible} above {args.elev_mask:g} deg"
+    )
+    for key, label, count in [
+        ("geometry", "Look angles", triples),
+        ("iono", "Klobuchar", visible),
+        ("tropo", "Saastamoinen", visible),
+    ]:
+        rate = count / timings[key] if timings[key] > 0 else float("inf")
+        print(f"{label:<14}{timings[key]:>8.2f} s{rate:>14.0f} triples/s")
+    print(
+        f"Total {elapsed:.2f} s including positions ({triples / elapsed:.0f} "
+        f"triples/s), peak memory {peak / 1e6:.1f} MB"
+    )
+    if out is not None:
+        print(f"✓ Saved: {out_filename}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
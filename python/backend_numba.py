@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+numba Backend
+JIT-compiled, multi-threaded loops for the orbit kernels
+"""
+
+import math
+
+import numba  # ImportError leaves this backend unregistered
+import numpy as np
+from backends import register
+from satpos import GM, ORBIT_KEYS, omegae_dot
+
+TWO_PI = 2 * math.pi
+
+# The workqueue and TBB layers leave the interpreter hanging at exit when
+# the first parallel launch comes from a worker thread (pipeline compute
+# stage), so the OpenMP layer is required. Where numba has no OpenMP, the
+# first launch raises and dispatch falls back to NumPy with a warning.
+numba.config.THREADING_LAYER = "omp"
+
+
+def _flat(a, shape):
+    """Contiguous 1-D float64 copy of a broadcast to shape"""
+    a = np.broadcast_to(np.asarray(a, dtype=np.float64), shape)
+    return np.ascontiguousarray(a).ravel()
+
+
+@numba.njit(parallel=True, cache=True)
+def _satpos_loop(
+    t,
+    M0,
+    sqrtA,
+    DeltaN,
+    e,
+    omega,
+    Cuc,
+    Cus,
+    Crc,
+    Crs,
+    Io,
+    IDOT,
+    Cic,
+    Cis,
+    Omega0,
+    OmegaDot,
+    Toe,
+    out,
+):
+    for k in numba.prange(t.size):
+        tk = t[k] - Toe[k]
+        if tk > 302400.0:
+            tk -= 604800.0
+        elif tk < -302400.0:
+            tk += 604800.0
+        A = sqrtA[k] * sqrtA[k]
+        M = (M0[k] + (math.sqrt(GM / A**3) + DeltaN[k]) * tk + TWO_PI) % TWO_PI
+
+        ek = e[k]
+        E = M + ek * math.sin(M) * (1 + ek * math.cos(M))
+        for _ in range(20):
+            step = (E - ek * math.sin(E) - M) / (1 - ek * math.cos(E))
+            E -= step
+            if not ek / (1 - ek) * step * step > 1e-12:
+                break
+        E = (E + TWO_PI) % TWO_PI
+
+        v = math.atan2(math.sqrt(1 - ek * ek) * math.sin(E), math.cos(E) - ek)
+        phi = (v + omega[k]) % TWO_PI
+        c2 = math.cos(2 * phi)
+        s2 = math.sin(2 * phi)
+        u = phi + Cuc[k] * c2 + Cus[k] * s2
+        r = A * (1 - ek * math.cos(E)) + Crc[k] * c2 + Crs[k] * s2
+        i = Io[k] + IDOT[k] * tk + Cic[k] * c2 + Cis[k] * s2
+        Om = Omega0[k] + (OmegaDot[k] - omegae_dot) * tk - omegae_dot * Toe[k]
+        Om = (Om + TWO_PI) % TWO_PI
+
+        x1 = math.cos(u) * r
+        y1 = math.sin(u) * r
+        out[k, 0] = x1 * math.cos(Om) - y1 * math.cos(i) * math.sin(Om)
+        out[k, 1] = x1 * math.sin(Om) + y1 * math.cos(i) * math.cos(Om)
+        out[k, 2] = y1 * math.sin(i)
+
+
+@register("satpos", "numba")
+def satpos_numba(t, eph):
+    """satpos_batch (float64 tier) as a compiled parallel loop"""
+    arrays = [t] + [eph[k] for k in ORBIT_KEYS]
+    shape = np.broadcast_shapes(*(np.shape(a) for a in arrays))
+    flat = [_flat(a, shape) for a in arrays]
+    out = np.empty((flat[0].size, 3))
+    _satpos_loop(*flat, out)
+    return out.reshape(shape + (3,))
+
+
+@numba.njit(parallel=True, cache=True)
+def _ecef_to_lla_loop(x, y, z, lat, lon, alt):
+    a = 6378137.0
+    esq = 8.1819190842622e-2**2
+    b = math.sqrt(a * a * (1 - esq))
+    ep2 = (a * a - b * b) / (b * b)
+    for k in numba.prange(x.size):
+        p = math.sqrt(x[k] * x[k] + y[k] * y[k])
+        th = math.atan2(a * z[k], b * p)
+        la = math.atan2(
+            z[k] + ep2 * b * math.sin(th) ** 3, p - esq * a * math.cos(th) ** 3
+        )
+        alt[k] = p / math.cos(la) - a / math.sqrt(1 - esq * math.sin(la) ** 2)
+        lat[k] = math.degrees(la)
+        lon[k] = math.degrees(math.atan2(y[k], x[k]))
+
+
+@register("ecef_to_lla", "numba")
+def ecef_to_lla_numba(x, y, z):
+    """ecef_to_lla as a compiled parallel loop"""
+    shape = np.broadcast_shapes(np.shape(x), np.shape(y), np.shape(z))
+    flat = [_flat(a, shape) for a in (x, y, z)]
+    lat, lon, alt = (np.empty(flat[0].size) for _ in range(3))
+    _ecef_to_lla_loop(*flat, lat, lon, alt)
+    return lat.reshape(shape), lon.reshape(shape), alt.reshape(shape)
+
+
+@numba.njit(parallel=True, cache=True)
+def _gps_time_loop(jd, week, sow):
+    for k in numba.prange(jd.size):
+        b = math.floor(jd[k] + 0.5) + 1537
+        e = math.floor(365.25 * math.floor((b - 122.1) / 365.25))
+        d = b - e - math.floor(30.6001 * math.floor((b - e) / 30.6001))
+        d += (jd[k] + 0.5) % 1
+        week[k] = math.floor((jd[k] - 2444244.5) / 7)
+        s = (d % 1 + (math.floor(jd[k] + 0.5) % 7 + 1) % 7) * 86400
+        sow[k] = s - 604800.0 if s >= 604800.0 else s
+
+
+@register("gps_time", "numba")
+def gps_time_numba(julday):
+    """gps_time as a compiled parallel loop"""
+    jd = np.asarray(julday, dtype=np.float64)
+    flat = np.ascontiguousarray(jd).ravel()
+    week = np.empty(flat.size)
+    sow = np.empty(flat.size)
+    _gps_time_loop(flat, week, sow)
+    return week.reshape(jd.shape), sow.reshape(jd.shape)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+numexpr Backend
+Multi-threaded elementwise versions of the orbit kernels
+"""
+
+import numexpr as ne  # ImportError leaves this backend unregistered
+import numpy as np
+from backends import register
+from satpos import GM, ORBIT_KEYS, omegae_dot
+
+
+@register("satpos", "numexpr")
+def satpos_numexpr(t, eph):
+    """satpos_batch (float64 tier) evaluated with numexpr"""
+    v = {k: np.asarray(eph[k]) for k in ORBIT_KEYS}
+    v.update(t=np.asarray(t, dtype=np.float64), GM=GM, we=omegae_dot, pi2=2 * np.pi)
+    v["e"] = v.pop("Eccentricity")
+
+    tk = ne.evaluate("t - Toe", v)
+    v["tk"] = ne.evaluate(
+        "where(tk > 302400, tk - 604800, where(tk < -302400, tk + 604800, tk))",
+        {"tk": tk},
+    )
+    v["M"] = ne.evaluate(
+        "(M0 + (sqrt(GM / (sqrtA * sqrtA) ** 3) + DeltaN) * tk + pi2) % pi2", v
+    )
+
+    # Newton steps on all elements until the largest remaining error is small
+    v["E"] = ne.evaluate("M + e * sin(M) * (1 + e * cos(M))", v)
+    for _ in range(20):
+        v["step"] = ne.evaluate("(E - e * sin(E) - M) / (1 - e * cos(E))", v)
+        v["E"] = ne.evaluate("E - step", v)
+        if not ne.evaluate("e / (1 - e) * step * step > 1e-12", v).any():
+            break
+
+    v["E"] = ne.evaluate("(E + pi2) % pi2", v)
+    v["phi"] = ne.evaluate(
+        "(arctan2(sqrt(1 - e * e) * sin(E), cos(E) - e) + omega) % pi2", v
+    )
+    v["u"] = ne.evaluate("phi + Cuc * cos(2 * phi) + Cus * sin(2 * phi)", v)
+    v["r"] = ne.evaluate(
+        "sqrtA * sqrtA * (1 - e * cos(E)) + Crc * cos(2 * phi) + Crs * sin(2 * phi)", v
+    )
+    v["i"] = ne.evaluate("Io + IDOT * tk + Cic * cos(2 * phi) + Cis * sin(2 * phi)", v)
+    v["Om"] = ne.evaluate("(Omega0 + (OmegaDot - we) * tk - we * Toe + pi2) % pi2", v)
+
+    x = ne.evaluate("cos(u) * r * cos(Om) - sin(u) * r * cos(i) * sin(Om)", v)
+    satp = np.empty(x.shape + (3,))
+    satp[..., 0] = x
+    satp[..., 1] = ne.evaluate(
+        "cos(u) * r * sin(Om) + sin(u) * r * cos(i) * cos(Om)", v
+    )
+    satp[..., 2] = ne.evaluate("sin(u) * r * sin(i)", v)
+    return satp
+
+
+@register("ecef_to_lla", "numexpr")
+def ecef_to_lla_numexpr(x, y, z):
+    """ecef_to_lla evaluated with numexpr"""
+    a = 6378137.0
+    esq = 8.1819190842622e-2**2
+    b = np.sqrt(a**2 * (1 - esq))
+    v = {
+        "x": np.asarray(x),
+        "y": np.asarray(y),
+        "z": np.asarray(z),
+        "a": a,
+        "b": b,
+        "esq": esq,
+        "ep2": (a**2 - b**2) / b**2,
+        "deg": 180.0 / np.pi,
+    }
+    v["p"] = ne.evaluate("sqrt(x * x + y * y)", v)
+    v["th"] = ne.evaluate("arctan2(a * z, b * p)", v)
+    v["lat"] = ne.evaluate(
+        "arctan2(z + ep2 * b * sin(th) ** 3, p - esq * a * cos(th) ** 3)", v
+    )
+    alt = ne.evaluate("p / cos(lat) - a / sqrt(1 - esq * sin(lat) ** 2)", v)
+    return ne.evaluate("lat * deg", v), ne.evaluate("arctan2(y, x) * deg", v), alt
+
+
+@register("gps_time", "numexpr")
+def gps_time_numexpr(julday):
+    """gps_time evaluated with numexpr"""
+    v = {"jd": np.asarray(julday, dtype=np.float64)}
+    v["b"] = ne.evaluate("floor(jd + 0.5) + 1537", v)
+    v["e"] = ne.evaluate("floor(365.25 * floor((b - 122.1) / 365.25))", v)
+    v["d"] = ne.evaluate(
+        "b - e - floor(30.6001 * floor((b - e) / 30.6001)) + (jd + 0.5) % 1", v
+    )
+    week = ne.evaluate("floor((jd - 2444244.5) / 7)", v)
+    sow = ne.evaluate("(d % 1 + (floor(jd + 0.5) % 7 + 1) % 7) * 86400", v)
+    return week, ne.evaluate(
+        "where(sow >= 604800.0, sow - 604800.0, sow)", {"sow": sow}
+    )
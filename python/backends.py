@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Compute Backends
+Registry of orbit kernel implementations (NumPy, numexpr, numba) with fallback
+"""
+
+import argparse
+import importlib
+import json
+import os
+import time
+import warnings
+
+import numpy as np
+
+BACKENDS = ("numba", "numexpr", "numpy")  # Automatic preference order
+OPTIONAL_MODULES = ("backend_numexpr", "backend_numba")
+MIN_SIZE = 4096  # Smaller inputs always use NumPy (dispatch overhead dominates)
+SELECTION_FILE = os.environ.get(
+    "RINEXPOS_BACKENDS", os.path.join("results", "backends.json")
+)
+
+_registry = {}  # kernel -> {backend: function}
+_selected = {}  # kernel -> backend chosen for this process
+_forced = {"*": os.environ.get("RINEXPOS_BACKEND")}
+_optional_loaded = False
+
+
+def register(kernel, backend):
+    """Decorator adding a function as the implementation of kernel on backend"""
+
+    def decorator(fn):
+        _registry.setdefault(kernel, {})[backend] = fn
+        return fn
+
+    return decorator
+
+
+def _load_optional():
+    """Import the optional backend modules once; missing packages are skipped"""
+    global _optional_loaded
+    if _optional_loaded:
+        return
+    _optional_loaded = True
+    for module in OPTIONAL_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass  # package not installed
+        except Exception as e:
+            warnings.warn(f"Skipping {module}: {e}", stacklevel=2)
+
+
+def available(kernel):
+    """Backends implementing kernel on this machine, in preference order"""
+    _load_optional()
+    return [b for b in BACKENDS if b in _registry.get(kernel, {})]
+
+
+def set_backend(backend, kernel="*"):
+    """
+    Force a backend for one kernel or for all of them
+
+    Parameters:
+    -----------
+    backend : str or None
+        'numpy', 'numexpr', 'numba', or None to return to automatic selection
+    kernel : str
+        Kernel name, or '*' for every kernel
+    """
+    _forced[kernel] = backend
+    if kernel == "*":
+        _selected.clear()
+    else:
+        _selected.pop(kernel, None)
+
+
+def _saved_choice(kernel):
+    """Fastest backend recorded by 'backends.py --save', if any"""
+    if not os.path.exists(SELECTION_FILE):
+        return None
+    with open(SELECTION_FILE) as f:
+        return json.load(f).get(kernel)
+
+
+def select(kernel):
+    """
+    Backend used for kernel
+
+    Order: a forced backend (set_backend or the RINEXPOS_BACKEND environment
+    variable), then the benchmark result saved in SELECTION_FILE, then the
+    first available of BACKENDS. A requested backend that is not installed
+    falls back to the automatic choice with a warning.
+    """
+    if kernel in _selected:
+        return _selected[kernel]
+    choices = available(kernel)
+    wanted = _forced.get(kernel) or _forced["*"] or _saved_choice(kernel)
+    if wanted is not None and wanted not in choices:
+        warnings.warn(
+            f"Backend '{wanted}' is not available for {kernel}; using {choices[0]}",
+            stacklevel=2,
+        )
+        wanted = None
+    _selected[kernel] = wanted or choices[0]
+    return _selected[kernel]
+
+
+def dispatch(kernel, *args, size=None, **kwargs):
+    """
+    Call the selected implementation of kernel
+
+    Parameters:
+    -----------
+    kernel : str
+        Registered kernel name
+    *args, **kwargs
+        Arguments of the kernel
+    size : int, optional
+        Number of elements; inputs below MIN_SIZE use NumPy directly
+
+    Returns:
+    --------
+    Whatever the kernel returns. If an optional backend raises, the NumPy
+    implementation is used instead from then on, with a warning.
+    """
+    impls = _registry[kernel]
+    if size is not None and size < MIN_SIZE:
+        return impls["numpy"](*args, **kwargs)
+    backend = select(kernel)
+    if backend == "numpy":
+        return impls["numpy"](*args, **kwargs)
+    try:
+        return impls[backend](*args, **kwargs)
+    except Exception as e:
+        warnings.warn(
+            f"{backend} backend failed for {kernel} ({e}); falling back to numpy",
+            stacklevel=2,
+        )
+        _selected[kernel] = "numpy"
+        return impls["numpy"](*args, **kwargs)
+
+
+def _benchmark_inputs(nav_file, size):
+    """Arguments for each kernel, built from real ephemerides"""
+    from find_eph import ephemeris_table, find_eph_batch, gather_eph
+    from julday import julday
+    from positions import nav_day
+    from readrinex import readrinex
+    from satpos import satpos_batch
+
+    nav_data = readrinex(nav_file)
+    table = ephemeris_table(nav_data)
+    date = nav_day(nav_data)
+    sv = np.unique(table["sv"])
+    epochs = max(1, size // len(sv))
+    tow = np.linspace(0.0, 86399.0, epochs)
+    index = find_eph_batch(table, sv[None, :], tow[:, None])
+    eph = {k: v for k, v in gather_eph(table, index).items() if v.dtype.kind == "f"}
+    xyz = satpos_batch(tow[:, None], eph)
+    xyz = xyz[np.isfinite(xyz).all(axis=-1)]
+    hours = np.linspace(0.0, 24.0, size, endpoint=False)
+    return {
+        "satpos": (tow[:, None], eph),
+        "ecef_to_lla": (xyz[:, 0], xyz[:, 1], xyz[:, 2]),
+        "gps_time": (julday(*date, hours),),
+    }
+
+
+def _max_difference(result, reference):
+    result = result if isinstance(result, tuple) else (result,)
+    reference = reference if isinstance(reference, tuple) else (reference,)
+    return max(
+        float(np.nanmax(np.abs(np.asarray(a) - np.asarray(b))))
+        for a, b in zip(result, reference, strict=True)
+    )
+
+
+def benchmark(nav_file="data/brdc0680.20n", size=1_000_000, repeat=3):
+    """
+    Time every available backend of every kernel
+
+    Parameters:
+    -----------
+    nav_file : str
+        RINEX navigation file used to build realistic inputs
+    size : int
+        Approximate number of elements per call
+    repeat : int
+        Timing runs per backend (the best is kept; a warm-up call, which
+        includes JIT compilation, is not timed)
+
+    Returns:
+    --------
+    results : list of dict
+        'kernel', 'backend', 'seconds', 'elements_per_s' and 'max_diff'
+        (largest absolute difference from the NumPy result)
+    """
+    import ecef_to_lla  # noqa: F401  (registers the NumPy kernels)
+    import gps_time  # noqa: F401
+    import satpos  # noqa: F401
+
+    inputs = _benchmark_inputs(nav_file, size)
+    results = []
+    for kernel, args in inputs.items():
+        reference = _registry[kernel]["numpy"](*args)
+        if kernel == "satpos":
+            elements = np.broadcast(args[0], args[1]["M0"]).size
+        else:
+            elements = np.size(args[0])
+        for backend in available(kernel):
+            fn = _registry[kernel][backend]
+            try:
+                result = fn(*args)
+            except Exception as e:
+                print(f"{kernel}/{backend} failed: {e}")
+                continue
+            best = np.inf
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                fn(*args)
+                best = min(best, time.perf_counter() - t0)
+            results.append(
+                {
+                    "kernel": kernel,
+                    "backend": backend,
+                    "seconds": best,
+                    "elements_per_s": elements / best,
+                    "max_diff": _max_difference(result, reference),
+                }
+            )
+    return results
+
+
+def fastest(results):
+    """Fastest backend per kernel from benchmark() results"""
+    best = {}
+    for r in results:
+        if r["kernel"] not in best or r["seconds"] < best[r["kernel"]]["seconds"]:
+            best[r["kernel"]] = r
+    return {kernel: r["backend"] for kernel, r in best.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the compute backends of the orbit kernels"
+    )
+    parser.add_argument(
+        "--file", type=str, default="data/brdc0680.20n", help="RINEX navigation file"
+    )
+    parser.add_argument(
+        "--size", type=int, default=1_000_000, help="Elements per kernel call"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs")
+    parser.add_argument(
+        "--save",
+        action="store_true",
+        help=f"Store the fastest backends in {SELECTION_FILE} for automatic use",
+    )
+    args = parser.parse_args()
+
+    results = benchmark(args.file, args.size, args.repeat)
+    print(
+        f"{'Kernel':<14}{'Backend':<10}{'Time s':>9}{'Elements/s':>14}{'Max diff':>11}"
+    )
+    for r in results:
+        print(
+            f"{r['kernel']:<14}{r['backend']:<10}{r['seconds']:>9.4f}"
+            f"{r['elements_per_s']:>14.0f}{r['max_diff']:>11.1e}"
+        )
+    best = fastest(results)
+    for kernel, backend in best.items():
+        print(f"Fastest {kernel}: {backend}")
+    if args.save:
+        os.makedirs(os.path.dirname(SELECTION_FILE) or ".", exist_ok=True)
+        with open(SELECTION_FILE, "w") as f:
+            json.dump(best, f, indent=1)
+        print(f"✓ Saved: {SELECTION_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    import backends  # the module the kernels register with, not __main__
+
+    exit(backends.main())
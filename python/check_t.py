@@ -6,6 +6,8 @@ Based on MATLAB check_t.m
 @author: Based on Kai Borre's MATLAB implementation
 """
 
+import numpy as np
+
 
 def check_t(t):
     """
@@ -23,6 +25,9 @@ def check_t(t):
         Corrected GPS time
     """
     half_week = 302400
+    if np.ndim(t):
+        tt = np.where(t > half_week, t - 2 * half_week, t)
+        return np.where(t < -half_week, t + 2 * half_week, tt)
     tt = t
     if t > half_week:
         tt = t - 2 * half_week
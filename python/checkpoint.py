@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+Checkpointed Reprocessing
+Resumable multi-file rinexnav runs with a journal of completed chunks
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+from csvio import LLA_HEADER, write_ecef, write_lla
+from gpsweekcal import gpsweekcal
+from readrinex import read_nav_header, readrinex
+from resultcache import file_hash
+from rinexnav import compute_svpos
+
+JOURNAL_NAME = "journal.jsonl"
+RUN_NAME = "run.json"
+
+
+def _atomic_save(path, array):
+    """Write an .npy file under a temporary name, then rename it into place"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def file_date(nav_file):
+    """
+    [year, month, day] most records of a navigation file fall on
+
+    Only the record epoch lines are read; the records themselves are parsed
+    later, if a chunk needs them.
+    """
+    date = read_nav_header(nav_file).date
+    if date is None:
+        raise ValueError(f"Could not extract date from {nav_file}")
+    return date
+
+
+class Journal:
+    """
+    Append-only record of completed work units
+
+    Each line is a JSON object for one finished (file, time-chunk) unit with
+    its part file, row count and SHA-256. Units are keyed by the SHA-256 of
+    the navigation file, so a file replaced under the same name is not
+    mistaken for finished work. A line cut short by a crash is ignored when
+    the journal is read back.
+    """
+
+    def __init__(self, run_dir):
+        self.path = os.path.join(run_dir, JOURNAL_NAME)
+        self.units = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.units[entry["unit"]] = entry
+
+    def record(self, entry):
+        """Durably append a completed unit"""
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.units[entry["unit"]] = entry
+
+
+def check_part(run_dir, entry):
+    """
+    Integrity problem of a journaled part file
+
+    Returns:
+    --------
+    problem : str or None
+        Description of the problem, or None if the part is intact
+    """
+    path = os.path.join(run_dir, entry["part"])
+    if not os.path.exists(path):
+        return "missing part file"
+    if file_hash(path) != entry["sha256"]:
+        return "checksum mismatch"
+    try:
+        part = np.load(path)
+    except ValueError as e:
+        return f"unreadable part: {e}"
+    if part.shape != (entry["rows"], 5):
+        return f"shape {part.shape} != ({entry['rows']}, 5)"
+    return None
+
+
+def verify_run(run_dir):
+    """
+    Check every journaled part of a run
+
+    Returns:
+    --------
+    problems : dict
+        unit -> problem description for each damaged part
+    """
+    journal = Journal(run_dir)
+    problems = {}
+    for unit, entry in journal.units.items():
+        problem = check_part(run_dir, entry)
+        if problem is not None:
+            problems[unit] = problem
+    return problems
+
+
+def run_checkpointed(
+    nav_files,
+    interval=15,
+    run_dir="results/run",
+    out_dir="results",
+    chunk_epochs=240,
+    max_prn=32,
+    compute=compute_svpos,
+):
+    """
+    Process navigation files in time chunks, resuming a previous run
+
+    Every chunk of epochs is a unit: its positions are saved atomically as a
+    part file and then recorded in the journal. Units with an intact part
+    are skipped on rerun, so a crashed job only redoes unfinished chunks.
+    Once all units of a file are done, its parts are merged into the usual
+    results/<name>.csv and results/<name>_latlonalt.csv.
+
+    Parameters:
+    -----------
+    nav_files : list
+        RINEX navigation files (one day each)
+    interval : int
+        Seconds per epoch
+    run_dir : str
+        Directory holding the journal and part files
+    out_dir : str
+        Directory for the merged CSVs
+    chunk_epochs : int
+        Epochs per unit
+    max_prn : int
+        Highest GPS PRN to compute
+    compute : callable
+        compute(nav_data, mytime_chunk, max_prn) -> svpos rows
+
+    Returns:
+    --------
+    summary : dict
+        'computed' and 'skipped' unit counts and the 'merged' CSV paths
+    """
+    os.makedirs(os.path.join(run_dir, "parts"), exist_ok=True)
+    os.makedirs(out_dir, exist_ok=True)
+
+    params = {"interval": interval, "chunk_epochs": chunk_epochs, "max_prn": max_prn}
+    run_path = os.path.join(run_dir, RUN_NAME)
+    if os.path.exists(run_path):
+        with open(run_path) as f:
+            previous = json.load(f)
+        if previous != params:
+            raise ValueError(
+                f"Run directory {run_dir} was started with {previous}, not {params}"
+            )
+    else:
+        with open(run_path, "w") as f:
+            json.dump(params, f)
+
+    journal = Journal(run_dir)
+    summary = {"computed": 0, "skipped": 0, "merged": []}
+
+    for nav_file in nav_files:
+        name = os.path.splitext(os.path.basename(nav_file))[0]
+        date = file_date(nav_file)
+        digest = file_hash(nav_file)
+        mytime = gpsweekcal(date, interval)
+        units = []
+        for start in range(0, len(mytime), chunk_epochs):
+            stop = min(len(mytime), start + chunk_epochs)
+            units.append((f"{digest}:{start}:{stop}", start, stop))
+
+        nav_data = None
+        for unit, start, stop in units:
+            entry = journal.units.get(unit)
+            if entry is not None and check_part(run_dir, entry) is None:
+                summary["skipped"] += 1
+                continue
+
+            if nav_data is None:
+                nav_data = readrinex(nav_file)
+                if nav_data is None:
+                    raise ValueError(f"Failed to load RINEX file {nav_file}")
+            svpos = compute(nav_data, mytime[start:stop], max_prn)
+            part = os.path.join("parts", f"{name}_{digest[:12]}_{start:06d}.npy")
+            _atomic_save(os.path.join(run_dir, part), svpos)
+            journal.record(
+                {
+                    "unit": unit,
+                    "file": os.path.abspath(nav_file),
+                    "nav_sha256": digest,
+                    "part": part,
+                    "rows": len(svpos),
+                    "sha256": file_hash(os.path.join(run_dir, part)),
+                }
+            )
+            summary["computed"] += 1
+
+        csv_filename = os.path.join(out_dir, f"{name}.csv")
+        lla_filename = os.path.join(out_dir, f"{name}_latlonalt.csv")
+        merge_parts(
+            run_dir,
+            [journal.units[unit] for unit, _, _ in units],
+            date,
+            csv_filename,
+            lla_filename,
+        )
+        summary["merged"] += [csv_filename, lla_filename]
+    return summary
+
+
+def merge_parts(run_dir, entries, date, csv_filename, lla_filename):
+    """Concatenate part files into the ECEF and lat/lon/alt CSVs atomically"""
+    year, month, day = date
+    with (
+        open(f"{csv_filename}.tmp", "w") as csv_file,
+        open(f"{lla_filename}.tmp", "w") as lla_file,
+    ):
+        lla_file.write(LLA_HEADER)
+        for entry in entries:
+            svpos = np.load(os.path.join(run_dir, entry["part"]))
+            write_ecef(csv_file, svpos)
+            write_lla(lla_file, svpos, year, month, day)
+    os.replace(f"{csv_filename}.tmp", csv_filename)
+    os.replace(f"{lla_filename}.tmp", lla_filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Resumable satellite position runs over many navigation files"
+    )
+    parser.add_argument(
+        "--file",
+        type=str,
+        nargs="+",
+        default=["data/brdc0680.20n"],
+        help="One or more RINEX navigation files",
+    )
+    parser.add_argument("--interval", type=int, default=15, help="Seconds per epoch")
+    parser.add_argument(
+        "--run_dir", type=str, default="results/run", help="Journal and part files"
+    )
+    parser.add_argument(
+        "--chunk_epochs", type=int, default=240, help="Epochs per checkpointed unit"
+    )
+    parser.add_argument(
+        "--verify", action="store_true", help="Only check the integrity of the parts"
+    )
+    args = parser.parse_args()
+
+    if args.verify:
+        journal = Journal(args.run_dir)
+        problems = verify_run(args.run_dir)
+        print(f"Checked {len(journal.units)} parts in {args.run_dir}")
+        for unit, problem in problems.items():
+            print(f"✗ {unit}: {problem}")
+        if problems:
+            print(f"{len(problems)} damaged parts will be recomputed on the next run")
+            return 1
+        print("✓ All parts intact")
+        return 0
+
+    summary = run_checkpointed(
+        args.file, args.interval, args.run_dir, "results", args.chunk_epochs
+    )
+    print(
+        f"Computed {summary['computed']} units, "
+        f"skipped {summary['skipped']} already completed"
+    )
+    for filename in summary["merged"]:
+        print(f"✓ Saved: {filename}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Chunked CSV Output
+Bulk row formatting and transparently compressed text files (.gz, .zst)
+"""
+
+import gzip
+import io
+import itertools
+
+import numpy as np
+from ecef_to_lla import ecef_to_lla
+from gps_time import gps_time_to_datetime_iso_batch
+
+COMPRESSION = {"none": "", "gz": ".gz", "zst": ".zst"}
+ECEF_FORMAT = ",".join(["%.10f"] * 5) + "\n"  # same text as np.savetxt
+LLA_FORMAT = "%d,%.10f,%.10f,%.10f,%s\n"
+LLA_MISSING_FORMAT = "%d,,,,%s\n"
+LLA_HEADER = "Sat,Lat,Lon,Alt,Date\n"
+BUFFER_BYTES = 1 << 20
+CHUNK_ROWS = 16384  # rows formatted per write (bounds the text held in memory)
+GZIP_LEVEL = 1  # fast levels: output is compressed while it is produced
+ZSTD_LEVEL = 1
+
+
+def open_text(filename, mode="r", level=None):
+    """
+    Open a text file, compressed according to its suffix
+
+    .gz files use gzip and .zst files use the optional zstandard package,
+    both at a fast level by default; other names are plain files with a
+    1 MB buffer.
+
+    Parameters:
+    -----------
+    filename : str
+        File path
+    mode : str
+        'r', 'w' or 'a'
+    level : int, optional
+        Compression level
+
+    Returns:
+    --------
+    f : file
+        Text file object (use as a context manager)
+    """
+    filename = str(filename)
+    if filename.endswith(".gz"):
+        return gzip.open(
+            filename, f"{mode}t", compresslevel=GZIP_LEVEL if level is None else level
+        )
+    if filename.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError(
+                f"Reading or writing {filename} requires the zstandard package"
+            ) from e
+        raw = open(filename, f"{mode}b")
+        if mode == "r":
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        else:
+            compressor = zstandard.ZstdCompressor(
+                level=ZSTD_LEVEL if level is None else level
+            )
+            stream = compressor.stream_writer(raw)
+        return io.TextIOWrapper(stream)
+    return open(filename, mode, buffering=BUFFER_BYTES)
+
+
+def compressed_name(filename, compress="none"):
+    """filename with the suffix of a COMPRESSION choice appended"""
+    return f"{filename}{COMPRESSION[compress]}"
+
+
+def base_name(filename):
+    """File name without directory, compression suffix and extension"""
+    name = str(filename).replace("\\", "/").rsplit("/", 1)[-1]
+    for suffix in COMPRESSION.values():
+        if suffix and name.endswith(suffix):
+            name = name[: -len(suffix)]
+    return name.rsplit(".", 1)[0] if "." in name else name
+
+
+def format_rows(fmt, columns):
+    """
+    Text of many rows formatted in a single % operation
+
+    Parameters:
+    -----------
+    fmt : str
+        %-format of one row, including its newline
+    columns : list of array-like
+        Equal-length columns, one per format field
+
+    Returns:
+    --------
+    text : str
+        All rows
+    """
+    columns = [c.tolist() if isinstance(c, np.ndarray) else list(c) for c in columns]
+    if not columns[0]:
+        return ""
+    values = tuple(itertools.chain.from_iterable(zip(*columns, strict=True)))
+    return (fmt * len(columns[0])) % values
+
+
+def format_ecef(svpos):
+    """Rows of [time, sv, X, Y, Z] as written by np.savetxt with %.10f"""
+    return format_rows(ECEF_FORMAT, np.asarray(svpos, dtype=np.float64).T)
+
+
+def format_lla(svpos, year, month, day):
+    """
+    Lat/lon/alt CSV rows with readable dates for rows of [time, sv, X, Y, Z]
+
+    Rows without a position keep their satellite and date with empty fields.
+
+    Parameters:
+    -----------
+    svpos : numpy.ndarray
+        Rows of [time, sv, X, Y, Z] from rinexnav.compute_svpos
+    year, month, day : int
+        Date of the processed day
+
+    Returns:
+    --------
+    text : str
+        One line per row of svpos (no header)
+    """
+    if len(svpos) == 0:
+        return ""
+    return _lla_text(svpos.T, ~np.isnan(svpos[:, 2]), year, month, day)
+
+
+def _lla_text(columns, valid, year, month, day):
+    """format_lla of time, sv, X, Y, Z columns and their validity"""
+    tow, sv, x, y, z = columns
+    lat, lon, alt = ecef_to_lla(
+        np.asarray(x, dtype=np.float64),
+        np.asarray(y, dtype=np.float64),
+        np.asarray(z, dtype=np.float64),
+    )
+    dates = gps_time_to_datetime_iso_batch(tow, year, month, day)
+    sv = sv.astype(np.int64)
+    text = format_rows(
+        LLA_FORMAT, [sv[valid], lat[valid], lon[valid], alt[valid], dates[valid]]
+    )
+    if valid.all():
+        return text
+    lines = np.empty(len(sv), dtype=object)
+    lines[valid] = text.splitlines(keepends=True)
+    lines[~valid] = format_rows(
+        LLA_MISSING_FORMAT, [sv[~valid], dates[~valid]]
+    ).splitlines(keepends=True)
+    return "".join(lines)
+
+
+def _cube_chunks(cube, chunk_rows):
+    """Epoch slices of a svcube.PositionCube of about chunk_rows cells"""
+    step = max(1, chunk_rows // max(1, len(cube.sv)))
+    for start in range(0, len(cube.tow), step):
+        yield cube.epochs(start, start + step)
+
+
+def write_ecef(f, svpos, chunk_rows=CHUNK_ROWS):
+    """
+    Append format_ecef text of svpos to f, chunk_rows rows at a time
+
+    svpos may also be a svcube.PositionCube, whose coordinates are read
+    through views instead of being stacked into rows first.
+    """
+    if hasattr(svpos, "columns"):
+        for part in _cube_chunks(svpos, chunk_rows):
+            f.write(format_rows(ECEF_FORMAT, part.columns()))
+        return
+    for start in range(0, len(svpos), chunk_rows):
+        f.write(format_ecef(svpos[start : start + chunk_rows]))
+
+
+def write_lla(f, svpos, year, month, day, chunk_rows=CHUNK_ROWS):
+    """Append format_lla text of svpos (rows or a PositionCube) to f in chunks"""
+    if hasattr(svpos, "columns"):
+        for part in _cube_chunks(svpos, chunk_rows):
+            f.write(_lla_text(part.columns(), part.valid.ravel(), year, month, day))
+        return
+    for start in range(0, len(svpos), chunk_rows):
+        f.write(format_lla(svpos[start : start + chunk_rows], year, month, day))
+
+
+def load_rows(csv_file, **kwargs):
+    """np.loadtxt of a comma separated file, decompressed by suffix"""
+    with open_text(csv_file) as f:
+        return np.loadtxt(f, delimiter=",", **kwargs)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+DOP Grid Maps
+GDOP/PDOP/HDOP/VDOP over a global latitude/longitude grid through the day
+
+@author: Based on standard GNSS positioning algorithms
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+
+import numpy as np
+from ecef_to_lla import lla_to_ecef
+from find_eph import ephemeris_table
+from geometry import dop, enu_matrix
+from gpsweekcal import gpsweekcal
+from positions import nav_day, position_cube
+from readrinex import readrinex
+
+DOP_NAMES = ("GDOP", "PDOP", "HDOP", "VDOP")
+
+
+def _block_dop(cube, valid, rx_xyz, up, lat, lon, sin_mask):
+    """DOP for a block of epochs (cube) and grid cells (rx_xyz)"""
+    diff = cube[:, None, :, :] - rx_xyz[None, :, None, :]  # (ep, cell, sv, 3)
+    rho = np.linalg.norm(diff, axis=-1)
+    rho[rho == 0] = 1.0
+    los = diff / rho[..., None]
+    use = valid[:, None, :] & (np.einsum("ecsk,ck->ecs", los, up) >= sin_mask)
+
+    G = np.empty(los.shape[:-1] + (4,))
+    G[..., :3] = -los
+    G[..., 3] = 1.0
+    return dop(G, lat, lon, use)
+
+
+def dop_grid(cube, lats, lons, alt=0.0, elev_mask=10.0, max_memory_mb=256, out=None):
+    """
+    DOP maps for every epoch of a position cube over a lat/lon grid
+
+    The satellite positions are computed once and shared by every grid
+    cell. Cells and epochs are processed in blocks sized so that the
+    temporary geometry arrays stay under max_memory_mb.
+
+    Parameters:
+    -----------
+    cube : numpy.ndarray
+        (epochs, svs, 3) satellite ECEF positions (NaN where unavailable)
+    lats, lons : numpy.ndarray
+        Grid axes in degrees
+    alt : float
+        Receiver altitude in meters for all cells
+    elev_mask : float
+        Elevation mask in degrees
+    max_memory_mb : float
+        Budget for the temporary arrays of one block
+    out : numpy.ndarray, optional
+        (4, epochs, n_lat, n_lon) float32 array (e.g. a memmap) to fill
+
+    Returns:
+    --------
+    grid : numpy.ndarray
+        (4, epochs, n_lat, n_lon) float32 GDOP, PDOP, HDOP and VDOP
+    """
+    nep, nsv, _ = cube.shape
+    lat_cells, lon_cells = np.meshgrid(lats, lons, indexing="ij")
+    lat_cells, lon_cells = lat_cells.ravel(), lon_cells.ravel()
+    rx_xyz = np.column_stack(lla_to_ecef(lat_cells, lon_cells, alt))
+    up = enu_matrix(lat_cells, lon_cells)[:, 2, :]
+    ncell = len(lat_cells)
+
+    valid = np.isfinite(cube).all(axis=-1)
+    cube = np.where(valid[..., None], cube, 0.0)
+    sin_mask = np.sin(np.radians(elev_mask))
+
+    if out is None:
+        out = np.empty((len(DOP_NAMES), nep, len(lats), len(lons)), np.float32)
+    flat = out.reshape(len(DOP_NAMES), nep, ncell)
+
+    # Rough bytes of temporaries per (epoch, cell): diff, los, G, mask, 4x4s
+    bytes_per_pair = 8 * (nsv * 16 + 96)
+    pairs = max(1, int(max_memory_mb * 1e6 // bytes_per_pair))
+    cells_per_block = min(ncell, pairs)
+    epochs_per_block = max(1, min(nep, pairs // cells_per_block))
+
+    for e0 in range(0, nep, epochs_per_block):
+        e1 = min(nep, e0 + epochs_per_block)
+        for c0 in range(0, ncell, cells_per_block):
+            c1 = min(ncell, c0 + cells_per_block)
+            dops = _block_dop(
+                cube[e0:e1],
+                valid[e0:e1],
+                rx_xyz[c0:c1],
+                up[c0:c1],
+                lat_cells[c0:c1],
+                lon_cells[c0:c1],
+                sin_mask,
+            )
+            for k, name in enumerate(DOP_NAMES):
+                flat[k, e0:e1, c0:c1] = dops[name]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Global DOP maps through the day")
+    parser.add_argument(
+        "--file", type=str, default="data/brdc0680.20n", help="RINEX navigation file"
+    )
+    parser.add_argument(
+        "--date", type=str, default=None, help="Date as YY,MM,DD (default: from file)"
+    )
+    parser.add_argument("--interval", type=int, default=300, help="Seconds per epoch")
+    parser.add_argument("--step", type=float, default=5.0, help="Grid step (degrees)")
+    parser.add_argument("--alt", type=float, default=0.0, help="Altitude (m)")
+    parser.add_argument(
+        "--elev_mask", type=float, default=10.0, help="Elevation mask in degrees"
+    )
+    parser.add_argument(
+        "--max_memory", type=float, default=256, help="Block memory budget in MB"
+    )
+    args = parser.parse_args()
+
+    nav_data = readrinex(args.file)
+    if nav_data is None:
+        return 1
+    if args.date is not None:
+        yy, month, day = (int(x) for x in args.date.split(","))
+        date = [yy + 2000 if yy < 86 else yy + 1900, month, day]
+    else:
+        date = nav_day(nav_data)
+
+    table = ephemeris_table(nav_data)
+    tow = gpsweekcal(date, args.interval)[:, 1].astype(float)
+    sv = np.unique(table["sv"])
+    lats = np.arange(-90.0, 90.0 + args.step / 2, args.step)
+    lons = np.arange(-180.0, 180.0, args.step)
+
+    os.makedirs("results", exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.file))[0]
+    grid_filename = f"results/{name}_dopgrid.npy"
+    axes_filename = f"results/{name}_dopgrid_axes.npz"
+    out = np.lib.format.open_memmap(
+        grid_filename,
+        mode="w+",
+        dtype=np.float32,
+        shape=(len(DOP_NAMES), len(tow), len(lats), len(lons)),
+    )
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    cube = position_cube(table, tow, sv)
+    dop_grid(cube, lats, lons, args.alt, args.elev_mask, args.max_memory, out)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    out.flush()
+    np.savez(axes_filename, tow=tow, lat=lats, lon=lons, names=np.array(DOP_NAMES))
+    ncells = len(tow) * len(lats) * len(lons)
+    print(
+        f"Computed {ncells} epoch-cells in {elapsed:.2f} s "
+        f"({ncells / elapsed:.0f} cells/s), peak memory {peak / 1e6:.1f} MB"
+    )
+    print(f"✓ Saved: {grid_filename}")
+    print(f"✓ Saved: {axes_filename}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
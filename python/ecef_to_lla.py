@@ -7,12 +7,15 @@ Utility function for coordinate conversion
 """
 
 import numpy as np
+from backends import dispatch, register
 
 
 def ecef_to_lla(x, y, z):
     """
     Convert ECEF coordinates to Latitude, Longitude, Altitude
 
+    Large arrays are handed to the compute backend selected in backends.py.
+
     Parameters:
     -----------
     x, y, z : float or array
@@ -23,6 +26,11 @@ def ecef_to_lla(x, y, z):
     lat, lon, alt : float or array
         Latitude, longitude (degrees), altitude (meters)
     """
+    return dispatch("ecef_to_lla", x, y, z, size=np.size(x))
+
+
+@register("ecef_to_lla", "numpy")
+def _ecef_to_lla_numpy(x, y, z):
     a = 6378137.0  # semi-major axis in meters
     e = 8.1819190842622e-2  # eccentricity
 
@@ -45,3 +53,33 @@ def ecef_to_lla(x, y, z):
     lat = np.degrees(lat)
 
     return lat, lon, alt
+
+
+def lla_to_ecef(lat, lon, alt):
+    """
+    Convert Latitude, Longitude, Altitude to ECEF coordinates
+
+    Parameters:
+    -----------
+    lat, lon : float or array
+        Latitude, longitude in degrees
+    alt : float or array
+        Altitude in meters
+
+    Returns:
+    --------
+    x, y, z : float or array
+        ECEF coordinates in meters
+    """
+    a = 6378137.0  # semi-major axis in meters
+    e = 8.1819190842622e-2  # eccentricity
+
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    N = a / np.sqrt(1 - e**2 * np.sin(lat) ** 2)
+
+    x = (N + alt) * np.cos(lat) * np.cos(lon)
+    y = (N + alt) * np.cos(lat) * np.sin(lon)
+    z = (N * (1 - e**2) + alt) * np.sin(lat)
+
+    return x, y, z
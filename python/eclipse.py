@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+"""
+Eclipse Prediction
+Sun position, Earth shadow state and beta angle of GPS satellites
+
+@author: Based on Montenbruck & Gill's Sun position and conical shadow models
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+from ephstore import DAY, WEEK, EphemerisStore
+from gnss import LEAP_SECONDS
+from gpsweekcal import gpsweekcal
+from readrinex import read_nav_header
+from satpos import omegae_dot, satpos_batch
+
+AU = 149597870700.0
+R_SUN = 696000e3  # meters
+R_EARTH = 6378137.0  # WGS 84 equatorial radius, meters
+JD_GPS_EPOCH = 2444244.5  # 1980-01-06 00:00
+J2000 = 2451545.0
+TT_MINUS_GPS = 51.184  # TT - TAI + TAI - GPS, seconds
+SUNLIT, PENUMBRA, UMBRA = 0, 1, 2
+
+EVENT_FIELDS = (
+    "sv",
+    "start",
+    "end",
+    "duration",
+    "umbra_start",
+    "umbra_end",
+    "umbra_duration",
+    "beta",
+)
+
+
+def sun_position(week, sow, leap_seconds=LEAP_SECONDS):
+    """
+    Low-precision analytic Sun position in ECEF
+
+    Mean anomaly series of the solar orbit (Montenbruck & Gill 3.3.2),
+    precessed to the equinox of date and rotated by Greenwich mean sidereal
+    time. Good to about 0.01 degrees, ample for shadow geometry. Nutation,
+    polar motion and UT1 - UTC are ignored.
+
+    Parameters:
+    -----------
+    week : array
+        GPS week, e.g. gpsweekcal()[:, 0]
+    sow : array
+        GPS seconds of week, e.g. gpsweekcal()[:, 1]
+    leap_seconds : int
+        GPS - UTC in seconds
+
+    Returns:
+    --------
+    sun : numpy.ndarray
+        (..., 3) Sun position in meters
+    """
+    t = np.asarray(week, dtype=np.float64) * WEEK + np.asarray(sow, dtype=np.float64)
+    T = (JD_GPS_EPOCH + (t + TT_MINUS_GPS) / DAY - J2000) / 36525.0
+    M = np.radians(357.5256 + 35999.049 * T)
+    lon = (
+        np.radians(282.9400 + 1.3972 * T)
+        + M
+        + np.radians((6892.0 * np.sin(M) + 72.0 * np.sin(2 * M)) / 3600.0)
+    )
+    r = (149.619 - 2.499 * np.cos(M) - 0.021 * np.cos(2 * M)) * 1e9
+    eps = np.radians(23.43929111 - 0.0130042 * T)
+
+    x = r * np.cos(lon)
+    y = r * np.sin(lon) * np.cos(eps)
+    z = r * np.sin(lon) * np.sin(eps)
+
+    ut_days = JD_GPS_EPOCH + (t - leap_seconds) / DAY - J2000
+    gmst = np.radians(np.mod(280.46061837 + 360.98564736629 * ut_days, 360.0))
+    c, s = np.cos(gmst), np.sin(gmst)
+    return np.stack([c * x + s * y, -s * x + c * y, z], axis=-1)
+
+
+def shadow_fraction(sat, sun):
+    """
+    Fraction of the solar disk visible from satellites (conical model)
+
+    Parameters:
+    -----------
+    sat : numpy.ndarray
+        (..., 3) satellite ECEF positions in meters
+    sun : numpy.ndarray
+        (..., 3) Sun ECEF positions, broadcastable with sat
+
+    Returns:
+    --------
+    fraction : numpy.ndarray
+        1 when sunlit, 0 in umbra, in between in penumbra; NaN where sat is
+    """
+    to_sun = sun - sat
+    d_sun = np.linalg.norm(to_sun, axis=-1)
+    d_earth = np.linalg.norm(sat, axis=-1)
+    a = np.arcsin(R_SUN / d_sun)  # apparent radius of the Sun
+    b = np.arcsin(np.minimum(R_EARTH / d_earth, 1.0))  # and of the Earth
+    cos_c = -np.sum(sat * to_sun, axis=-1) / (d_earth * d_sun)
+    c = np.arccos(np.clip(cos_c, -1.0, 1.0))  # separation of their centres
+
+    # Area of the solar disk covered by the Earth's disk
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x = (c**2 + a**2 - b**2) / (2 * c)
+        y = np.sqrt(np.maximum(a**2 - x**2, 0.0))
+        area = (
+            a**2 * np.arccos(np.clip(x / a, -1.0, 1.0))
+            + b**2 * np.arccos(np.clip((c - x) / b, -1.0, 1.0))
+            - c * y
+        )
+    fraction = np.where(c >= a + b, 1.0, 1.0 - area / (np.pi * a**2))
+    fraction = np.where(c <= b - a, 0.0, fraction)
+    return np.where(np.isnan(d_earth), np.nan, np.clip(fraction, 0.0, 1.0))
+
+
+def shadow_state(fraction):
+    """SUNLIT, PENUMBRA or UMBRA code of shadow fractions (-1 where NaN)"""
+    state = np.where(
+        fraction >= 1.0, SUNLIT, np.where(fraction <= 0.0, UMBRA, PENUMBRA)
+    )
+    return np.where(np.isnan(fraction), -1, state)
+
+
+def beta_angle(sat, vel, sun):
+    """
+    Elevation of the Sun above the orbital plane in degrees
+
+    Parameters:
+    -----------
+    sat : numpy.ndarray
+        (..., 3) ECEF positions
+    vel : numpy.ndarray
+        (..., 3) inertial velocities in ECEF axes
+    sun : numpy.ndarray
+        (..., 3) Sun ECEF positions, broadcastable with sat
+    """
+    normal = np.cross(sat, vel)
+    normal /= np.linalg.norm(normal, axis=-1, keepdims=True)
+    to_sun = sun / np.linalg.norm(sun, axis=-1, keepdims=True)
+    return np.degrees(np.arcsin(np.clip(np.sum(normal * to_sun, axis=-1), -1, 1)))
+
+
+def _records(store, t, sv):
+    """Seconds of each record's own GPS week and the records of (t, sv)"""
+    eph = store.gather(*store.lookup(sv, t))
+    return t - eph["GPSWeek"] * WEEK, eph
+
+
+def satellite_states(store, t, sv):
+    """
+    ECEF positions and inertial velocities from an EphemerisStore
+
+    Parameters:
+    -----------
+    store : ephstore.EphemerisStore
+        Store holding the days of t
+    t : numpy.ndarray
+        GPS seconds since the GPS epoch, broadcastable with sv
+    sv : numpy.ndarray
+        Satellite ids or GPS PRNs
+
+    Returns:
+    --------
+    pos, vel : numpy.ndarray
+        (..., 3) in meters and m/s; the velocity is the +/-0.5 s central
+        difference of one record plus the Earth rotation term
+    """
+    tw, eph = _records(store, t, sv)
+    pos = satpos_batch(tw, eph, "exact")
+    vel = satpos_batch(tw + 0.5, eph, "exact") - satpos_batch(tw - 0.5, eph, "exact")
+    vel[..., 0] -= omegae_dot * pos[..., 1]
+    vel[..., 1] += omegae_dot * pos[..., 0]
+    return pos, vel
+
+
+def iter_shadow_chunks(store, t, sv, chunk_epochs=2880):
+    """
+    Shadow fraction and beta angle of the (epoch x SV) cube in blocks
+
+    Parameters:
+    -----------
+    store : ephstore.EphemerisStore
+        Store holding the days of t
+    t : numpy.ndarray
+        (epochs,) GPS seconds since the GPS epoch
+    sv : numpy.ndarray
+        (svs,) satellite ids or GPS PRNs
+    chunk_epochs : int
+        Epochs per block
+
+    Yields:
+    -------
+    t_chunk : numpy.ndarray
+        (block,) times of the block
+    fraction : numpy.ndarray
+        (block, svs) visible fraction of the Sun
+    beta : numpy.ndarray
+        (block, svs) beta angle in degrees
+    """
+    t = np.asarray(t, dtype=np.float64)
+    sv = np.asarray(sv)
+    for start in range(0, len(t), chunk_epochs):
+        t_chunk = t[start : start + chunk_epochs]
+        sun = sun_position(0, t_chunk)[:, None, :]
+        pos, vel = satellite_states(store, t_chunk[:, None], sv[None, :])
+        yield t_chunk, shadow_fraction(pos, sun), beta_angle(pos, vel, sun)
+
+
+def _fraction_at(store, t, sv):
+    return shadow_fraction(satpos_batch(*_records(store, t, sv)), sun_position(0, t))
+
+
+def _refine(store, sv, lo, hi, umbra, tol):
+    """Bisect each [lo, hi] to the time its shadow or umbra test flips"""
+    inside_lo = _inside(_fraction_at(store, lo, sv), umbra)
+    evaluations = 0
+    while len(lo) and np.max(hi - lo) > tol:
+        mid = 0.5 * (lo + hi)
+        same = _inside(_fraction_at(store, mid, sv), umbra) == inside_lo
+        lo = np.where(same, mid, lo)
+        hi = np.where(same, hi, mid)
+        evaluations += len(mid)
+    return 0.5 * (lo + hi), evaluations
+
+
+def _inside(fraction, umbra):
+    return fraction <= 0.0 if umbra else fraction < 1.0
+
+
+def _intervals(edges, j, inside_first, t):
+    """(n, 2) start/end times of satellite j from its refined edges"""
+    bounds = np.sort(edges[1][edges[0] == j])
+    if inside_first:
+        bounds = np.concatenate([[t[0]], bounds])
+    if len(bounds) % 2:
+        bounds = np.append(bounds, t[-1])
+    return bounds.reshape(-1, 2)
+
+
+def eclipse_events(store, t, sv, chunk_epochs=2880, tol=0.1):
+    """
+    Eclipse entry and exit times of each satellite
+
+    The cube is scanned block by block; state changes between samples are
+    then bisected to tol seconds. An eclipse starts when the Sun is first
+    partly hidden and ends when it is fully visible again. Eclipses already
+    under way at the first epoch or still at the last are clipped there.
+
+    Parameters:
+    -----------
+    store : ephstore.EphemerisStore
+        Store holding the days of t
+    t : numpy.ndarray
+        (epochs,) GPS seconds since the GPS epoch
+    sv : numpy.ndarray
+        (svs,) satellite ids or GPS PRNs
+    chunk_epochs : int
+        Epochs per block
+    tol : float
+        Time tolerance of entry and exit times in seconds
+
+    Returns:
+    --------
+    events : dict
+        One array per EVENT_FIELDS entry; times in GPS seconds since the
+        GPS epoch, umbra fields NaN (duration 0) for penumbral eclipses
+    stats : dict
+        Cells scanned, edges found, bisection evaluations and the
+        (svs, 2) smallest and largest beta angle of each satellite
+    """
+    t = np.asarray(t, dtype=np.float64)
+    sv = np.asarray(sv)
+    edges = {False: [], True: []}  # umbra flag -> [(sv index, lo, hi)]
+    beta_range = np.full((len(sv), 2), [np.inf, -np.inf])
+    previous = None
+    for t_chunk, fraction, beta in iter_shadow_chunks(store, t, sv, chunk_epochs):
+        if previous is not None:
+            t_chunk = np.concatenate([[previous[0]], t_chunk])
+            fraction = np.vstack([previous[1], fraction])
+        for umbra in (False, True):
+            inside = _inside(fraction, umbra)
+            k, j = np.nonzero(inside[1:] != inside[:-1])
+            edges[umbra].append((j, t_chunk[k], t_chunk[k + 1]))
+        previous = (t_chunk[-1], fraction[-1:])
+        beta_range[:, 0] = np.fmin(beta_range[:, 0], np.nanmin(beta, axis=0))
+        beta_range[:, 1] = np.fmax(beta_range[:, 1], np.nanmax(beta, axis=0))
+
+    stats = {
+        "cells": len(t) * len(sv),
+        "edges": 0,
+        "evaluations": 0,
+        "beta_range": beta_range,
+    }
+    times = {}
+    for umbra, found in edges.items():
+        j = np.concatenate([e[0] for e in found]) if found else np.zeros(0, int)
+        lo = np.concatenate([e[1] for e in found]) if found else np.zeros(0)
+        hi = np.concatenate([e[2] for e in found]) if found else np.zeros(0)
+        refined, evaluations = _refine(store, sv[j], lo, hi, umbra, tol)
+        times[umbra] = (j, refined)
+        stats["edges"] += len(j)
+        stats["evaluations"] += evaluations
+
+    fraction = _fraction_at(store, t[0], sv)
+    rows = []
+    for j in range(len(sv)):
+        shadow = _intervals(times[False], j, fraction[j] < 1.0, t)
+        umbra = _intervals(times[True], j, fraction[j] <= 0.0, t)
+        for start, end in shadow:
+            within = umbra[(umbra[:, 0] >= start) & (umbra[:, 1] <= end)]
+            u_start, u_end = within[0] if len(within) else (np.nan, np.nan)
+            rows.append((j, start, end, u_start, u_end))
+
+    j, start, end, u_start, u_end = (
+        (np.array(column) for column in zip(*rows, strict=True))
+        if rows
+        else (np.zeros(0, int),) + (np.zeros(0),) * 4
+    )
+    middle = 0.5 * (start + end)
+    pos, vel = satellite_states(store, middle, sv[j])
+    events = {
+        "sv": sv[j],
+        "start": start,
+        "end": end,
+        "duration": end - start,
+        "umbra_start": u_start,
+        "umbra_end": u_end,
+        "umbra_duration": np.nan_to_num(u_end - u_start),
+        "beta": beta_angle(pos, vel, sun_position(0, middle)),
+    }
+    return events, stats
+
+
+def write_eclipse_table(filename, events):
+    """Write eclipse events as CSV with GPS-time ISO strings and durations"""
+    gps_epoch = np.datetime64("1980-01-06T00:00:00", "ms")
+
+    def iso(seconds):
+        ms = np.round(np.nan_to_num(seconds) * 1e3).astype("timedelta64[ms]")
+        text = np.datetime_as_string(gps_epoch + ms, unit="s")
+        return np.where(np.isnan(seconds), "", text)
+
+    sv = events["sv"]
+    if sv.dtype.kind in "iuf":
+        sv = np.array([f"G{int(p):02d}" for p in sv], dtype=str)
+    rows = np.column_stack(
+        [
+            sv,
+            iso(events["start"]),
+            iso(events["end"]),
+            np.char.mod("%.1f", events["duration"]),
+            iso(events["umbra_start"]),
+            iso(events["umbra_end"]),
+            np.char.mod("%.1f", events["umbra_duration"]),
+            np.char.mod("%.3f", events["beta"]),
+        ]
+    )
+    np.savetxt(
+        filename,
+        rows,
+        delimiter=",",
+        fmt="%s",
+        header=",".join(EVENT_FIELDS),
+        comments="",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Eclipse entry/exit tables and beta angles of GPS satellites"
+    )
+    parser.add_argument(
+        "--files",
+        type=str,
+        nargs="+",
+        default=["data/brdc0680.20n"],
+        help="Daily nav files; the time axis covers their days",
+    )
+    parser.add_argument(
+        "--root", type=str, default="results/ephstore", help="Ephemeris store"
+    )
+    parser.add_argument("--interval", type=int, default=30, help="Seconds per epoch")
+    parser.add_argument(
+        "--chunk_epochs", type=int, default=2880, help="Epochs per block"
+    )
+    parser.add_argument("--tol", type=float, default=0.1, help="Time tolerance (s)")
+    parser.add_argument("--max_prn", type=int, default=32, help="Highest GPS PRN")
+    args = parser.parse_args()
+
+    try:
+        store = EphemerisStore(args.root).add(args.files)
+        dates = sorted({tuple(read_nav_header(f).date) for f in args.files})
+    except Exception as e:
+        print(f"Failed to read nav files: {e}")
+        return 1
+    mytime = np.vstack([gpsweekcal(list(d), args.interval) for d in dates])
+    t = mytime[:, 0] * WEEK + mytime[:, 1]
+    prn = np.arange(1, args.max_prn + 1)
+
+    t0 = time.perf_counter()
+    events, stats = eclipse_events(store, t, prn, args.chunk_epochs, args.tol)
+    elapsed = time.perf_counter() - t0
+    umbral = np.count_nonzero(events["umbra_duration"] > 0)
+    print(
+        f"{len(events['sv'])} eclipses ({umbral} umbral) over {len(dates)} days: "
+        f"{stats['cells']} cells and {stats['edges']} edges "
+        f"({stats['evaluations']} bisection evaluations) in {elapsed:.2f} s"
+    )
+    if len(events["sv"]):
+        longest = np.argmax(events["duration"])
+        print(
+            f"Longest: G{int(events['sv'][longest]):02d} "
+            f"{events['duration'][longest] / 60:.1f} min "
+            f"(umbra {events['umbra_duration'][longest] / 60:.1f} min, "
+            f"beta {events['beta'][longest]:.2f} deg)"
+        )
+
+    os.makedirs("results", exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.files[0]))[0]
+    filename = f"results/{name}_eclipses.csv"
+    write_eclipse_table(filename, events)
+    print(f"✓ Saved: {filename}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
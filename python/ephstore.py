@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+Cross-Day Ephemeris Store
+Memory-mapped GPS records of many nav files, indexed by (SV, absolute GPS time)
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+from find_eph import ephemeris_table
+from gps_time import gps_time_from_calendar
+from positions import position_cube
+from readrinex import GPS_NAV_FIELDS, read_nav_header, readrinex
+from resultcache import file_hash
+from satpos import satpos_batch
+
+WEEK = 604800.0
+DAY = 86400.0
+SV_SCALE = 2.0**32  # key = PRN * SV_SCALE + Toe in GPS seconds since the epoch
+COLUMNS = ("prn", "toe_abs", "key", "toc") + GPS_NAV_FIELDS
+MANIFEST_NAME = "manifest.json"
+
+
+def _prn(sv):
+    """GPS PRNs of satellite ids ('G05') or PRNs; other systems become -1"""
+    sv = np.asarray(sv)
+    if sv.dtype.kind in "iuf":
+        return sv.astype(np.float64)
+    ids, inverse = np.unique(sv.astype(str), return_inverse=True)
+    prn = np.array([int(s[1:3]) if s[0] == "G" else -1 for s in ids], dtype=float)
+    return prn[inverse].reshape(sv.shape)
+
+
+def records_array(table):
+    """
+    GPS records of an ephemeris_table as one float64 array sorted by key
+
+    Parameters:
+    -----------
+    table : dict
+        Output of find_eph.ephemeris_table
+
+    Returns:
+    --------
+    records : numpy.ndarray
+        (n, len(COLUMNS)) rows; missing navigation fields are NaN
+    """
+    gps = np.char.startswith(table["sv"].astype(str), "G")
+    records = np.full((int(gps.sum()), len(COLUMNS)), np.nan)
+    for k, name in enumerate(COLUMNS[3:], start=3):
+        if name in table:
+            records[:, k] = table[name][gps]
+    records[:, 0] = _prn(table["sv"][gps])
+    records[:, 1] = (
+        records[:, COLUMNS.index("GPSWeek")] * WEEK + records[:, COLUMNS.index("Toe")]
+    )
+    records[:, 2] = records[:, 0] * SV_SCALE + records[:, 1]
+    records = records[np.argsort(records[:, 2], kind="stable")]
+    keep = np.ones(len(records), dtype=bool)
+    keep[1:] = records[1:, 2] != records[:-1, 2]  # first of repeated (SV, Toe)
+    return records[keep]
+
+
+class EphemerisStore:
+    """
+    Persistent store of broadcast records from a rolling window of days
+
+    Each nav file is parsed once and saved as a sorted .npy array under
+    root (named by the file's content hash), then memory-mapped whenever
+    its day is needed. At most max_days days are mapped at a time; the
+    least recently used day is dropped first.
+
+    A lookup at time t considers every file of the day of t and of the
+    days before and after it. The record with the latest Toe at or before
+    t wins, otherwise the earliest one after t: the find_eph rule applied
+    across file boundaries.
+
+    Parameters:
+    -----------
+    root : str
+        Directory of the converted arrays and the manifest
+    max_days : int
+        Days kept memory-mapped
+    """
+
+    def __init__(self, root="results/ephstore", max_days=4):
+        self.root = root
+        self.max_days = max_days
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        os.makedirs(root, exist_ok=True)
+        self.manifest = {"columns": list(COLUMNS), "files": {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+            if self.manifest["columns"] != list(COLUMNS):
+                raise ValueError(f"{root} was written with other columns")
+        self.files = []  # registered [(path, sha256, day number)]
+        self._mapped = OrderedDict()  # day -> [(file index, records)]
+        self.stats = {"parsed": 0, "mapped": 0, "evicted": 0, "lookups": 0}
+
+    def _save_manifest(self):
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def add(self, files):
+        """Register nav files (only the headers are read)"""
+        for path in files:
+            date = read_nav_header(path).date
+            if date is None:
+                raise ValueError(f"Could not extract date from {path}")
+            week, sow = gps_time_from_calendar(*date)
+            day = int((week * WEEK + sow) // DAY)
+            self.files.append((os.path.abspath(path), file_hash(path), day))
+            self._mapped.pop(day, None)  # remap with the new file
+        return self
+
+    @property
+    def days(self):
+        """Registered day numbers (days since the GPS epoch)"""
+        return sorted({day for _, _, day in self.files})
+
+    def _records(self, index):
+        """Memory-mapped records of registered file index, converted if new"""
+        path, sha, _ = self.files[index]
+        filename = os.path.join(self.root, f"{sha[:16]}.npy")
+        if sha not in self.manifest["files"] or not os.path.exists(filename):
+            nav_data = readrinex(path)
+            if nav_data is None:
+                raise ValueError(f"Failed to load RINEX file {path}")
+            records = records_array(ephemeris_table(nav_data))
+            out = np.lib.format.open_memmap(
+                f"{filename}.tmp", mode="w+", dtype=np.float64, shape=records.shape
+            )
+            out[:] = records
+            out.flush()
+            del out
+            os.replace(f"{filename}.tmp", filename)
+            self.manifest["files"][sha] = {"path": path, "rows": len(records)}
+            self._save_manifest()
+            self.stats["parsed"] += 1
+        self.stats["mapped"] += 1
+        return np.load(filename, mmap_mode="r")
+
+    def _day(self, day):
+        """[(file index, records)] of one day, mapping it on first use"""
+        if day in self._mapped:
+            self._mapped.move_to_end(day)
+            return self._mapped[day]
+        entries = [
+            (k, self._records(k)) for k, (_, _, d) in enumerate(self.files) if d == day
+        ]
+        self._mapped[day] = entries
+        while len(self._mapped) > self.max_days:
+            self._mapped.popitem(last=False)
+            self.stats["evicted"] += 1
+        return entries
+
+    def lookup(self, sv, t):
+        """
+        Best record for each (satellite, time) query
+
+        Parameters:
+        -----------
+        sv : array of str or int
+            Satellite ids ('G05') or GPS PRNs, broadcastable with t
+        t : array
+            GPS seconds since the GPS epoch (week * 604800 + seconds of week)
+
+        Returns:
+        --------
+        file_index, row : numpy.ndarray
+            Registered file and record row of each query, -1 where the
+            satellite has no record in the window
+        """
+        prn, t = np.broadcast_arrays(_prn(sv), np.asarray(t, dtype=np.float64))
+        shape = t.shape
+        prn, t = prn.ravel(), t.ravel()
+        qkey = prn * SV_SCALE + t
+        best = {
+            "le": (np.full(len(t), -np.inf), np.full(len(t), -1), np.full(len(t), -1)),
+            "gt": (np.full(len(t), np.inf), np.full(len(t), -1), np.full(len(t), -1)),
+        }
+        query_day = np.floor(t / DAY).astype(np.int64)
+        registered = set(self.days)
+        for day in np.unique(query_day):
+            sel = np.nonzero(query_day == day)[0]
+            for d in (day - 1, day, day + 1):
+                if d not in registered:
+                    continue
+                for index, records in self._day(int(d)):
+                    self._update(best, index, records, sel, prn[sel], t[sel], qkey[sel])
+        self.stats["lookups"] += len(t)
+
+        le_toe, le_file, le_row = best["le"]
+        _, gt_file, gt_row = best["gt"]
+        found = np.isfinite(le_toe)
+        file_index = np.where(found, le_file, gt_file).reshape(shape)
+        row = np.where(found, le_row, gt_row).reshape(shape)
+        return file_index, row
+
+    @staticmethod
+    def _update(best, index, records, sel, prn, t, qkey):
+        """Fold one file's candidates into the running best records"""
+        n = len(records)
+        if n == 0:
+            return
+        same, toe, key = records[:, 0], records[:, 1], records[:, 2]
+        # Last record at or before (prn, t); one exact step fixes key rounding
+        le = np.searchsorted(key, qkey, side="right") - 1
+        nxt = np.clip(le + 1, 0, n - 1)
+        le = np.where((le + 1 < n) & (same[nxt] == prn) & (toe[nxt] <= t), le + 1, le)
+        cur = np.clip(le, 0, n - 1)
+        le = np.where((le >= 0) & (same[cur] == prn) & (toe[cur] > t), le - 1, le)
+
+        # Latest record of the satellite at or before t
+        cur = np.clip(le, 0, n - 1)
+        ok = (le >= 0) & (same[cur] == prn)
+        better = ok & (toe[cur] > best["le"][0][sel])
+        _assign(best["le"], sel[better], toe[cur][better], index, le[better])
+        # Earliest record of the satellite after t is the next one
+        gt = le + 1
+        cur = np.clip(gt, 0, n - 1)
+        ok = (gt < n) & (same[cur] == prn)
+        better = ok & (toe[cur] < best["gt"][0][sel])
+        _assign(best["gt"], sel[better], toe[cur][better], index, gt[better])
+
+    def gather(self, file_index, row):
+        """
+        Record fields for lookup() results
+
+        Returns:
+        --------
+        eph : dict
+            One float64 array per column of COLUMNS, shaped like row, NaN
+            where no record was found
+        """
+        eph = {name: np.full(row.shape, np.nan) for name in COLUMNS}
+        for index in np.unique(file_index[file_index >= 0]):
+            mask = file_index == index
+            records = self._day(self.files[index][2])
+            records = next(r for k, r in records if k == index)
+            values = records[row[mask]]
+            for k, name in enumerate(COLUMNS):
+                eph[name][mask] = values[:, k]
+        return eph
+
+    def positions(self, t, sv, precision="float64"):
+        """
+        Satellite ECEF positions using the best record of the whole window
+
+        Parameters:
+        -----------
+        t : numpy.ndarray
+            (epochs,) GPS seconds since the GPS epoch
+        sv : numpy.ndarray
+            (svs,) satellite ids or GPS PRNs
+
+        Returns:
+        --------
+        cube : numpy.ndarray
+            (epochs, svs, 3) positions in meters, NaN without a record
+        """
+        t = np.asarray(t, dtype=np.float64)[:, None]
+        eph = self.gather(*self.lookup(np.asarray(sv)[None, :], t))
+        # Seconds of the record's own GPS week, so Toe needs no week fix-up
+        return satpos_batch(t - eph["GPSWeek"] * WEEK, eph, precision)
+
+
+def _assign(best, where, toe, index, row):
+    best[0][where] = toe
+    best[1][where] = index
+    best[2][where] = row
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cross-day ephemeris store: positions near midnight"
+    )
+    parser.add_argument(
+        "--files", type=str, nargs="+", required=True, help="Daily nav files"
+    )
+    parser.add_argument(
+        "--root", type=str, default="results/ephstore", help="Store directory"
+    )
+    parser.add_argument("--max_days", type=int, default=4, help="Days kept mapped")
+    parser.add_argument("--interval", type=float, default=30.0, help="Epoch spacing")
+    parser.add_argument(
+        "--hours", type=float, default=2.0, help="Hours after midnight to compare"
+    )
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    store = EphemerisStore(args.root, args.max_days).add(args.files)
+    prn = np.arange(1, 33)
+    print(f"{len(store.files)} files over {len(store.days)} days in {args.root}")
+    for day in store.days:
+        # Compare with the single-file run of the day's first file
+        t = day * DAY + np.arange(0.0, args.hours * 3600.0, args.interval)
+        path = next(p for p, _, d in store.files if d == day)
+        single = position_cube(ephemeris_table(readrinex(path)), t % WEEK, prn)
+        change = np.linalg.norm(store.positions(t, prn) - single, axis=-1)
+        print(
+            f"{os.path.basename(path)}: {np.count_nonzero(change > 1e-3)} of "
+            f"{change.size} positions in the first {args.hours:g} h use another "
+            f"file's record, largest change {np.nanmax(change, initial=0):.1f} m"
+        )
+    print(f"{time.perf_counter() - t0:.2f} s, {store.stats}")
+
+    queries = 1_000_000
+    rng = np.random.default_rng(0)
+    days = np.array(store.days)
+    t = rng.choice(days, queries) * DAY + rng.uniform(0.0, DAY, queries)
+    sv = rng.integers(1, 33, queries)
+    t0 = time.perf_counter()
+    store.lookup(sv, t)
+    print(f"{queries} lookups in {time.perf_counter() - t0:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -18,8 +18,8 @@ def find_eph(Eph, sv, time):
     -----------
     Eph : xarray.Dataset or numpy.ndarray
         Ephemeris data
-    sv : int
-        Satellite number
+    sv : int or str
+        GPS PRN or satellite id ('E11', 'C03', ...)
     time : float
         GPS time in seconds
 
@@ -30,7 +30,7 @@ def find_eph(Eph, sv, time):
     """
     if hasattr(Eph, "data_vars"):
         # Handle georinex xarray format
-        sv_str = f"G{sv:02d}"
+        sv_str = sv if isinstance(sv, str) else f"G{sv:02d}"
 
         # Check if satellite exists in the dataset
         if sv_str not in Eph.sv.values:
@@ -110,3 +110,130 @@ def find_eph(Eph, sv, time):
                     dtmin = dt
 
         return Eph[:, icol] if icol >= 0 else None
+
+
+def datetime64_to_sow(times):
+    """
+    Convert numpy datetime64 values to GPS seconds of week
+
+    Parameters:
+    -----------
+    times : numpy.ndarray
+        datetime64 values (GPS time scale)
+
+    Returns:
+    --------
+    sec_of_week : numpy.ndarray
+        Seconds of week reckoned from Saturday midnight
+    """
+    gps_epoch = np.datetime64("1980-01-06T00:00:00", "ns")
+    seconds = (np.asarray(times, dtype="datetime64[ns]") - gps_epoch) / np.timedelta64(
+        1, "s"
+    )
+    return np.mod(seconds, 604800.0)
+
+
+def ephemeris_table(nav_data):
+    """
+    Flatten a georinex navigation dataset into per-record arrays
+
+    Only records with a valid Toe are kept. Records are sorted by satellite
+    and Toe, and repeated Toe values for a satellite keep the first record,
+    which is the one find_eph would return.
+
+    Parameters:
+    -----------
+    nav_data : xarray.Dataset
+        Navigation data loaded by georinex
+
+    Returns:
+    --------
+    table : dict
+        'sv' (satellite ids), 'toc' (seconds of week) and one float64 array
+        per navigation variable, all of length n_records
+    """
+    toe = nav_data["Toe"].values  # (time, sv)
+    it, isv = np.nonzero(~np.isnan(toe))
+    sv = nav_data.sv.values[isv]
+    order = np.lexsort((it, toe[it, isv], sv))
+    it, isv, sv = it[order], isv[order], sv[order]
+
+    # Drop repeated (sv, Toe) pairs after the first occurrence
+    toe_sorted = toe[it, isv]
+    keep = np.ones(len(it), dtype=bool)
+    keep[1:] = (sv[1:] != sv[:-1]) | (toe_sorted[1:] != toe_sorted[:-1])
+    it, isv, sv = it[keep], isv[keep], sv[keep]
+
+    table = {"sv": sv, "toc": datetime64_to_sow(nav_data.time.values[it])}
+    for name, var in nav_data.data_vars.items():
+        if var.dims == ("time", "sv"):
+            table[name] = var.values[it, isv].astype(np.float64)
+    return table
+
+
+def find_eph_batch(table, sv, time):
+    """
+    Vectorized find_eph over arrays of satellites and times
+
+    Picks the record with the latest Toe at or before each time, falling
+    back to the satellite's earliest record, exactly like find_eph.
+
+    Parameters:
+    -----------
+    table : dict
+        Output of ephemeris_table
+    sv : array of str or int
+        Satellite ids ('G05') or GPS PRNs, broadcastable with time
+    time : array
+        GPS seconds of week
+
+    Returns:
+    --------
+    index : numpy.ndarray
+        Record index into the table for each query, -1 if the satellite
+        has no ephemeris
+    """
+    sv = np.asarray(sv)
+    if sv.dtype.kind in "iu":
+        sv = np.char.add("G", np.char.zfill(sv.astype(str), 2))
+    sv, time = np.broadcast_arrays(sv, np.asarray(time, dtype=np.float64))
+
+    sv_ids, first = np.unique(table["sv"], return_index=True)
+    code = np.searchsorted(sv_ids, table["sv"])
+    key = code * 1e6 + table["Toe"]
+
+    qcode = np.searchsorted(sv_ids, sv)
+    qcode = np.clip(qcode, 0, max(len(sv_ids) - 1, 0))
+    known = sv_ids[qcode] == sv if len(sv_ids) else np.zeros(sv.shape, dtype=bool)
+
+    idx = np.searchsorted(key, qcode * 1e6 + time, side="right") - 1
+    in_group = (idx >= 0) & (code[np.clip(idx, 0, None)] == qcode)
+    idx = np.where(in_group, idx, first[qcode] if len(sv_ids) else -1)
+    return np.where(known, idx, -1)
+
+
+def gather_eph(table, index):
+    """
+    Select table records for an array of record indices
+
+    Parameters:
+    -----------
+    table : dict
+        Output of ephemeris_table
+    index : numpy.ndarray
+        Record indices from find_eph_batch (-1 entries become NaN)
+
+    Returns:
+    --------
+    eph : dict
+        Arrays shaped like index, one per table column
+    """
+    index = np.asarray(index)
+    safe = np.clip(index, 0, None)
+    eph = {}
+    for name, values in table.items():
+        selected = values[safe]
+        if selected.dtype.kind == "f":
+            selected = np.where(index >= 0, selected, np.nan)
+        eph[name] = selected
+    return eph
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Receiver-Satellite Geometry
+Local frames, look angles and dilution of precision
+
+@author: Based on standard GNSS positioning algorithms
+"""
+
+import numpy as np
+from ecef_to_lla import ecef_to_lla
+
+
+def enu_matrix(lat, lon):
+    """
+    Rotation from ECEF to local East-North-Up axes
+
+    Parameters:
+    -----------
+    lat, lon : float or array
+        Geodetic latitude and longitude in degrees
+
+    Returns:
+    --------
+    R : numpy.ndarray
+        (..., 3, 3) matrices whose rows are the east, north and up unit
+        vectors expressed in ECEF
+    """
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    sl, cl = np.sin(lat), np.cos(lat)
+    so, co = np.sin(lon), np.cos(lon)
+    zero = np.zeros_like(sl * so)
+
+    R = np.empty(np.shape(zero) + (3, 3))
+    R[..., 0, :] = np.stack([-so + zero, co + zero, zero], axis=-1)
+    R[..., 1, :] = np.stack([-sl * co, -sl * so, cl + zero], axis=-1)
+    R[..., 2, :] = np.stack([cl * co, cl * so, sl + zero], axis=-1)
+    return R
+
+
+def look_angles(rx_xyz, sat_xyz):
+    """
+    Elevation and azimuth of satellites seen from receivers
+
+    Parameters:
+    -----------
+    rx_xyz : numpy.ndarray
+        (..., 3) receiver ECEF coordinates in meters
+    sat_xyz : numpy.ndarray
+        (..., 3) satellite ECEF coordinates, broadcastable with rx_xyz
+
+    Returns:
+    --------
+    elevation, azimuth : numpy.ndarray
+        Angles in degrees (azimuth clockwise from north in [0, 360))
+    """
+    rx_xyz = np.asarray(rx_xyz, dtype=np.float64)
+    lat, lon, _ = ecef_to_lla(rx_xyz[..., 0], rx_xyz[..., 1], rx_xyz[..., 2])
+    enu = np.einsum("...ij,...j->...i", enu_matrix(lat, lon), sat_xyz - rx_xyz)
+
+    horizontal = np.hypot(enu[..., 0], enu[..., 1])
+    elevation = np.degrees(np.arctan2(enu[..., 2], horizontal))
+    azimuth = np.mod(np.degrees(np.arctan2(enu[..., 0], enu[..., 1])), 360.0)
+    return elevation, azimuth
+
+
+def dop(G, lat, lon, mask=None):
+    """
+    Dilution of precision from stacked geometry matrices
+
+    Parameters:
+    -----------
+    G : numpy.ndarray
+        (..., n_sat, 4) rows of [-unit line of sight, 1]
+    lat, lon : array
+        Receiver latitude and longitude in degrees, shaped like G[..., 0, 0]
+    mask : numpy.ndarray, optional
+        (..., n_sat) boolean, False rows are left out of the solution
+
+    Returns:
+    --------
+    dops : dict
+        'GDOP', 'PDOP', 'HDOP', 'VDOP' and 'TDOP' arrays, NaN where fewer
+        than four satellites are used
+    """
+    if mask is not None:
+        G = G * mask[..., None]
+    N = np.einsum("...ki,...kj->...ij", G, G)
+    nsat = (
+        np.count_nonzero(mask, axis=-1) if mask is not None else G.shape[-2]
+    ) * np.ones(N.shape[:-2], dtype=int)
+    ok = nsat >= 4
+    ok[ok] = np.abs(np.linalg.det(N[ok])) > 1e-12
+
+    Q = np.full(N.shape, np.nan)
+    Q[ok] = np.linalg.inv(N[ok])
+    R = enu_matrix(lat, lon)
+    Q_enu = np.einsum("...ij,...jk,...lk->...il", R, Q[..., :3, :3], R)
+
+    return {
+        "GDOP": np.sqrt(np.trace(Q, axis1=-2, axis2=-1)),
+        "PDOP": np.sqrt(np.trace(Q[..., :3, :3], axis1=-2, axis2=-1)),
+        "HDOP": np.sqrt(Q_enu[..., 0, 0] + Q_enu[..., 1, 1]),
+        "VDOP": np.sqrt(Q_enu[..., 2, 2]),
+        "TDOP": np.sqrt(Q[..., 3, 3]),
+    }
@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-Constellation Orbits
+Galileo/BeiDou/QZSS Keplerian and GLONASS state-vector positions in batch
+
+@author: Based on the Galileo, BeiDou, QZSS and GLONASS interface control documents
+"""
+
+import argparse
+import time
+
+import numpy as np
+from check_t import check_t
+from find_eph import datetime64_to_sow, ephemeris_table, find_eph_batch, gather_eph
+from gpsweekcal import gpsweekcal
+from positions import nav_day, position_cube
+from readrinex import readrinex
+from satpos import PRECISIONS, _satpos_numpy, satpos_batch
+
+SYSTEMS = {"G": "GPS", "R": "GLONASS", "E": "Galileo", "C": "BeiDou", "J": "QZSS"}
+
+# Keplerian systems: (GM m^3/s^2, Earth rotation rad/s, system time - GPS time s)
+KEPLER = {
+    "G": (3.986005e14, 7.2921151467e-5, 0.0),
+    "J": (3.986005e14, 7.2921151467e-5, 0.0),
+    "E": (3.986004418e14, 7.2921151467e-5, 0.0),
+    "C": (3.986004418e14, 7.292115e-5, -14.0),
+}
+BEIDOU_GEO = (1, 2, 3, 4, 5, 59, 60, 61, 62, 63)  # PRNs using the GEO algorithm
+
+# GLONASS PZ-90 constants and propagation settings
+GLO_MU = 3.9860044e14
+GLO_AE = 6378136.0
+GLO_J2 = 1.0826257e-3
+GLO_WE = 7.292115e-5
+GLO_STEP = 60.0  # Largest RK4 step in seconds
+GLO_MAX_AGE = 3600.0  # Farther than this from any tb counts as no ephemeris
+GLO_FIELDS = ("X", "Y", "Z", "dX", "dY", "dZ", "dX2", "dY2", "dZ2")
+LEAP_SECONDS = 18  # GPS - UTC since 2017; GLONASS epochs are UTC
+
+# Numeric satellite codes for the [time, sv, X, Y, Z] CSV rows
+SV_CODE = {"G": 0, "R": 100, "E": 200, "C": 300, "J": 400}
+
+
+def sv_code(sv):
+    """
+    Numeric codes for satellite ids: PRN plus 100 (GLONASS), 200 (Galileo),
+    300 (BeiDou) or 400 (QZSS); GPS keeps its PRN
+
+    Parameters:
+    -----------
+    sv : array of str
+        Satellite ids such as 'E11'
+
+    Returns:
+    --------
+    code : numpy.ndarray
+        float64 codes
+    """
+    return np.array([SV_CODE[s[0]] + int(s[1:3]) for s in sv], dtype=np.float64)
+
+
+def is_beidou_geo(sv):
+    """Boolean mask of BeiDou GEO satellites among ids"""
+    return np.array([s[0] == "C" and int(s[1:3]) in BEIDOU_GEO for s in sv])
+
+
+def _sorted_unique(table, time_key):
+    """Sort records by (sv, time) and keep the first of repeated pairs"""
+    order = np.lexsort((table[time_key], table["sv"]))
+    table = {k: v[order] for k, v in table.items()}
+    sv, t = table["sv"], table[time_key]
+    keep = np.ones(len(sv), dtype=bool)
+    keep[1:] = (sv[1:] != sv[:-1]) | (t[1:] != t[:-1])
+    return {k: v[keep] for k, v in table.items()}
+
+
+def glonass_table(nav_data, leap_seconds=LEAP_SECONDS):
+    """
+    Flatten the GLONASS records of a navigation dataset
+
+    Parameters:
+    -----------
+    nav_data : xarray.Dataset
+        Navigation data loaded by georinex
+    leap_seconds : int
+        GPS - UTC offset used to move tb from UTC to GPS time
+
+    Returns:
+    --------
+    table : dict or None
+        'sv', 'tb' (GPS seconds of week) and one array per GLO_FIELDS entry,
+        in meters, m/s and m/s^2; None if the file has no GLONASS records
+    """
+    if "X" not in nav_data.data_vars:
+        return None
+    ids = nav_data.sv.values.astype(str)
+    glo = np.char.startswith(ids, "R")
+    x = nav_data["X"].values[:, glo]
+    it, isv = np.nonzero(np.isfinite(x))
+    if len(it) == 0:
+        return None
+    columns = np.flatnonzero(glo)[isv]
+    table = {
+        "sv": np.array([s[:3] for s in ids[columns]]),
+        "tb": np.mod(
+            datetime64_to_sow(nav_data.time.values[it]) + leap_seconds, 604800.0
+        ),
+    }
+    for name in GLO_FIELDS:
+        table[name] = nav_data[name].values[it, columns].astype(np.float64)
+    return _sorted_unique(table, "tb")
+
+
+def nav_tables(nav_data, leap_seconds=LEAP_SECONDS):
+    """
+    Record tables for every constellation of a navigation dataset
+
+    Returns:
+    --------
+    tables : dict
+        'kepler' (find_eph.ephemeris_table for GPS, Galileo, BeiDou and
+        QZSS, with georinex's '_1' copy suffixes merged) and 'glonass'
+        (glonass_table, or None)
+    """
+    kepler = ephemeris_table(nav_data)
+    kepler["sv"] = np.array([s[:3] for s in kepler["sv"]])
+    return {
+        "kepler": _sorted_unique(kepler, "Toe"),
+        "glonass": glonass_table(nav_data, leap_seconds),
+    }
+
+
+def find_glonass(glo, sv, t):
+    """
+    Nearest GLONASS record (by tb) for arrays of satellites and times
+
+    Parameters:
+    -----------
+    glo : dict
+        Output of glonass_table
+    sv : array of str
+        Satellite ids, broadcastable with t
+    t : array
+        GPS seconds of week
+
+    Returns:
+    --------
+    index : numpy.ndarray
+        Record index, -1 where the satellite has no record within
+        GLO_MAX_AGE seconds
+    """
+    sv, t = np.broadcast_arrays(np.asarray(sv), np.asarray(t, dtype=np.float64))
+    ids, first, counts = np.unique(glo["sv"], return_index=True, return_counts=True)
+    qcode = np.clip(np.searchsorted(ids, sv), 0, len(ids) - 1)
+    known = ids[qcode] == sv
+
+    key = np.searchsorted(ids, glo["sv"]) * 1e6 + glo["tb"]
+    after = np.searchsorted(key, qcode * 1e6 + t)
+    lo = np.clip(after - 1, first[qcode], first[qcode] + counts[qcode] - 1)
+    hi = np.clip(after, first[qcode], first[qcode] + counts[qcode] - 1)
+    age_lo = np.abs(check_t(t - glo["tb"][lo]))
+    age_hi = np.abs(check_t(t - glo["tb"][hi]))
+    index = np.where(age_hi < age_lo, hi, lo)
+    ok = known & (np.minimum(age_lo, age_hi) <= GLO_MAX_AGE)
+    return np.where(ok, index, -1)
+
+
+def _glonass_derivative(pos, vel, acc):
+    """Equations of motion in PZ-90 (ECEF): central term, J2, rotation"""
+    x, y, z = pos[..., 0], pos[..., 1], pos[..., 2]
+    r2 = x * x + y * y + z * z
+    r = np.sqrt(r2)
+    mu_r3 = GLO_MU / (r2 * r)
+    j2 = 1.5 * GLO_J2 * GLO_MU * GLO_AE**2 / (r2 * r2 * r)
+    z2 = 5.0 * z * z / r2
+    a = np.empty_like(pos)
+    a[..., 0] = (
+        -mu_r3 * x - j2 * x * (1 - z2) + GLO_WE**2 * x + 2 * GLO_WE * vel[..., 1]
+    )
+    a[..., 1] = (
+        -mu_r3 * y - j2 * y * (1 - z2) + GLO_WE**2 * y - 2 * GLO_WE * vel[..., 0]
+    )
+    a[..., 2] = -mu_r3 * z - j2 * z * (3 - z2)
+    return vel, a + acc
+
+
+def glonass_propagate(pos, vel, acc, dt, max_step=GLO_STEP):
+    """
+    RK4 integration of many GLONASS state vectors at once
+
+    Every element takes the same number of steps, each of its own signed
+    length dt / steps, so the whole array advances together.
+
+    Parameters:
+    -----------
+    pos, vel, acc : numpy.ndarray
+        (..., 3) position (m), velocity (m/s) and luni-solar acceleration
+        (m/s^2) at tb
+    dt : numpy.ndarray
+        (...) seconds from tb to the wanted time
+    max_step : float
+        Longest allowed step in seconds
+
+    Returns:
+    --------
+    pos : numpy.ndarray
+        (..., 3) propagated positions in meters
+    """
+    dt = np.asarray(dt, dtype=np.float64)
+    finite = np.abs(dt[np.isfinite(dt)])
+    steps = max(1, int(np.ceil(finite.max() / max_step))) if finite.size else 1
+    h = (dt / steps)[..., None]
+    for _ in range(steps):
+        k1r, k1v = _glonass_derivative(pos, vel, acc)
+        k2r, k2v = _glonass_derivative(pos + h / 2 * k1r, vel + h / 2 * k1v, acc)
+        k3r, k3v = _glonass_derivative(pos + h / 2 * k2r, vel + h / 2 * k2v, acc)
+        k4r, k4v = _glonass_derivative(pos + h * k3r, vel + h * k3v, acc)
+        pos = pos + h / 6 * (k1r + 2 * k2r + 2 * k3r + k4r)
+        vel = vel + h / 6 * (k1v + 2 * k2v + 2 * k3v + k4v)
+    return pos
+
+
+def glonass_positions(glo, t, sv):
+    """
+    GLONASS positions for arrays of times and satellites
+
+    Parameters:
+    -----------
+    glo : dict
+        Output of glonass_table
+    t : numpy.ndarray
+        GPS seconds of week, broadcastable with sv
+    sv : array of str
+        GLONASS ids ('R05')
+
+    Returns:
+    --------
+    xyz : numpy.ndarray
+        (..., 3) PZ-90 positions in meters, NaN without a record
+    """
+    index = find_glonass(glo, sv, t)
+    eph = gather_eph(glo, index)
+    pos = np.stack([eph["X"], eph["Y"], eph["Z"]], axis=-1)
+    vel = np.stack([eph["dX"], eph["dY"], eph["dZ"]], axis=-1)
+    acc = np.stack([eph["dX2"], eph["dY2"], eph["dZ2"]], axis=-1)
+    return glonass_propagate(pos, vel, acc, check_t(t - eph["tb"]))
+
+
+def keplerian_batch(t, eph, system, precision="float64", geo=None):
+    """
+    Keplerian broadcast orbit of any supported system
+
+    GPS goes through satpos_batch (and the compute backends); Galileo,
+    BeiDou and QZSS use the NumPy kernel with their own constants and
+    BeiDou time (GPS - 14 s).
+
+    Parameters:
+    -----------
+    t : numpy.ndarray
+        GPS seconds of week
+    eph : dict
+        Ephemeris arrays broadcastable with t
+    system : str
+        'G', 'E', 'C' or 'J'
+    precision : str
+        Precision tier of satpos.satpos_batch
+    geo : numpy.ndarray, optional
+        BeiDou GEO mask broadcastable with t
+
+    Returns:
+    --------
+    satp : numpy.ndarray
+        (..., 3) ECEF positions in meters
+    """
+    if system == "G":
+        return satpos_batch(t, eph, precision)
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+    gm, we, offset = KEPLER[system]
+    t = np.asarray(t, dtype=np.float64) + offset
+    return _satpos_numpy(t, eph, precision, gm, we, geo)
+
+
+def gnss_position_cube(tables, tow, sv, precision="float64"):
+    """
+    Positions for every (epoch, satellite) pair across constellations
+
+    Parameters:
+    -----------
+    tables : dict
+        Output of nav_tables
+    tow : numpy.ndarray
+        (epochs,) GPS seconds of week
+    sv : array of str
+        Satellite ids of any supported system
+    precision : str
+        Precision tier for the Keplerian systems
+
+    Returns:
+    --------
+    cube : numpy.ndarray
+        (epochs, svs, 3) positions in meters, NaN without ephemeris
+    """
+    tow = np.asarray(tow, dtype=np.float64)
+    sv = np.asarray(sv).astype(str)
+    cube = np.full((len(tow), len(sv), 3), np.nan)
+    systems = np.array([s[0] for s in sv])
+    for system in np.unique(systems):
+        cols = np.flatnonzero(systems == system)
+        ids = sv[cols]
+        if system == "G":
+            cube[:, cols] = position_cube(tables["kepler"], tow, ids, precision)
+        elif system in KEPLER:
+            t = tow[:, None] + KEPLER[system][2]
+            index = find_eph_batch(tables["kepler"], ids[None, :], t)
+            eph = gather_eph(tables["kepler"], index)
+            geo = is_beidou_geo(ids)[None, :] if system == "C" else None
+            cube[:, cols] = keplerian_batch(tow[:, None], eph, system, precision, geo)
+        elif system == "R" and tables["glonass"] is not None:
+            cube[:, cols] = glonass_positions(tables["glonass"], tow[:, None], ids)
+    return cube
+
+
+def synthetic_tables(kepler, day_start):
+    """
+    Galileo, BeiDou and GLONASS tables derived from GPS records
+
+    Used to benchmark the other constellations with GPS-only files: GPS
+    records are relabelled as Galileo and BeiDou MEO satellites, C01-C05
+    get geostationary elements, and GLONASS state vectors are sampled from
+    the GPS orbits every 30 minutes.
+
+    Parameters:
+    -----------
+    kepler : dict
+        find_eph.ephemeris_table of a GPS file
+    day_start : float
+        GPS seconds of week at the start of the day
+
+    Returns:
+    --------
+    tables : dict
+        As nav_tables, with the GPS records kept
+    """
+    prn = np.array([int(s[1:]) for s in kepler["sv"]])
+    parts = [kepler]
+    galileo = dict(kepler, sv=np.array([f"E{p:02d}" for p in prn]))
+    beidou = dict(kepler, sv=np.array([f"C{p + 5:02d}" for p in prn]))
+    parts += [galileo, beidou]
+
+    geo = {k: v[prn <= 5].copy() for k, v in kepler.items()}
+    geo["sv"] = np.array([f"C{int(s[1:]):02d}" for s in geo["sv"]])
+    we = KEPLER["C"][1]
+    geo["sqrtA"][:] = (KEPLER["C"][0] / we**2) ** (1 / 6)
+    for name in ("Eccentricity", "DeltaN", "OmegaDot", "IDOT", "Cuc", "Cus"):
+        geo[name][:] = 0.0
+    for name in ("Crc", "Crs", "Cic", "Cis"):
+        geo[name][:] = 0.0
+    geo["Io"][:] = np.deg2rad(5.0)
+    geo["Omega0"][:] = np.pi + we * geo["Toe"]  # equatorial after the -5 deg tilt
+    geo["M0"] = np.deg2rad(30.0 * np.array([int(s[1:]) for s in geo["sv"]]))
+    parts.append(geo)
+    merged = {k: np.concatenate([p[k] for p in parts]) for k in kepler}
+
+    gps = np.unique(kepler["sv"])[:24]
+    tb = day_start + np.arange(0.0, 86400.0, 1800.0)
+    pos = position_cube(kepler, tb, gps, "exact")
+    vel = position_cube(kepler, tb + 0.5, gps, "exact")
+    vel -= position_cube(kepler, tb - 0.5, gps, "exact")
+    it, isv = np.nonzero(np.isfinite(pos[..., 0]))
+    glo = {"sv": np.array([f"R{s[1:]}" for s in gps[isv]]), "tb": tb[it]}
+    for k, name in enumerate(("X", "Y", "Z")):
+        glo[name] = pos[it, isv, k]
+        glo["d" + name] = vel[it, isv, k]
+        glo["d" + name + "2"] = np.zeros(len(it))
+    return {
+        "kepler": _sorted_unique(merged, "Toe"),
+        "glonass": _sorted_unique(glo, "tb"),
+    }
+
+
+def benchmark_constellations(tables, tow, repeat=3):
+    """
+    Positions per second for each constellation in the tables
+
+    Parameters:
+    -----------
+    tables : dict
+        Output of nav_tables or synthetic_tables
+    tow : numpy.ndarray
+        (epochs,) GPS seconds of week
+    repeat : int
+        Timing runs (best kept)
+
+    Returns:
+    --------
+    results : list of dict
+        'system', 'satellites', 'positions', 'seconds', 'positions_per_s'
+    """
+    ids = np.unique(tables["kepler"]["sv"])
+    if tables["glonass"] is not None:
+        ids = np.concatenate([ids, np.unique(tables["glonass"]["sv"])])
+    systems = np.array([s[0] for s in ids])
+    results = []
+    for system in SYSTEMS:
+        sv = ids[systems == system]
+        if len(sv) == 0:
+            continue
+        best = np.inf
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            cube = gnss_position_cube(tables, tow, sv)
+            best = min(best, time.perf_counter() - t0)
+        positions = int(np.count_nonzero(np.isfinite(cube[..., 0])))
+        results.append(
+            {
+                "system": SYSTEMS[system],
+                "satellites": len(sv),
+                "positions": positions,
+                "seconds": best,
+                "positions_per_s": positions / best,
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark GPS, GLONASS, Galileo, BeiDou and QZSS positions"
+    )
+    parser.add_argument(
+        "--file", type=str, default="data/brdc0680.20n", help="RINEX navigation file"
+    )
+    parser.add_argument("--interval", type=int, default=30, help="Epoch spacing (s)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs")
+    parser.add_argument(
+        "--synthetic",
+        action="store_true",
+        help="Add Galileo/BeiDou/GLONASS records derived from the GPS ones",
+    )
+    args = parser.parse_args()
+
+    nav_data = readrinex(args.file)
+    if nav_data is None:
+        return 1
+    tow = gpsweekcal(nav_day(nav_data), args.interval)[:, 1].astype(np.float64)
+    tables = nav_tables(nav_data)
+    if args.synthetic:
+        tables = synthetic_tables(tables["kepler"], tow[0])
+
+    results = benchmark_constellations(tables, tow, args.repeat)
+    print(f"{'System':<10}{'SVs':>5}{'Positions':>12}{'Time s':>9}{'Positions/s':>14}")
+    for r in results:
+        print(
+            f"{r['system']:<10}{r['satellites']:>5}{r['positions']:>12}"
+            f"{r['seconds']:>9.3f}{r['positions_per_s']:>14.0f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
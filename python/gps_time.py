@@ -9,6 +9,7 @@ Based on MATLAB gps_time.m
 from datetime import datetime, timedelta
 
 import numpy as np
+from backends import dispatch, register
 
 
 def gps_time(julday):
@@ -16,6 +17,8 @@ def gps_time(julday):
     Conversion of Julian Day number to GPS week and seconds of week
     Based on MATLAB gps_time.m
 
+    Large arrays are handed to the compute backend selected in backends.py.
+
     Parameters:
     -----------
     julday : float or array
@@ -28,6 +31,11 @@ def gps_time(julday):
     sec_of_week : float or array
         Seconds of week reckoned from Saturday midnight
     """
+    return dispatch("gps_time", julday, size=np.size(julday))
+
+
+@register("gps_time", "numpy")
+def _gps_time_numpy(julday):
     a = np.floor(julday + 0.5)
     b = a + 1537
     c = np.floor((b - 122.1) / 365.25)
@@ -81,3 +89,55 @@ def gps_time_to_datetime_iso(gps_seconds, year, month, day):
     gps_datetime = gps_epoch + timedelta(seconds=total_seconds)
 
     return gps_datetime.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def gps_time_to_datetime_iso_batch(gps_seconds, year, month, day):
+    """
+    Vectorized gps_time_to_datetime_iso (same strings, one per element)
+
+    Each distinct time is converted once, so rows sharing an epoch are cheap.
+
+    Parameters:
+    -----------
+    gps_seconds : numpy.ndarray
+        GPS seconds of week
+    year, month, day : int
+        A date in the GPS week
+
+    Returns:
+    --------
+    datetime_str : numpy.ndarray
+        ISO formatted datetime strings (YYYY-MM-DDTHH:MM:SSZ)
+    """
+    days = (datetime(year, month, day) - datetime(1980, 1, 6)).days
+    week_start = np.datetime64("1980-01-06", "us") + np.timedelta64(days // 7 * 7, "D")
+    times, inverse = np.unique(np.asarray(gps_seconds), return_inverse=True)
+    micro = np.round(times * 1e6).astype(np.int64).astype("timedelta64[us]")
+    iso = np.datetime_as_string((week_start + micro).astype("datetime64[s]"))
+    return np.char.add(iso, "Z")[inverse]
+
+
+def gps_time_from_calendar(year, month, day, hour=0, minute=0, second=0.0):
+    """
+    Convert a calendar epoch to GPS week and seconds of week
+
+    Parameters:
+    -----------
+    year, month, day : int
+        Calendar date (four digit year)
+    hour, minute : int
+        Time of day
+    second : float
+        Seconds including fraction
+
+    Returns:
+    --------
+    week : int
+        GPS week number
+    sec_of_week : float
+        Seconds of week reckoned from Saturday midnight
+    """
+    days = (datetime(year, month, day) - datetime(1980, 1, 6)).days
+    week = days // 7
+    sec_of_week = (days % 7) * 86400 + hour * 3600 + minute * 60 + second
+    return week, sec_of_week
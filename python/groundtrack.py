@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Ground-Track Coverage Heatmaps
+Streaming sub-satellite point density and footprint coverage rasters
+"""
+
+import argparse
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+from ecef_to_lla import ecef_to_lla
+from find_eph import ephemeris_table
+from gpsweekcal import gpsweekcal
+from positions import iter_position_chunks, nav_day
+from readrinex import readrinex
+
+EARTH_RADIUS = 6371000.0  # Mean radius in meters for footprint geometry
+
+
+class CoverageAccumulator:
+    """
+    Fixed-size lat/lon rasters updated one position chunk at a time
+
+    'density' counts sub-satellite points per cell. 'footprint' counts, per
+    cell, the satellite-epochs seen above the elevation mask. Memory depends
+    only on the raster size and the chunk size, never on the time span.
+    """
+
+    def __init__(self, step=1.0, elev_mask=None, max_memory_mb=128):
+        """
+        Parameters:
+        -----------
+        step : float
+            Raster cell size in degrees
+        elev_mask : float, optional
+            Elevation mask in degrees; enables the footprint raster
+        max_memory_mb : float
+            Budget for the footprint cell-by-position temporaries
+        """
+        self.step = step
+        self.nlat = int(round(180.0 / step))
+        self.nlon = int(round(360.0 / step))
+        self.density = np.zeros(self.nlat * self.nlon, dtype=np.int64)
+        self.epochs = 0
+        self.positions = 0
+
+        self.elev_mask = elev_mask
+        self.max_memory_mb = max_memory_mb
+        if elev_mask is not None:
+            self.footprint = np.zeros(self.nlat * self.nlon, dtype=np.int64)
+            lat = np.radians(-90.0 + step * (np.arange(self.nlat) + 0.5))
+            lon = np.radians(-180.0 + step * (np.arange(self.nlon) + 0.5))
+            lat, lon = np.meshgrid(lat, lon, indexing="ij")
+            self._cell_unit = np.column_stack(
+                [
+                    (np.cos(lat) * np.cos(lon)).ravel(),
+                    (np.cos(lat) * np.sin(lon)).ravel(),
+                    np.sin(lat).ravel(),
+                ]
+            )
+
+    def add(self, cube):
+        """
+        Accumulate a chunk of satellite positions
+
+        Parameters:
+        -----------
+        cube : numpy.ndarray
+            (epochs, svs, 3) ECEF positions in meters (NaN rows ignored)
+        """
+        self.epochs += cube.shape[0]
+        xyz = cube.reshape(-1, 3)
+        xyz = xyz[np.isfinite(xyz).all(axis=1)]
+        self.positions += len(xyz)
+        if len(xyz) == 0:
+            return
+
+        lat, lon, _ = ecef_to_lla(xyz[:, 0], xyz[:, 1], xyz[:, 2])
+        i = np.clip(((lat + 90.0) / self.step).astype(np.int64), 0, self.nlat - 1)
+        j = ((lon + 180.0) / self.step).astype(np.int64) % self.nlon
+        self.density += np.bincount(i * self.nlon + j, minlength=self.density.size)
+
+        if self.elev_mask is not None:
+            self._add_footprints(xyz)
+
+    def _add_footprints(self, xyz):
+        """Count the positions whose visibility cone covers each cell"""
+        r = np.linalg.norm(xyz, axis=1)
+        mask = np.radians(self.elev_mask)
+        # Earth central angle from the sub-satellite point to the mask edge
+        half_angle = np.pi / 2 - mask - np.arcsin(EARTH_RADIUS * np.cos(mask) / r)
+        cos_half = np.cos(half_angle)
+        unit = xyz / r[:, None]
+
+        ncell = len(self._cell_unit)
+        block = max(1, int(self.max_memory_mb * 1e6 // (ncell * 9)))
+        for start in range(0, len(unit), block):
+            cos_angle = self._cell_unit @ unit[start : start + block].T
+            self.footprint += np.count_nonzero(
+                cos_angle >= cos_half[start : start + block], axis=1
+            )
+
+    def rasters(self):
+        """
+        Returns:
+        --------
+        rasters : dict
+            'density' (n_lat, n_lon) counts and, with a mask, 'footprint' as
+            the mean number of satellites in view per epoch
+        """
+        rasters = {"density": self.density.reshape(self.nlat, self.nlon)}
+        if self.elev_mask is not None:
+            rasters["footprint"] = self.footprint.reshape(self.nlat, self.nlon) / max(
+                self.epochs, 1
+            )
+        return rasters
+
+    def save(self, base_filename):
+        """
+        Write the rasters to an .npz file and a PNG image
+
+        Parameters:
+        -----------
+        base_filename : str
+            Output path without extension
+
+        Returns:
+        --------
+        files : list
+            Written file paths
+        """
+        rasters = self.rasters()
+        npz_filename = f"{base_filename}.npz"
+        np.savez_compressed(
+            npz_filename,
+            step=self.step,
+            epochs=self.epochs,
+            positions=self.positions,
+            **rasters,
+        )
+
+        fig, axes = plt.subplots(
+            len(rasters), 1, figsize=(12, 5.5 * len(rasters)), squeeze=False
+        )
+        titles = {
+            "density": "Sub-satellite point density (positions per cell)",
+            "footprint": f"Mean satellites in view (elevation >= {self.elev_mask} deg)",
+        }
+        for ax, (key, raster) in zip(axes[:, 0], rasters.items(), strict=True):
+            image = ax.imshow(
+                raster,
+                origin="lower",
+                extent=(-180, 180, -90, 90),
+                cmap="viridis",
+                aspect="auto",
+            )
+            ax.set_title(titles[key])
+            ax.set_xlabel("Longitude (deg)")
+            ax.set_ylabel("Latitude (deg)")
+            fig.colorbar(image, ax=ax)
+
+        png_filename = f"{base_filename}.png"
+        plt.tight_layout()
+        plt.savefig(png_filename, dpi=150, bbox_inches="tight")
+        plt.close(fig)
+        return [npz_filename, png_filename]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ground-track density and coverage heatmaps"
+    )
+    parser.add_argument(
+        "--file",
+        type=str,
+        nargs="+",
+        default=["data/brdc0680.20n"],
+        help="One or more RINEX navigation files (one per day)",
+    )
+    parser.add_argument("--interval", type=int, default=60, help="Seconds per epoch")
+    parser.add_argument("--step", type=float, default=1.0, help="Cell size (degrees)")
+    parser.add_argument(
+        "--elev_mask",
+        type=float,
+        default=None,
+        help="Also accumulate visibility footprints above this elevation",
+    )
+    parser.add_argument(
+        "--chunk_epochs", type=int, default=720, help="Epochs per position chunk"
+    )
+    args = parser.parse_args()
+
+    accumulator = CoverageAccumulator(args.step, args.elev_mask)
+    for nav_file in args.file:
+        nav_data = readrinex(nav_file)
+        if nav_data is None:
+            continue
+        table = ephemeris_table(nav_data)
+        tow = gpsweekcal(nav_day(nav_data), args.interval)[:, 1].astype(float)
+        sv = np.unique(table["sv"])
+        for _, cube in iter_position_chunks(table, tow, sv, args.chunk_epochs):
+            accumulator.add(cube)
+        print(f"Accumulated {nav_file}: {accumulator.positions} positions so far")
+
+    os.makedirs("results", exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.file[0]))[0]
+    for filename in accumulator.save(f"results/{name}_groundtrack"):
+        print(f"✓ Saved: {filename}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Performance Regression Gate
+Per-stage throughput and peak memory against a stored baseline
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+from backends import select
+from csvio import write_lla
+from ecef_to_lla import ecef_to_lla
+from find_eph import ephemeris_table, find_eph_batch, gather_eph
+from gnss import sv_code
+from readrinex import readrinex
+from satpos import satpos_batch
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+BASELINE_FILE = os.path.join(ROOT, "tests", "python", "perf_baseline.json")
+FILES = ("chur1610.19n", "brdc0680.20n")
+MIN_RATIO = 0.5  # fail below half the baseline throughput
+MEMORY_SLACK = 1.5  # budget = baseline peak x slack
+
+
+def reference_rate(size=1_000_000, repeat=5):
+    """
+    Operations per second of a fixed NumPy and Python workload
+
+    Stage throughputs are divided by this rate so baselines recorded on one
+    machine stay meaningful on a faster or slower one.
+
+    Parameters:
+    -----------
+    size : int
+        Elements of the vector part (the Python loop runs size // 10 times)
+    repeat : int
+        Timing runs (the best is kept)
+
+    Returns:
+    --------
+    rate : float
+        size / best seconds
+    """
+    x = np.linspace(0.1, 10.0, size)
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        y = np.sqrt(x) * np.sin(x) + np.arctan2(x, 1.0 + x)
+        np.sort(y)
+        total = 0
+        for k in range(size // 10):
+            total += k % 7
+        best = min(best, time.perf_counter() - t0)
+    return size / best
+
+
+def _stages(nav_file, interval):
+    """(name, fn, items) for each pipeline stage, each fed by the previous"""
+    state = {}
+
+    def read():
+        state["nav_data"] = readrinex(nav_file)
+
+    def table():
+        state["table"] = ephemeris_table(state["nav_data"])
+        state["sv"] = np.unique(state["table"]["sv"])
+        state["tow"] = np.arange(0.0, 86400.0, interval)
+
+    def find():
+        state["index"] = find_eph_batch(
+            state["table"], state["sv"][None, :], state["tow"][:, None]
+        )
+
+    def positions():
+        eph = gather_eph(state["table"], state["index"])
+        eph = {k: v for k, v in eph.items() if v.dtype.kind == "f"}
+        state["xyz"] = satpos_batch(state["tow"][:, None], eph).reshape(-1, 3)
+
+    def lla():
+        xyz = state["xyz"]
+        state["lla"] = ecef_to_lla(xyz[:, 0], xyz[:, 1], xyz[:, 2])
+
+    def write():
+        rows = np.column_stack(
+            [
+                np.repeat(state["tow"], len(state["sv"])),
+                np.tile(sv_code(state["sv"]), len(state["tow"])),
+                state["xyz"],
+            ]
+        )
+        write_lla(io.StringIO(), rows, 2020, 1, 1)
+
+    def cells():
+        return len(state["tow"]) * len(state["sv"])
+
+    return [
+        ("read", read, lambda: os.path.getsize(nav_file)),
+        ("table", table, lambda: len(state["table"]["sv"])),
+        ("find_eph", find, cells),
+        ("satpos", positions, cells),
+        ("ecef_to_lla", lla, cells),
+        ("write", write, cells),
+    ]
+
+
+def measure(nav_file, interval=30.0, repeat=3):
+    """
+    Throughput and peak traced memory of every stage on one nav file
+
+    Each stage is timed repeat times (best kept) without tracing, then run
+    once more under tracemalloc for its peak allocation.
+
+    Parameters:
+    -----------
+    nav_file : str
+        RINEX navigation file
+    interval : float
+        Epoch spacing of the position grid in seconds
+    repeat : int
+        Timing runs per stage
+
+    Returns:
+    --------
+    result : dict
+        'reference' rate and, per stage, 'items_per_s', 'ratio' (throughput
+        over the reference rate) and 'memory_mb'
+    """
+    ref = reference_rate()
+    result = {"reference": ref, "stages": {}}
+    for name, fn, items in _stages(nav_file, interval):
+        best = np.inf
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rate = items() / best
+        result["stages"][name] = {
+            "items_per_s": rate,
+            "ratio": rate / ref,
+            "memory_mb": peak / 1e6,
+        }
+    return result
+
+
+def baseline_entry(result, memory_slack=MEMORY_SLACK):
+    """Baseline record of a measure() result, with memory budgets"""
+    return {
+        name: {
+            "ratio": float(f"{s['ratio']:.4g}"),
+            "memory_budget_mb": round(max(1.0, s["memory_mb"] * memory_slack), 1),
+        }
+        for name, s in result["stages"].items()
+    }
+
+
+def compare(result, baseline, min_ratio=MIN_RATIO):
+    """
+    Check a measure() result against its baseline entry
+
+    Parameters:
+    -----------
+    result : dict
+        From measure()
+    baseline : dict
+        Per-stage 'ratio' and 'memory_budget_mb' from baseline_entry()
+    min_ratio : float
+        Lowest accepted fraction of the baseline throughput ratio
+
+    Returns:
+    --------
+    failures : list of str
+        One message per regressed stage (empty when all pass)
+    report : str
+        Table of baseline and current values for every stage
+    """
+    failures = []
+    lines = [
+        f"{'Stage':<12}{'Items/s':>13}{'Ratio':>11}{'Baseline':>11}{'Change':>9}"
+        f"{'Peak MB':>10}{'Budget':>9}  Status"
+    ]
+    for name, s in result["stages"].items():
+        base = baseline.get(name)
+        if base is None:
+            lines.append(f"{name:<12}{s['items_per_s']:>13.0f}{s['ratio']:>11.4g}")
+            continue
+        change = s["ratio"] / base["ratio"]
+        status = []
+        if change < min_ratio:
+            status.append("SLOW")
+            failures.append(
+                f"{name}: throughput at {change:.0%} of baseline "
+                f"(minimum {min_ratio:.0%})"
+            )
+        if s["memory_mb"] > base["memory_budget_mb"]:
+            status.append("MEMORY")
+            failures.append(
+                f"{name}: peak {s['memory_mb']:.1f} MB over the "
+                f"{base['memory_budget_mb']:.1f} MB budget"
+            )
+        lines.append(
+            f"{name:<12}{s['items_per_s']:>13.0f}{s['ratio']:>11.4g}"
+            f"{base['ratio']:>11.4g}{change - 1:>+9.0%}{s['memory_mb']:>10.1f}"
+            f"{base['memory_budget_mb']:>9.1f}  {' '.join(status) or 'ok'}"
+        )
+    return failures, "\n".join(lines)
+
+
+def load_baseline(filename=BASELINE_FILE):
+    """Stored baseline, or an empty one when the file does not exist"""
+    if not os.path.exists(filename):
+        return {"files": {}}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check stage throughput and memory against the saved baseline"
+    )
+    parser.add_argument(
+        "--files", nargs="+", default=list(FILES), help="Nav files in data/"
+    )
+    parser.add_argument("--interval", type=float, default=30.0, help="Epoch spacing")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs")
+    parser.add_argument(
+        "--min_ratio",
+        type=float,
+        default=MIN_RATIO,
+        help="Lowest accepted fraction of the baseline throughput",
+    )
+    parser.add_argument(
+        "--baseline", type=str, default=BASELINE_FILE, help="Baseline JSON file"
+    )
+    parser.add_argument(
+        "--update", action="store_true", help="Store the measurements as baseline"
+    )
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    backend = select("satpos")
+    recorded = baseline.get("machine", {}).get("satpos_backend", backend)
+    if recorded != backend:
+        print(f"Note: baseline recorded with the {recorded} satpos backend")
+    failed = False
+    for name in args.files:
+        result = measure(os.path.join(ROOT, "data", name), args.interval, args.repeat)
+        print(f"\n{name} (reference {result['reference']:.3g} ops/s)")
+        failures, report = compare(
+            result, baseline["files"].get(name, {}), args.min_ratio
+        )
+        print(report)
+        for message in failures:
+            print(f"✗ {message}")
+        failed |= bool(failures)
+        baseline["files"][name] = baseline_entry(result)
+
+    if args.update:
+        baseline["machine"] = {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "satpos_backend": backend,
+        }
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1)
+            f.write("\n")
+        print(f"✓ Saved: {args.baseline}")
+        return 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Staged Processing Pipeline
+Threaded stages connected by bounded queues, with per-stage utilization
+"""
+
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One pipeline stage: a function applied to every item by worker threads
+
+    Parameters:
+    -----------
+    name : str
+        Label used in the statistics
+    fn : callable
+        fn(item) -> output item passed downstream (ignored for the last stage)
+    workers : int
+        Number of threads running fn concurrently
+    ordered : bool
+        Process items in source order (requires a single worker), as
+        needed by stages that append to a file
+    """
+
+    def __init__(self, name, fn, workers=1, ordered=False):
+        if ordered and workers != 1:
+            raise ValueError(f"Ordered stage '{name}' must have one worker")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.ordered = ordered
+        self.items = 0
+        self.busy = 0.0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+        self._lock = threading.Lock()
+
+    def _record(self, busy=0.0, wait_in=0.0, wait_out=0.0, items=0):
+        with self._lock:
+            self.busy += busy
+            self.wait_in += wait_in
+            self.wait_out += wait_out
+            self.items += items
+
+
+def _source_worker(source, stage, outq, failed):
+    iterator = iter(source)
+    seq = 0
+    while not failed.is_set():
+        t0 = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            break
+        except Exception as e:
+            failed.set()
+            failed.error = e
+            break
+        t1 = time.perf_counter()
+        outq.put((seq, item))
+        stage._record(busy=t1 - t0, wait_out=time.perf_counter() - t1, items=1)
+        seq += 1
+    outq.put(_DONE)
+
+
+def _stage_worker(stage, inq, outq, remaining, failed):
+    pending = {}
+    next_seq = 0
+    while True:
+        t0 = time.perf_counter()
+        item = inq.get()
+        wait_in = time.perf_counter() - t0
+        if item is _DONE:
+            stage._record(wait_in=wait_in)
+            inq.put(_DONE)  # let sibling workers see the end too
+            with stage._lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last and outq is not None:
+                outq.put(_DONE)
+            return
+
+        if stage.ordered:
+            pending[item[0]] = item[1]
+            ready = []
+            while next_seq in pending:
+                ready.append((next_seq, pending.pop(next_seq)))
+                next_seq += 1
+        else:
+            ready = [item]
+
+        for seq, payload in ready:
+            if failed.is_set():
+                continue  # drain so upstream stages never block
+            t1 = time.perf_counter()
+            try:
+                result = stage.fn(payload)
+            except Exception as e:
+                failed.error = e
+                failed.set()
+                continue
+            t2 = time.perf_counter()
+            if outq is not None:
+                outq.put((seq, result))
+            stage._record(
+                busy=t2 - t1,
+                wait_in=wait_in,
+                wait_out=time.perf_counter() - t2,
+                items=1,
+            )
+            wait_in = 0.0
+
+
+def run_stages(source, stages, queue_size=4, source_name="parse"):
+    """
+    Run a source iterator through a chain of stages concurrently
+
+    Each stage runs in its own thread(s). Stages are connected by queues of
+    at most queue_size items, so a slow stage applies backpressure instead
+    of letting memory grow.
+
+    Parameters:
+    -----------
+    source : iterable
+        Produces the work items (its iteration time counts as a stage)
+    stages : list of Stage
+        Processing stages in order
+    queue_size : int
+        Capacity of each inter-stage queue
+    source_name : str
+        Label of the source stage in the statistics
+
+    Returns:
+    --------
+    stats : list of dict
+        Per-stage 'stage', 'workers', 'items', 'busy_s', 'wait_in_s',
+        'wait_out_s' and 'utilization' (busy time / wall time per worker)
+    """
+    source_stage = Stage(source_name, None)
+    queues = [queue.Queue(queue_size) for _ in stages]
+    failed = threading.Event()
+    failed.error = None
+
+    threads = [
+        threading.Thread(
+            target=_source_worker, args=(source, source_stage, queues[0], failed)
+        )
+    ]
+    for k, stage in enumerate(stages):
+        outq = queues[k + 1] if k + 1 < len(stages) else None
+        remaining = [stage.workers]
+        for _ in range(stage.workers):
+            threads.append(
+                threading.Thread(
+                    target=_stage_worker,
+                    args=(stage, queues[k], outq, remaining, failed),
+                )
+            )
+
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - t0
+
+    if failed.error is not None:
+        raise failed.error
+
+    return [
+        {
+            "stage": s.name,
+            "workers": s.workers,
+            "items": s.items,
+            "busy_s": s.busy,
+            "wait_in_s": s.wait_in,
+            "wait_out_s": s.wait_out,
+            "utilization": s.busy / (wall * s.workers) if wall > 0 else 0.0,
+        }
+        for s in [source_stage] + list(stages)
+    ]
+
+
+def format_stats(stats):
+    """Render run_stages statistics as a table naming the bottleneck"""
+    lines = [
+        f"{'Stage':<12}{'Workers':>8}{'Items':>8}{'Busy s':>10}"
+        f"{'Wait in':>10}{'Wait out':>10}{'Util':>8}"
+    ]
+    for s in stats:
+        lines.append(
+            f"{s['stage']:<12}{s['workers']:>8}{s['items']:>8}{s['busy_s']:>10.3f}"
+            f"{s['wait_in_s']:>10.3f}{s['wait_out_s']:>10.3f}"
+            f"{100 * s['utilization']:>7.0f}%"
+        )
+    bottleneck = max(stats, key=lambda s: s["utilization"])
+    lines.append(f"Bottleneck: {bottleneck['stage']}")
+    return "\n".join(lines)
@@ -10,12 +10,13 @@ import os
 import matplotlib.animation as animation
 import matplotlib.pyplot as plt
 import numpy as np
+from csvio import base_name, load_rows
 
 
 def load_and_prepare_data(csv_file, max_epochs=1000):
     """Load and prepare satellite data from CSV file"""
     print(f"Loading data from {csv_file}...")
-    data = np.loadtxt(csv_file, delimiter=",")
+    data = load_rows(csv_file)  # plain, .gz or .zst
 
     # Filter out NaN values
     valid_data = data[~np.isnan(data[:, 2])]  # Remove rows where X is NaN
@@ -52,21 +53,12 @@ def setup_3d_plot(figsize=(12, 10)):
     return fig, ax
 
 
-def set_plot_limits(ax, valid_data):
-    """Set equal aspect ratio for 3D plot"""
-    max_range = (
-        np.array(
-            [
-                valid_data[:, 2].max() - valid_data[:, 2].min(),
-                valid_data[:, 3].max() - valid_data[:, 3].min(),
-                valid_data[:, 4].max() - valid_data[:, 4].min(),
-            ]
-        ).max()
-        / 2.0
-    )
-    mid_x = (valid_data[:, 2].max() + valid_data[:, 2].min()) * 0.5
-    mid_y = (valid_data[:, 3].max() + valid_data[:, 3].min()) * 0.5
-    mid_z = (valid_data[:, 4].max() + valid_data[:, 4].min()) * 0.5
+def set_plot_limits(ax, xyz):
+    """Set equal aspect ratio for 3D plot of (n, 3) positions (NaN ignored)"""
+    high = np.nanmax(xyz, axis=0)
+    low = np.nanmin(xyz, axis=0)
+    max_range = (high - low).max() / 2.0
+    mid_x, mid_y, mid_z = (high + low) * 0.5
 
     ax.set_xlim(mid_x - max_range, mid_x + max_range)
     ax.set_ylim(mid_y - max_range, mid_y + max_range)
@@ -76,11 +68,28 @@ def set_plot_limits(ax, valid_data):
 def get_output_filename(csv_file, output_file, suffix="", ext="png"):
     """Generate output filename"""
     if output_file is None:
-        base_name = os.path.splitext(os.path.basename(csv_file))[0]
-        output_file = f"results/{base_name}{suffix}.{ext}"
+        output_file = f"results/{base_name(csv_file)}{suffix}.{ext}"
     return output_file
 
 
+def plot_track(ax, xyz, color, label):
+    """Line of one satellite's (n, 3) positions, or points when n <= 10"""
+    if len(xyz) > 10:
+        ax.plot(
+            xyz[:, 0],
+            xyz[:, 1],
+            xyz[:, 2],
+            color=color,
+            linewidth=1.5,
+            label=label,
+            alpha=0.8,
+        )
+    else:
+        ax.scatter(
+            xyz[:, 0], xyz[:, 1], xyz[:, 2], color=color, s=20, label=label, alpha=0.6
+        )
+
+
 def plot_satellites(csv_file, max_epochs=1000, output_file=None):
     """Plot satellite positions from CSV file"""
     # Load and prepare data
@@ -97,32 +106,12 @@ def plot_satellites(csv_file, max_epochs=1000, output_file=None):
         sat_data = valid_data[valid_data[:, 1] == sat]
         if len(sat_data) > 0:
             sat_data = sat_data[sat_data[:, 0].argsort()]  # Sort by time
-
-            if len(sat_data) > 10:
-                ax.plot(
-                    sat_data[:, 2],
-                    sat_data[:, 3],
-                    sat_data[:, 4],
-                    color=colors[i],
-                    linewidth=1.5,
-                    label=f"Sat {int(sat):02d}",
-                    alpha=0.8,
-                )
-            else:
-                ax.scatter(
-                    sat_data[:, 2],
-                    sat_data[:, 3],
-                    sat_data[:, 4],
-                    color=colors[i],
-                    s=20,
-                    label=f"Sat {int(sat):02d}",
-                    alpha=0.6,
-                )
+            plot_track(ax, sat_data[:, 2:5], colors[i], f"Sat {int(sat):02d}")
 
     # Configure plot
     ax.set_title("GPS Satellite Orbits (ECEF Coordinates)")
     ax.legend(bbox_to_anchor=(1.05, 1), loc="upper left")
-    set_plot_limits(ax, valid_data)
+    set_plot_limits(ax, valid_data[:, 2:5])
 
     # Save plot
     output_file = get_output_filename(csv_file, output_file)
@@ -132,6 +121,38 @@ def plot_satellites(csv_file, max_epochs=1000, output_file=None):
     return output_file
 
 
+def plot_cube(cube, output_file, max_epochs=1000):
+    """
+    Plot satellite orbits straight from a svcube.PositionCube
+
+    Each satellite is drawn from a view of the cube's coordinates, so no
+    CSV is read back and no rows are built.
+    """
+    part = cube.epochs(0, max_epochs)
+    valid = part.valid
+    satellites = np.nonzero(valid.any(axis=0))[0]
+    if len(satellites) == 0:
+        print("No valid satellite position data found")
+        return None
+    print(f"Found {len(satellites)} satellites: {part.sv[satellites]}")
+
+    fig, ax = setup_3d_plot()
+    colors = plt.cm.tab20(np.linspace(0, 1, len(satellites)))
+    for i, j in enumerate(satellites):
+        xyz = part.xyz[:, j]
+        xyz = xyz if valid[:, j].all() else xyz[valid[:, j]]
+        plot_track(ax, xyz, colors[i], f"Sat {int(part.sv[j]):02d}")
+
+    ax.set_title("GPS Satellite Orbits (ECEF Coordinates)")
+    ax.legend(bbox_to_anchor=(1.05, 1), loc="upper left")
+    set_plot_limits(ax, part.xyz.reshape(-1, 3))
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=300, bbox_inches="tight")
+    plt.close(fig)
+    print(f"Saved plot: {output_file}")
+    return output_file
+
+
 def plot_animation(csv_file, max_epochs=1000, output_file=None, format="gif"):
     """Create animated plot of satellite positions from CSV file"""
     # Load and prepare data
@@ -176,7 +197,7 @@ def plot_animation(csv_file, max_epochs=1000, output_file=None, format="gif"):
     # Configure plot
     ax.set_title("GPS Satellite Orbits Animation (ECEF Coordinates)")
     ax.legend(bbox_to_anchor=(1.05, 1), loc="upper left")
-    set_plot_limits(ax, valid_data)
+    set_plot_limits(ax, valid_data[:, 2:5])
 
     def animate(frame):
         current_time = unique_times[frame]
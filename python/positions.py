@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Satellite Position Engine
+Batch satellite positions on an (epoch x SV) grid
+"""
+
+import numpy as np
+from find_eph import find_eph_batch, gather_eph
+from satpos import satpos_batch
+
+
+def nav_day(nav_data):
+    """
+    Day covered by a navigation dataset
+
+    Parameters:
+    -----------
+    nav_data : xarray.Dataset
+        Navigation data loaded by georinex
+
+    Returns:
+    --------
+    date : list
+        [year, month, day] of the median record time
+    """
+    days = nav_data.time.values.astype("datetime64[D]").astype(np.int64)
+    day = np.datetime64(int(np.median(days)), "D").astype(object)
+    return [day.year, day.month, day.day]
+
+
+def position_cube(table, tow, sv, precision="float64"):
+    """
+    Satellite ECEF positions for every (epoch, SV) pair
+
+    Parameters:
+    -----------
+    table : dict
+        Output of find_eph.ephemeris_table
+    tow : numpy.ndarray
+        (epochs,) GPS seconds of week
+    sv : numpy.ndarray
+        (svs,) satellite ids or GPS PRNs
+    precision : str
+        Precision tier of satpos.satpos_batch
+
+    Returns:
+    --------
+    cube : numpy.ndarray
+        (epochs, svs, 3) positions in meters, NaN where the satellite has
+        no ephemeris
+    """
+    tow = np.asarray(tow, dtype=np.float64)
+    index = find_eph_batch(table, np.asarray(sv)[None, :], tow[:, None])
+    return satpos_batch(tow[:, None], gather_eph(table, index), precision)
+
+
+def iter_position_chunks(table, tow, sv, chunk_epochs=2880):
+    """
+    Compute the position cube in blocks of epochs
+
+    Parameters:
+    -----------
+    table : dict
+        Output of find_eph.ephemeris_table
+    tow : numpy.ndarray
+        (epochs,) GPS seconds of week
+    sv : numpy.ndarray
+        (svs,) satellite ids or GPS PRNs
+    chunk_epochs : int
+        Epochs per block
+
+    Yields:
+    -------
+    tow_chunk : numpy.ndarray
+        (block,) times of the block
+    cube : numpy.ndarray
+        (block, svs, 3) positions in meters
+    """
+    tow = np.asarray(tow, dtype=np.float64)
+    for start in range(0, len(tow), chunk_epochs):
+        tow_chunk = tow[start : start + chunk_epochs]
+        yield tow_chunk, position_cube(table, tow_chunk, sv)
@@ -6,7 +6,213 @@ Based on MATLAB rinexe.m and get_eph.m
 @author: Based on Kai Borre's MATLAB implementation
 """
 
+import gzip
+import hashlib
+import io
+from dataclasses import dataclass
+
 import georinex as gr
+import numpy as np
+
+# The 29 broadcast values of a RINEX 2 GPS record, in file order
+GPS_NAV_FIELDS = (
+    "SVclockBias",
+    "SVclockDrift",
+    "SVclockDriftRate",
+    "IODE",
+    "Crs",
+    "DeltaN",
+    "M0",
+    "Cuc",
+    "Eccentricity",
+    "Cus",
+    "sqrtA",
+    "Toe",
+    "Cic",
+    "Omega0",
+    "Cis",
+    "Io",
+    "Crc",
+    "omega",
+    "OmegaDot",
+    "IDOT",
+    "CodesL2",
+    "GPSWeek",
+    "L2Pflag",
+    "SVacc",
+    "health",
+    "TGD",
+    "IODC",
+    "TransTime",
+    "FitIntvl",
+)
+
+
+@dataclass
+class NavHeader:
+    """
+    Header fields of a RINEX navigation file and the span of its records
+
+    Epochs are numpy datetime64 in the file's time system. date is the
+    [year, month, day] covered by most records (broadcast files often
+    start with a record from the evening before).
+    """
+
+    version: float
+    file_type: str  # 'N' GPS, 'G' GLONASS, 'M' mixed (RINEX 3 system letter)
+    leap_seconds: int | None = None
+    ion_alpha: np.ndarray | None = None  # (4,) Klobuchar alpha coefficients
+    ion_beta: np.ndarray | None = None  # (4,) Klobuchar beta coefficients
+    first_epoch: np.datetime64 | None = None
+    last_epoch: np.datetime64 | None = None
+    date: list | None = None
+    sha256: str | None = None  # digest of the decompressed file bytes
+
+
+def _floats(text, width=12):
+    """Fixed-width RINEX numbers (with D exponents) from a header field"""
+    text = text.replace("D", "E").replace("d", "e")
+    values = [text[i : i + width].strip() for i in range(0, len(text), width)]
+    return np.array([float(v) for v in values if v])
+
+
+def parse_nav_header(lines):
+    """
+    Parse header lines of a RINEX 2 or 3 navigation file
+
+    Parameters:
+    -----------
+    lines : iterable of str
+        File lines; reading stops at END OF HEADER
+
+    Returns:
+    --------
+    header : NavHeader
+        Header fields (epochs and date are left empty)
+    """
+    header = None
+    for line in lines:
+        label = line[60:].strip()
+        if label == "RINEX VERSION / TYPE":
+            file_type = line[20]
+            if file_type in "Nn" and float(line[:9]) >= 3 and line[40:41].strip():
+                file_type = line[40]  # RINEX 3 puts the system in column 41
+            header = NavHeader(float(line[:9]), file_type.upper())
+        elif header is None:
+            raise ValueError("The first line is not a RINEX VERSION / TYPE line")
+        elif label == "LEAP SECONDS":
+            header.leap_seconds = int(line[:6])
+        elif label == "ION ALPHA":
+            header.ion_alpha = _floats(line[2:50])
+        elif label == "ION BETA":
+            header.ion_beta = _floats(line[2:50])
+        elif label == "IONOSPHERIC CORR" and line[:4] in ("GPSA", "GPSB"):
+            field = "ion_alpha" if line[:4] == "GPSA" else "ion_beta"
+            setattr(header, field, _floats(line[5:53]))
+        elif label == "END OF HEADER":
+            break
+    if header is None:
+        raise ValueError("Empty RINEX header")
+    return header
+
+
+def _is_gzip(file):
+    """Whether a file starts with the gzip magic bytes"""
+    with open(file, "rb") as f:
+        return f.read(2) == b"\x1f\x8b"
+
+
+def read_text(file):
+    """Bytes and decoded text of a plain or gzip-compressed file"""
+    with open(file, "rb") as f:
+        data = f.read()
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    return data, data.decode("ascii", errors="ignore")
+
+
+def _main_day(epochs):
+    """[year, month, day] most of the given datetime64 epochs fall on"""
+    days = np.asarray(epochs).astype("datetime64[D]").astype(np.int64)
+    day = np.datetime64(int(np.median(days)), "D").astype(object)
+    return [day.year, day.month, day.day]
+
+
+def _record_epoch(line, version):
+    """Epoch of a record's first line as datetime64[s]"""
+    if version >= 3:
+        fields = line[4:23].split()  # 'G01 2020 03 08 00 00 00'
+    else:
+        fields = line[3:22].split()  # ' 2 20  3  8  0  0  0.0'
+    year, month, day, hour, minute = (int(x) for x in fields[:5])
+    if year < 100:
+        year += 2000 if year < 80 else 1900
+    return np.datetime64(
+        f"{year:04d}-{month:02d}-{day:02d}T{hour:02d}:{minute:02d}"
+    ) + np.timedelta64(int(float(fields[5])), "s")
+
+
+def read_nav(file):
+    """
+    Read a RINEX navigation file in a single pass
+
+    The file is read once; the header is parsed from the same text that is
+    handed to georinex, so LEAP SECONDS and the Klobuchar coefficients are
+    kept and nothing has to open the file again.
+
+    Parameters:
+    -----------
+    file : str
+        Path to RINEX navigation file (plain or .gz)
+
+    Returns:
+    --------
+    header : NavHeader
+        Typed header with the first/last record epochs and the day covered
+    nav_data : xarray.Dataset
+        Navigation data loaded by georinex
+    """
+    data, text = read_text(file)
+    header = parse_nav_header(io.StringIO(text))
+    nav_data = gr.load(io.StringIO(text))
+
+    times = nav_data.time.values
+    header.first_epoch = times.min()
+    header.last_epoch = times.max()
+    header.date = _main_day(times)
+    header.sha256 = hashlib.sha256(data).hexdigest()
+    return header, nav_data
+
+
+def read_nav_header(file):
+    """
+    Header of a navigation file without parsing its records
+
+    Only the epoch line of each record is read, for callers that need the
+    date of many files before deciding which to load. date follows
+    read_nav: the day most records fall on, not the day of a record from
+    the evening before that may open the file.
+
+    Parameters:
+    -----------
+    file : str
+        Path to RINEX navigation file (plain or .gz)
+
+    Returns:
+    --------
+    header : NavHeader
+        Header fields, first/last record epochs and date
+    """
+    opener = gzip.open if _is_gzip(file) else open
+    with opener(file, "rt", errors="ignore") as f:
+        header = parse_nav_header(f)
+        # Record lines start with the satellite; continuation lines are indented
+        epochs = [_record_epoch(line, header.version) for line in f if line[:2].strip()]
+    if epochs:
+        header.first_epoch = min(epochs)
+        header.last_epoch = max(epochs)
+        header.date = _main_day(epochs)
+    return header
 
 
 def readrinex(file):
@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+"""
+Read RINEX Observation File
+Streaming reader for RINEX 2.x observation (.o) files
+
+@author: Based on the RINEX 2.11 format specification
+"""
+
+import argparse
+import os
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+from gps_time import gps_time_from_calendar
+
+SECONDS_PER_WEEK = 604800
+
+
+@dataclass
+class ObsChunk:
+    """
+    A block of consecutive observation epochs
+
+    Every observation type is stored as its own (SV x epoch) float64 array,
+    with the loss-of-lock and signal-strength indicators kept in separate
+    uint8 arrays of the same shape (0 where the flag was blank).
+    """
+
+    week: np.ndarray  # (epochs,) int32 GPS week
+    tow: np.ndarray  # (epochs,) float64 GPS seconds of week
+    sv: np.ndarray  # (svs,) satellite ids such as 'G01'
+    obs: dict = field(default_factory=dict)  # type -> (svs, epochs) float64
+    lli: dict = field(default_factory=dict)  # type -> (svs, epochs) uint8
+    ssi: dict = field(default_factory=dict)  # type -> (svs, epochs) uint8
+
+    @property
+    def nbytes(self):
+        arrays = [self.week, self.tow, self.sv]
+        for store in (self.obs, self.lli, self.ssi):
+            arrays.extend(store.values())
+        return sum(a.nbytes for a in arrays)
+
+
+def normalize_sv(sv):
+    """
+    Convert a satellite identifier to the 'G01' style used by georinex
+
+    Parameters:
+    -----------
+    sv : int or str
+        Satellite number (GPS assumed) or RINEX identifier
+
+    Returns:
+    --------
+    sv_id : str
+        Three character satellite identifier
+    """
+    if isinstance(sv, (int, np.integer)):
+        return f"G{int(sv):02d}"
+    sv = str(sv).strip()
+    if sv[0].isdigit():
+        return f"G{int(sv):02d}"
+    return f"{sv[0].upper()}{int(sv[1:]):02d}"
+
+
+def read_obs_header(f):
+    """
+    Read the header of a RINEX 2.x observation file
+
+    Parameters:
+    -----------
+    f : file object
+        Open RINEX observation file positioned at the start
+
+    Returns:
+    --------
+    header : dict
+        version, obs_types, interval, marker_name, approx_position and
+        time_of_first_obs (when present)
+    """
+    header = {"obs_types": [], "interval": None}
+    for line in f:
+        label = line[60:80].strip()
+        if label == "RINEX VERSION / TYPE":
+            header["version"] = float(line[:9])
+            if line[20] != "O":
+                raise ValueError(f"Not an observation file (type '{line[20]}')")
+            if header["version"] >= 3:
+                raise ValueError("Only RINEX 2.x observation files are supported")
+        elif label == "# / TYPES OF OBSERV":
+            header["obs_types"].extend(line[6:60].split())
+        elif label == "INTERVAL":
+            header["interval"] = float(line[:10])
+        elif label == "MARKER NAME":
+            header["marker_name"] = line[:60].strip()
+        elif label == "APPROX POSITION XYZ":
+            header["approx_position"] = np.array(
+                [float(line[i : i + 14]) for i in (0, 14, 28)]
+            )
+        elif label == "TIME OF FIRST OBS":
+            parts = line[:43].split()
+            header["time_of_first_obs"] = datetime(
+                *[int(p) for p in parts[:5]], int(float(parts[5]))
+            )
+        elif label == "END OF HEADER":
+            break
+    if not header["obs_types"]:
+        raise ValueError("Missing '# / TYPES OF OBSERV' header record")
+    return header
+
+
+def _epoch_flag(line):
+    """Return (flag, count) of an epoch line (cols 29 and 30-32)"""
+    flag = int(line[28]) if line[28:29].strip() else 0
+    count = int(line[29:32]) if line[29:32].strip() else 0
+    return flag, count
+
+
+def _parse_epoch_line(line):
+    """Return (gps_seconds, sat_field) for an observation epoch line"""
+    yy = int(line[1:3])
+    # RINEX 2 two-digit years: 80-99 -> 19xx, 00-79 -> 20xx
+    year = yy + 1900 if yy >= 80 else yy + 2000
+    week, sow = gps_time_from_calendar(
+        year,
+        int(line[4:6]),
+        int(line[7:9]),
+        int(line[10:12]),
+        int(line[13:15]),
+        float(line[15:26]),
+    )
+    return week * SECONDS_PER_WEEK + sow, line[32:68]
+
+
+def _build_chunk(times, sv_axis, records, obs_types, keep_types):
+    """Assemble collected epoch records into per-signal arrays"""
+    times = np.asarray(times, dtype=np.float64)
+    if sv_axis is None:
+        sv_axis = sorted({rec[1] for rec in records})
+    sv_index = {sv: k for k, sv in enumerate(sv_axis)}
+
+    nep, nsv = len(times), len(sv_axis)
+    ep = np.fromiter((rec[0] for rec in records), dtype=np.intp, count=len(records))
+    sv = np.fromiter(
+        (sv_index[rec[1]] for rec in records), dtype=np.intp, count=len(records)
+    )
+    values = np.array([rec[2] for rec in records], dtype=np.float64).reshape(
+        len(records), len(obs_types)
+    )
+    flags = np.array([rec[3] for rec in records], dtype=np.uint8).reshape(
+        len(records), len(obs_types), 2
+    )
+
+    chunk = ObsChunk(
+        week=(times // SECONDS_PER_WEEK).astype(np.int32),
+        tow=np.mod(times, SECONDS_PER_WEEK),
+        sv=np.array(sv_axis),
+    )
+    for k, obs_type in enumerate(obs_types):
+        if obs_type not in keep_types:
+            continue
+        obs = np.full((nsv, nep), np.nan)
+        lli = np.zeros((nsv, nep), dtype=np.uint8)
+        ssi = np.zeros((nsv, nep), dtype=np.uint8)
+        obs[sv, ep] = values[:, k]
+        lli[sv, ep] = flags[:, k, 0]
+        ssi[sv, ep] = flags[:, k, 1]
+        chunk.obs[obs_type] = obs
+        chunk.lli[obs_type] = lli
+        chunk.ssi[obs_type] = ssi
+    return chunk
+
+
+def _parse_field(text):
+    """Parse one 16 character observation field into (value, lli, ssi)"""
+    value = text[:14].strip()
+    lli = text[14:15].strip()
+    ssi = text[15:16].strip()
+    return (
+        float(value) if value else np.nan,
+        int(lli) if lli else 0,
+        int(ssi) if ssi else 0,
+    )
+
+
+def iter_obs_chunks(
+    file, chunk_epochs=3600, svs=None, tstart=None, tend=None, obs_types=None
+):
+    """
+    Stream a RINEX 2.x observation file as fixed-size epoch chunks
+
+    Satellites and epochs outside the requested selection are skipped while
+    parsing, so their observations are never converted or stored.
+
+    Parameters:
+    -----------
+    file : str
+        Path to RINEX observation file
+    chunk_epochs : int
+        Maximum number of epochs per chunk
+    svs : list, optional
+        Satellites to keep (ints for GPS PRNs or ids like 'G05')
+    tstart, tend : datetime, optional
+        Inclusive GPS time window to keep
+    obs_types : list, optional
+        Observation types to keep (e.g. ['C1', 'P2']). Default: all
+
+    Yields:
+    -------
+    chunk : ObsChunk
+        Observations for up to chunk_epochs epochs
+    """
+    sv_axis = None if svs is None else sorted({normalize_sv(s) for s in svs})
+    sv_filter = None if sv_axis is None else set(sv_axis)
+    t0 = -np.inf if tstart is None else _datetime_to_gps_seconds(tstart)
+    t1 = np.inf if tend is None else _datetime_to_gps_seconds(tend)
+
+    with open(file) as f:
+        header = read_obs_header(f)
+        types = header["obs_types"]
+        keep_types = set(types if obs_types is None else obs_types)
+        lines_per_sat = (len(types) + 4) // 5
+
+        times, records = [], []
+        for line in f:
+            if not line.strip():
+                continue
+            flag, nsat = _epoch_flag(line)
+            if flag > 1 and flag != 6:
+                # Event flag: the count is a number of special records, and
+                # the date fields may be blank (flags 2-5)
+                for _ in range(nsat):
+                    next(f)
+                continue
+            t, sat_field = _parse_epoch_line(line)
+
+            sats = [sat_field[3 * k : 3 * k + 3] for k in range(min(nsat, 12))]
+            while len(sats) < nsat:
+                cont = next(f)[32:68]
+                sats.extend(cont[3 * k : 3 * k + 3] for k in range(12))
+            sats = [normalize_sv(s) for s in sats[:nsat]]
+
+            keep_epoch = flag != 6 and t0 <= t <= t1
+            if t > t1:
+                break
+
+            if keep_epoch:
+                ep = len(times)
+                times.append(t)
+
+            for sv in sats:
+                block = [next(f) for _ in range(lines_per_sat)]
+                if not keep_epoch or (sv_filter is not None and sv not in sv_filter):
+                    continue
+                text = "".join(b.rstrip("\r\n").ljust(80) for b in block)
+                fields = [
+                    _parse_field(text[16 * k : 16 * k + 16])
+                    for k in range(5 * lines_per_sat)
+                ]
+                fields = fields[: len(types)]
+                records.append(
+                    (
+                        ep,
+                        sv,
+                        [fld[0] for fld in fields],
+                        [(fld[1], fld[2]) for fld in fields],
+                    )
+                )
+
+            if len(times) == chunk_epochs:
+                yield _build_chunk(times, sv_axis, records, types, keep_types)
+                times, records = [], []
+
+        if times:
+            yield _build_chunk(times, sv_axis, records, types, keep_types)
+
+
+def _datetime_to_gps_seconds(dt):
+    """Absolute GPS seconds for a datetime"""
+    week, sow = gps_time_from_calendar(
+        dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second + dt.microsecond / 1e6
+    )
+    return week * SECONDS_PER_WEEK + sow
+
+
+def is_pseudorange(obs_type):
+    """True for RINEX 2 code observations (C1, P1, P2, C2, C5, ...)"""
+    return obs_type[0] in ("C", "P")
+
+
+def save_pseudorange_store(chunks, out_dir):
+    """
+    Write the pseudorange observations of a chunk stream to disk
+
+    Each chunk becomes one compressed .npz part holding the time axis, SV
+    axis and one (SV x epoch) array per code observation, so the store can
+    be built and read back without holding the whole file in memory.
+
+    Parameters:
+    -----------
+    chunks : iterable of ObsChunk
+        Output of iter_obs_chunks
+    out_dir : str
+        Directory for the store parts
+
+    Returns:
+    --------
+    parts : list
+        Paths of the written parts
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    parts = []
+    for k, chunk in enumerate(chunks):
+        arrays = {"week": chunk.week, "tow": chunk.tow, "sv": chunk.sv}
+        for obs_type, values in chunk.obs.items():
+            if is_pseudorange(obs_type):
+                arrays[f"obs_{obs_type}"] = values
+                arrays[f"lli_{obs_type}"] = chunk.lli[obs_type]
+        path = os.path.join(out_dir, f"part_{k:05d}.npz")
+        np.savez_compressed(path, **arrays)
+        parts.append(path)
+    return parts
+
+
+def load_pseudorange_store(out_dir):
+    """
+    Read back a pseudorange store chunk by chunk
+
+    Parameters:
+    -----------
+    out_dir : str
+        Directory written by save_pseudorange_store
+
+    Yields:
+    -------
+    chunk : ObsChunk
+        Pseudorange chunk (SSI flags are not stored)
+    """
+    for name in sorted(os.listdir(out_dir)):
+        if not (name.startswith("part_") and name.endswith(".npz")):
+            continue
+        with np.load(os.path.join(out_dir, name)) as data:
+            chunk = ObsChunk(week=data["week"], tow=data["tow"], sv=data["sv"])
+            for key in data.files:
+                if key.startswith("obs_"):
+                    obs_type = key[4:]
+                    chunk.obs[obs_type] = data[key]
+                    chunk.lli[obs_type] = data[f"lli_{obs_type}"]
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stream a RINEX 2.x observation file in epoch chunks"
+    )
+    parser.add_argument("file", help="RINEX observation file")
+    parser.add_argument(
+        "--chunk_epochs", type=int, default=3600, help="Epochs per chunk"
+    )
+    parser.add_argument(
+        "--sv", type=str, default=None, help="Comma separated satellites (G01,5,...)"
+    )
+    parser.add_argument(
+        "--start", type=str, default=None, help="Window start (YYYY-MM-DDTHH:MM:SS)"
+    )
+    parser.add_argument(
+        "--end", type=str, default=None, help="Window end (YYYY-MM-DDTHH:MM:SS)"
+    )
+    parser.add_argument(
+        "--types", type=str, default=None, help="Comma separated observation types"
+    )
+    parser.add_argument(
+        "--store", type=str, default=None, help="Write a pseudorange store here"
+    )
+    args = parser.parse_args()
+
+    svs = None if args.sv is None else args.sv.split(",")
+    obs_types = None if args.types is None else args.types.split(",")
+    tstart = None if args.start is None else datetime.fromisoformat(args.start)
+    tend = None if args.end is None else datetime.fromisoformat(args.end)
+
+    tracemalloc.start()
+    chunks = iter_obs_chunks(args.file, args.chunk_epochs, svs, tstart, tend, obs_types)
+    if args.store is not None:
+        parts = save_pseudorange_store(chunks, args.store)
+        print(f"✓ Saved {len(parts)} pseudorange parts to {args.store}")
+    else:
+        nepochs = nchunks = 0
+        for chunk in chunks:
+            nchunks += 1
+            nepochs += len(chunk.tow)
+            print(
+                f"Chunk {nchunks}: {len(chunk.tow)} epochs, {len(chunk.sv)} SVs, "
+                f"{chunk.nbytes / 1e6:.1f} MB"
+            )
+        print(f"Read {nepochs} epochs in {nchunks} chunks")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Peak memory: {peak / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Result Cache
+Content-addressed cache of rinexnav position blocks and CSV products
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+BLOCK_SECONDS = 3600  # Time span of one cached block of positions
+
+
+def file_hash(path, _chunk=1 << 20):
+    """
+    SHA-256 of a file's content, decompressed first if it is gzip
+    compressed, so a nav file and its .gz copy agree (NavHeader.sha256)
+    """
+    with open(path, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"
+    digest = hashlib.sha256()
+    with (gzip.open if compressed else open)(path, "rb") as f:
+        for block in iter(lambda: f.read(_chunk), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def params_key(params):
+    """Stable short hash of processing parameters"""
+    text = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def _block_id(seconds):
+    """First epoch and a digest of all epochs of one block"""
+    digest = hashlib.sha256(np.asarray(seconds, dtype=np.float64).tobytes())
+    return f"{int(seconds[0])}_{digest.hexdigest()[:12]}"
+
+
+class ResultCache:
+    """
+    LRU cache of computed positions keyed by input content and parameters
+
+    Positions are stored in one-hour blocks, so a request that overlaps an
+    earlier one only computes the blocks it does not share. Finished CSV
+    products are stored too and are copied back out on an identical request.
+    A JSON manifest tracks entry sizes, last access times and hit/miss
+    counters across runs.
+    """
+
+    def __init__(self, cache_dir="results/.cache", max_bytes=512 * 2**20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        os.makedirs(os.path.join(cache_dir, "blocks"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "products"), exist_ok=True)
+
+        self.manifest = {
+            "entries": {},
+            "files": {},
+            "stats": {"hits": 0, "partial_hits": 0, "misses": 0},
+        }
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def _save_manifest(self):
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    @property
+    def stats(self):
+        return self.manifest["stats"]
+
+    def content_hash(self, path, digest=None):
+        """
+        File hash, reused while the file's size and mtime are unchanged
+
+        A digest already computed by the caller (e.g. readrinex.read_nav)
+        is recorded instead of reading the file again.
+        """
+        st = os.stat(path)
+        known = self.manifest["files"].get(os.path.abspath(path))
+        if known and known["size"] == st.st_size and known["mtime"] == st.st_mtime:
+            return known["sha256"]
+        if digest is None:
+            digest = file_hash(path)
+        self.manifest["files"][os.path.abspath(path)] = {
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "sha256": digest,
+        }
+        return digest
+
+    def _touch(self, key):
+        self.manifest["entries"][key]["last_access"] = time.time()
+
+    def _add_entry(self, key, paths):
+        size = sum(os.path.getsize(p) for p in paths)
+        self.manifest["entries"][key] = {
+            "paths": paths,
+            "size": size,
+            "last_access": time.time(),
+        }
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        entries = self.manifest["entries"]
+        total = sum(e["size"] for e in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            for path in entries[key]["paths"]:
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                elif os.path.exists(path):
+                    os.remove(path)
+            total -= entries.pop(key)["size"]
+
+    def get_products(self, request_key, out_paths):
+        """
+        Copy cached CSV products for an identical request
+
+        Parameters:
+        -----------
+        request_key : str
+            Key from request_key()
+        out_paths : list
+            Destination paths, in the order they were stored
+
+        Returns:
+        --------
+        hit : bool
+            True if every product was restored
+        """
+        entry = self.manifest["entries"].get(request_key)
+        if entry is None or not all(os.path.exists(p) for p in entry["paths"]):
+            return False
+        for src, dst in zip(entry["paths"], out_paths, strict=True):
+            shutil.copyfile(src, dst)
+        self._touch(request_key)
+        self.stats["hits"] += 1
+        self._save_manifest()
+        return True
+
+    def put_products(self, request_key, paths):
+        """Store finished CSV products under request_key"""
+        directory = os.path.join(self.cache_dir, "products", request_key)
+        os.makedirs(directory, exist_ok=True)
+        stored = []
+        for path in paths:
+            dst = os.path.join(directory, os.path.basename(path))
+            shutil.copyfile(path, dst)
+            stored.append(dst)
+        self._add_entry(request_key, stored)
+        self._save_manifest()
+
+    def request_key(self, nav_file, params):
+        """Key of a complete request: input content plus all parameters"""
+        return f"req_{self.content_hash(nav_file)[:16]}_{params_key(params)}"
+
+    def positions(self, nav_file, params, mytime, compute):
+        """
+        Positions for every epoch of mytime, computing only uncached blocks
+
+        Parameters:
+        -----------
+        nav_file : str
+            Navigation file (hashed by content)
+        params : dict
+            Parameters that affect the positions (date, interval, PRNs)
+        mytime : numpy.ndarray
+            (epochs, 2) [week, seconds of week] from gpsweekcal
+        compute : callable
+            compute(mytime_subset) -> svpos rows for those epochs
+
+        Returns:
+        --------
+        svpos : numpy.ndarray
+            Rows of [time, sv, X, Y, Z] for all epochs, in time order
+        """
+        prefix = f"blk_{self.content_hash(nav_file)[:16]}_{params_key(params)}"
+        # Blocks are aligned to absolute hours; a key names the exact epochs
+        # of its block, so a partial block of a shorter request is not reused
+        seconds = mytime[:, 0].astype(np.float64) * 604800.0 + mytime[:, 1]
+        block = seconds // BLOCK_SECONDS
+        starts = np.unique(block)
+        keys = {b: f"{prefix}_{_block_id(seconds[block == b])}" for b in starts}
+
+        entries = self.manifest["entries"]
+        cached = {
+            b: k
+            for b, k in keys.items()
+            if k in entries and os.path.exists(entries[k]["paths"][0])
+        }
+        missing = [b for b in starts if b not in cached]
+        parts = {}
+        for b, key in cached.items():
+            parts[b] = np.load(entries[key]["paths"][0])
+            self._touch(key)
+
+        if missing:
+            rows = np.isin(block, missing)
+            computed = compute(mytime[rows])
+            times = computed[:, 0]
+            for b in missing:
+                sel = np.isin(times, mytime[block == b, 1])
+                parts[b] = computed[sel]
+                path = os.path.join(self.cache_dir, "blocks", f"{keys[b]}.npy")
+                np.save(path, parts[b])
+                self._add_entry(keys[b], [path])
+
+        if not missing:
+            self.stats["hits"] += 1
+        elif cached:
+            self.stats["partial_hits"] += 1
+        else:
+            self.stats["misses"] += 1
+        self._save_manifest()
+        return np.vstack([parts[b] for b in starts])
@@ -10,88 +10,360 @@ import argparse
 import os
 
 import numpy as np
-from ecef_to_lla import ecef_to_lla
-from find_eph import find_eph
-from gps_time import gps_time_to_datetime_iso
+from csvio import (
+    COMPRESSION,
+    LLA_HEADER,
+    compressed_name,
+    open_text,
+    write_ecef,
+    write_lla,
+)
+from find_eph import ephemeris_table
+from gnss import LEAP_SECONDS, gnss_position_cube, nav_tables, sv_code
 from gpsweekcal import gpsweekcal
-from plot_satellites import plot_satellites
-from readrinex import readrinex
-from satpos import satpos
+from pipeline import Stage, format_stats, run_stages
+from plot_satellites import get_output_filename, plot_cube, plot_satellites
+from positions import position_cube
+from readrinex import read_nav, readrinex
+from resultcache import ResultCache
+from satpos import PRECISIONS
+from svcube import PositionCube
+
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Satellite position calculator with plotting"
+    )
+    parser.add_argument(
+        "--file", type=str, default="data/brdc0680.20n", help="RINEX navigation file"
+    )
+    parser.add_argument(
+        "--date",
+        type=str,
+        default=None,
+        help="Date in format YY,MM,DD (like MATLAB). If not provided, will be extracted from RINEX file",
+    )
+    parser.add_argument(
+        "--interval", type=int, default=15, help="Time interval in seconds"
+    )
+    parser.add_argument(
+        "--plot", action="store_true", help="Generate 3D plot of satellite orbits"
+    )
+    parser.add_argument(
+        "--max_epochs", type=int, default=1000, help="Maximum epochs to plot"
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse cached results for identical or overlapping requests",
+    )
+    parser.add_argument(
+        "--cache_dir", type=str, default="results/.cache", help="Cache directory"
+    )
+    parser.add_argument(
+        "--cache_size", type=float, default=512, help="Cache size limit in MB"
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Overlap parsing, computing and writing in concurrent stages",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=2, help="Compute threads in pipeline mode"
+    )
+    parser.add_argument(
+        "--chunk_epochs", type=int, default=240, help="Epochs per pipeline chunk"
+    )
+    parser.add_argument(
+        "--queue_size", type=int, default=4, help="Chunks buffered between stages"
+    )
+    parser.add_argument(
+        "--precision",
+        type=str,
+        default="float64",
+        choices=list(PRECISIONS),
+        help="Kepler solver precision tier",
+    )
+    parser.add_argument(
+        "--sv",
+        type=str,
+        default=None,
+        help="Comma separated satellites (G01,5,E11,C03,R05,...); output only these, no NaN rows",
+    )
+    parser.add_argument(
+        "--window",
+        type=str,
+        default=None,
+        help="START,END hours of day (e.g. 6,7.5); output only these epochs",
+    )
+    parser.add_argument(
+        "--max_prn",
+        type=int,
+        default=32,
+        help="Highest GPS PRN in the full-day output (without --sv/--window)",
+    )
+    parser.add_argument(
+        "--compress",
+        type=str,
+        default="none",
+        choices=list(COMPRESSION),
+        help="Compress the CSVs on the fly (.csv.gz or .csv.zst, zstd needs zstandard)",
+    )
+    return parser.parse_args(argv)
+
+
+def parse_sv(text):
+    """
+    Satellite ids from a comma separated list
+
+    Parameters:
+    -----------
+    text : str
+        Ids ('G01') or GPS PRNs ('5'), e.g. 'G01,5,G12'
 
+    Returns:
+    --------
+    sv : numpy.ndarray
+        Satellite ids such as 'G05'
+    """
+    sv = [s.strip().upper() for s in text.split(",") if s.strip()]
+    return np.array([f"G{int(s):02d}" if s.isdigit() else s for s in sv])
 
-def extract_date_from_rinex(file_path):
+
+def select_window(mytime, window):
     """
-    Extract the start date from RINEX navigation file
-    Based on the first data line format: SV YY MM DD HH MM SS ...
+    Epochs of mytime inside a window of hours of day
 
     Parameters:
     -----------
-    file_path : str
-        Path to RINEX navigation file
+    mytime : numpy.ndarray
+        (epochs, 2) [week, seconds of week] from gpsweekcal for one day
+    window : tuple or None
+        (start, end) hours of day, end exclusive; None keeps every epoch
 
     Returns:
     --------
-    date : list
-        [year, month, day] in format [YY, MM, DD]
+    mytime : numpy.ndarray
+        Rows of mytime inside the window
     """
-    try:
-        with open(file_path) as f:
-            # Skip header lines until we find the first data line
-            for line in f:
-                line = line.strip()
-                # Check if this is a data line (starts with satellite number and has proper format)
-                # Format: SV YY MM DD HH MM SS ...
-                if line and len(line) > 20:
-                    parts = line.split()
-                    # Check if we have enough parts and first part is a satellite number
-                    if len(parts) >= 6 and parts[0].isdigit():
-                        try:
-                            yy = int(parts[1])
-                            month = int(parts[2])
-                            day = int(parts[3])
-                            return [yy, month, day]
-                        except ValueError:
-                            # Skip this line if parsing fails
-                            continue
-
-        # If no data line found, return None
-        return None
+    if window is None:
+        return mytime
+    start, end = window
+    if end <= start:
+        raise ValueError("Window end must be after its start")
+    hours = (mytime[:, 1] - mytime[0, 1]) / 3600.0
+    return mytime[(hours >= start) & (hours < end)]
 
-    except Exception as e:
-        print(f"Error extracting date from RINEX file: {e}")
-        return None
 
+def query_svpos(nav_data, mytime, sv=None, window=None, precision="float64"):
+    """
+    Satellite positions for selected satellites and epochs only
 
-# Parse command line arguments
-parser = argparse.ArgumentParser(
-    description="Satellite position calculator with plotting"
-)
-parser.add_argument(
-    "--file", type=str, default="data/brdc0680.20n", help="RINEX navigation file"
-)
-parser.add_argument(
-    "--date",
-    type=str,
-    default=None,
-    help="Date in format YY,MM,DD (like MATLAB). If not provided, will be extracted from RINEX file",
-)
-parser.add_argument("--interval", type=int, default=15, help="Time interval in seconds")
-parser.add_argument(
-    "--plot", action="store_true", help="Generate 3D plot of satellite orbits"
-)
-parser.add_argument(
-    "--max_epochs", type=int, default=1000, help="Maximum epochs to plot"
-)
-args = parser.parse_args()
+    The ephemeris table is reduced to the requested satellites before the
+    search, and only epochs inside the window are evaluated, so the work
+    follows the size of the request rather than the full day.
+
+    GPS, GLONASS, Galileo, BeiDou and QZSS satellites are all supported
+    (see gnss.py).
+
+    Parameters:
+    -----------
+    nav_data : xarray.Dataset or dict
+        Navigation data loaded by georinex, its gnss.nav_tables, or a GPS
+        ephemeris_table
+    mytime : numpy.ndarray
+        (epochs, 2) [week, seconds of week] from gpsweekcal
+    sv : array of str or int, optional
+        Satellite ids or GPS PRNs; None selects every satellite in the file
+    window : tuple, optional
+        (start, end) hours of day, see select_window
+    precision : str
+        Precision tier of satpos.satpos_batch
+
+    Returns:
+    --------
+    svpos : numpy.ndarray
+        (cells, 5) rows of [time, sv, X, Y, Z] in time order, only for
+        (epoch, satellite) cells that have an ephemeris. sv is the GPS PRN,
+        or the gnss.sv_code of other systems (e.g. 211 for E11)
+    """
+    wanted = None
+    if sv is not None:
+        wanted = parse_sv(",".join(str(s) for s in np.atleast_1d(sv)))
+    if hasattr(nav_data, "data_vars"):
+        if wanted is not None:
+            base = np.array([s[:3] for s in nav_data.sv.values])
+            nav_data = nav_data.sel(sv=nav_data.sv.values[np.isin(base, wanted)])
+        tables = nav_tables(nav_data)
+    elif "kepler" in nav_data:
+        tables = nav_data
+    else:
+        tables = {"kepler": nav_data, "glonass": None}
+    if wanted is not None:
+        tables = {
+            name: (
+                None
+                if t is None
+                else {k: v[np.isin(t["sv"], wanted)] for k, v in t.items()}
+            )
+            for name, t in tables.items()
+        }
+    ids = np.unique(np.concatenate([t["sv"] for t in tables.values() if t is not None]))
+
+    timesat = select_window(mytime, window)[:, 1].astype(np.float64)
+    cube = gnss_position_cube(tables, timesat, ids, precision)
+    it, isv = np.nonzero(np.isfinite(cube[..., 0]))
+    return np.column_stack([timesat[it], sv_code(ids)[isv], cube[it, isv]])
+
+
+def compute_svpos(nav_data, mytime, max_prn=32, precision="float64"):
+    """
+    Satellite positions for every epoch and PRN 1..max_prn
+
+    Parameters:
+    -----------
+    nav_data : xarray.Dataset or dict
+        Navigation data loaded by georinex, or its ephemeris_table
+    mytime : numpy.ndarray
+        (epochs, 2) [week, seconds of week] from gpsweekcal
+    max_prn : int
+        Highest GPS PRN to compute
+    precision : str
+        Precision tier of satpos.satpos_batch
+
+    Returns:
+    --------
+    svpos : numpy.ndarray
+        (epochs * max_prn, 5) rows of [time, sv, X, Y, Z], NaN coordinates
+        for satellites without ephemeris
+    """
+    table = ephemeris_table(nav_data) if hasattr(nav_data, "data_vars") else nav_data
+    prn = np.arange(1, max_prn + 1)
+    timesat = mytime[:, 1].astype(np.float64)
+    cube = position_cube(table, timesat, prn, precision)
+    return np.column_stack(
+        [
+            np.repeat(timesat, max_prn),
+            np.tile(prn, len(timesat)).astype(np.float64),
+            cube.reshape(-1, 3),
+        ]
+    )
+
+
+def run_pipeline(
+    nav_file,
+    mytime,
+    date,
+    csv_filename,
+    lla_filename,
+    max_prn=32,
+    workers=2,
+    chunk_epochs=240,
+    queue_size=4,
+    precision="float64",
+):
+    """
+    Produce both rinexnav CSVs with parse, compute and write stages overlapped
 
+    The parse stage loads the navigation file and hands out chunks of
+    epochs, the compute stage runs on several threads, and two ordered
+    writer stages append the ECEF and lat/lon/alt rows. Bounded queues
+    between the stages keep at most a few chunks in memory.
 
-def main():
+    Parameters:
+    -----------
+    nav_file : str or xarray.Dataset
+        RINEX navigation file, or its already loaded data
+    mytime : numpy.ndarray
+        (epochs, 2) [week, seconds of week] from gpsweekcal
+    date : list
+        [year, month, day] used for the readable dates
+    csv_filename, lla_filename : str
+        Output paths
+    max_prn : int
+        Highest GPS PRN to compute
+    workers : int
+        Compute threads
+    chunk_epochs : int
+        Epochs per work item
+    queue_size : int
+        Capacity of each inter-stage queue
+    precision : str
+        Precision tier of satpos.satpos_batch
+
+    Returns:
+    --------
+    stats : list of dict
+        Per-stage statistics from pipeline.run_stages
+    counts : dict
+        'positions' and 'successful' row counts
+    """
+    year, month, day = date
+    counts = {"positions": 0, "successful": 0}
+
+    def parse():
+        if hasattr(nav_file, "data_vars"):
+            nav_data = nav_file
+        else:
+            nav_data = readrinex(nav_file)
+        if nav_data is None:
+            raise ValueError(f"Failed to load RINEX file {nav_file}")
+        table = ephemeris_table(nav_data)
+        for start in range(0, len(mytime), chunk_epochs):
+            yield table, mytime[start : start + chunk_epochs]
+
+    def compute(item):
+        table, times = item
+        return compute_svpos(table, times, max_prn, precision)
+
+    with (
+        open_text(csv_filename, "w") as csv_file,
+        open_text(lla_filename, "w") as lla_file,
+    ):
+        lla_file.write(LLA_HEADER)
+
+        def append_ecef(svpos):
+            write_ecef(csv_file, svpos)
+            counts["positions"] += len(svpos)
+            counts["successful"] += int(np.count_nonzero(~np.isnan(svpos[:, 2])))
+            return svpos
+
+        def append_lla(svpos):
+            write_lla(lla_file, svpos, year, month, day)
+
+        stats = run_stages(
+            parse(),
+            [
+                Stage("compute", compute, workers=workers),
+                Stage("write_ecef", append_ecef, ordered=True),
+                Stage("write_lla", append_lla, ordered=True),
+            ],
+            queue_size=queue_size,
+        )
+    return stats, counts
+
+
+def main(argv=None):
+    args = parse_args(argv)
     print("\n--- Satellite Position Calculator ---")
     print(f"RINEX file: {args.file}")
     print(f"Interval: {args.interval} seconds")
     print(f"Plot: {args.plot}\n")
 
-    # Determine date - either from command line or extract from RINEX file
+    # Load RINEX navigation file (single pass: header and records)
+    print("Loading RINEX navigation file...")
+    try:
+        header, nav_data = read_nav(args.file)
+    except Exception as e:
+        print(f"Failed to load RINEX file {args.file}: {e}")
+        return
+    print(
+        f"RINEX {header.version} ({header.file_type}), leap seconds "
+        f"{header.leap_seconds}, records {header.first_epoch} to {header.last_epoch}"
+    )
+
+    # Determine date - either from command line or from the records
     if args.date is not None:
         # Parse date from command line (format: YY,MM,DD like MATLAB)
         date_parts = [int(x.strip()) for x in args.date.split(",")]
@@ -99,22 +371,14 @@ def main():
             raise ValueError("Date must be in format YY,MM,DD")
         yy, month, day = date_parts
         print(f"Using provided date: {args.date}")
+        # Convert 2-digit year to 4-digit year
+        if yy < 86:  # <86 = 20**, >86 = 19**
+            year = yy + 2000
+        else:
+            year = yy + 1900
     else:
-        # Extract date from RINEX file
-        print("Extracting date from RINEX file...")
-        date_parts = extract_date_from_rinex(args.file)
-        if date_parts is None:
-            raise ValueError(
-                "Could not extract date from RINEX file. Please provide --date argument."
-            )
-        yy, month, day = date_parts
-        print(f"Extracted date from RINEX: {yy},{month},{day}")
-
-    # Convert 2-digit year to 4-digit year
-    if yy < 86:  # <86 = 20**, >86 = 19**
-        year = yy + 2000
-    else:
-        year = yy + 1900
+        year, month, day = header.date
+        print(f"Date of the navigation records: {year},{month},{day}")
 
     # Generate time series for 24 hours
     print("Generating time series...")
@@ -122,11 +386,79 @@ def main():
     rwt, colt = mytime.shape
     print(f"Generated {rwt} time epochs")
 
-    # Load RINEX navigation file
-    print("Loading RINEX navigation file...")
-    nav_data = readrinex(args.file)
-    if nav_data is None:
-        print("Failed to load RINEX file")
+    # Create results directory if it doesn't exist
+    os.makedirs("results", exist_ok=True)
+
+    # Get input filename without extension
+    name = os.path.splitext(os.path.basename(args.file))[0]
+    csv_filename = compressed_name(f"results/{name}.csv", args.compress)
+    lla_filename = compressed_name(f"results/{name}_latlonalt.csv", args.compress)
+
+    # Either the full-day PRN 1..max_prn layout or a sparse selection
+    max_prn = args.max_prn
+    selection = args.sv is not None or args.window is not None
+    sv = None if args.sv is None else parse_sv(args.sv)
+    if args.window is not None:
+        window = [float(x) for x in args.window.split(",")]
+        if len(window) != 2:
+            raise ValueError("Window must be in format START,END (hours of day)")
+        mytime = select_window(mytime, window)
+        if len(mytime) == 0:
+            raise ValueError("Window contains no epochs")
+        print(f"Window {window[0]}-{window[1]} h: {len(mytime)} epochs")
+    if selection and args.pipeline:
+        raise ValueError("--sv/--window cannot be combined with --pipeline")
+
+    cache = None
+    if args.cache:
+        cache = ResultCache(args.cache_dir, int(args.cache_size * 2**20))
+        cache.content_hash(args.file, header.sha256)
+        params = {"date": [year, month, day], "interval": args.interval}
+        params["prns"] = list(range(1, max_prn + 1))
+        params["precision"] = args.precision
+        if selection:
+            params["prns"] = None if sv is None else sv.tolist()
+        # Position blocks are shared across windows and output compression;
+        # only the products depend on them
+        product = dict(params, window=args.window)
+        if args.compress != "none":
+            product["compress"] = args.compress
+        request_key = cache.request_key(args.file, product)
+        if cache.get_products(request_key, [csv_filename, lla_filename]):
+            print(f"✓ Cache hit: restored {csv_filename} and {lla_filename}")
+            print(f"Cache stats: {cache.stats}")
+            if args.plot:
+                print("\nGenerating 3D plot...")
+                plot_satellites(csv_filename, args.max_epochs)
+            return
+
+    if args.pipeline:
+        print(
+            f"Running pipeline: {args.workers} compute workers, "
+            f"{args.chunk_epochs} epochs per chunk"
+        )
+        stats, counts = run_pipeline(
+            nav_data,
+            mytime,
+            [year, month, day],
+            csv_filename,
+            lla_filename,
+            max_prn,
+            args.workers,
+            args.chunk_epochs,
+            args.queue_size,
+            args.precision,
+        )
+        print(f"Successful calculations: {counts['successful']}")
+        print(f"✓ Saved: {csv_filename}")
+        print(f"✓ Saved: {lla_filename}")
+        print(format_stats(stats))
+        if cache is not None:
+            cache.put_products(request_key, [csv_filename, lla_filename])
+            print(f"Cache stats: {cache.stats}")
+        if args.plot:
+            print("\nGenerating 3D plot...")
+            plot_satellites(csv_filename, args.max_epochs)
         return
 
     print(f"Loaded navigation data: {nav_data}")
@@ -134,105 +466,68 @@ def main():
     # Get available satellites
     available_sats = nav_data.sv.values
     print(f"Available satellites: {len(available_sats)} - {available_sats}")
+    if selection:
+        print(f"Processing selected satellites: {'all' if sv is None else args.sv}")
+        tables = nav_tables(nav_data, header.leap_seconds or LEAP_SECONDS)
 
-    # Process GPS satellites dynamically with 32 threshold
-    max_prn = 32  # Maximum GPS PRNs (threshold)
-    print(f"Processing up to {max_prn} satellites (1-{max_prn}) with dynamic discovery")
+        def compute(times):
+            return query_svpos(tables, times, sv, precision=args.precision)
 
-    # Initialize arrays for satellite positions
-    svposh = np.zeros((max_prn, 5))  # [time, sv, X, Y, Z]
-    svposc = []
+    else:
+        print(f"Processing up to {max_prn} satellites (1-{max_prn})")
+        others = np.count_nonzero(~np.char.startswith(available_sats.astype(str), "G"))
+        if others:
+            print(f"{others} non-GPS satellites skipped (select them with --sv)")
 
-    print("Computing satellite positions...")
-    successful_calculations = 0
-
-    for i in range(rwt):
-        timesat = mytime[i, 1]  # GPS seconds of week
-
-        for j in range(max_prn):
-            sv = j + 1  # Satellite number (1-32)
-            sat_id = f"G{sv:02d}"  # Format as G01, G02, etc.
-
-            if sat_id in available_sats:
-                try:
-                    # Find the correct ephemeris data for this satellite and time
-                    eph_single = find_eph(nav_data, sv, timesat)
-
-                    if eph_single is not None:
-                        satposition = satpos(timesat, eph_single)
-                        X, Y, Z = satposition[0], satposition[1], satposition[2]
-                        svposh[j, :] = [timesat, sv, X, Y, Z]
-                        successful_calculations += 1
-                    else:
-                        svposh[j, :] = [timesat, sv, np.nan, np.nan, np.nan]
-                except Exception as e:
-                    if i < 5 and j < 5:  # Only print first few errors
-                        print(
-                            f"Error calculating position for satellite {sv} at time {timesat}: {e}"
-                        )
-                    svposh[j, :] = [timesat, sv, np.nan, np.nan, np.nan]
-            else:
-                # Satellite not available
-                svposh[j, :] = [timesat, sv, np.nan, np.nan, np.nan]
-
-        svposc.append(svposh.copy())
-
-        # Progress indicator
-        if (i + 1) % 1000 == 0:
-            print(f"Processed {i + 1}/{rwt} epochs...")
+        def compute(times):
+            return PositionCube.build(nav_data, times, max_prn, args.precision)
 
+    print("Computing satellite positions...")
+    if cache is not None and selection:
+        svpos = cache.positions(args.file, params, mytime, compute)
+    elif cache is not None:
+        # Cached blocks are rows; the full-day layout is held as a cube
+        rows = cache.positions(args.file, params, mytime, lambda t: compute(t).rows())
+        svpos = PositionCube.from_rows(rows, mytime[0, 0])
+    else:
+        svpos = compute(mytime)
+    if selection:
+        successful_calculations = int(np.count_nonzero(~np.isnan(svpos[:, 2])))
+        satellites = len(np.unique(svpos[:, 1]))
+    else:
+        successful_calculations = int(np.count_nonzero(svpos.valid))
+        satellites = len(svpos.sv)
     print(f"Successful calculations: {successful_calculations}")
-
-    # Convert to single array
-    svpos = np.vstack(svposc)
-    print(f"Computed {svpos.shape[0]} satellite positions")
-
-    # Create results directory if it doesn't exist
-    os.makedirs("results", exist_ok=True)
-
-    # Get input filename without extension
-    name = os.path.splitext(os.path.basename(args.file))[0]
+    print(f"Computed {len(svpos)} satellite positions")
 
     # Save CSV data
-    csv_filename = f"results/{name}.csv"
-    np.savetxt(csv_filename, svpos, delimiter=",", fmt="%.10f")
+    with open_text(csv_filename, "w") as f:
+        write_ecef(f, svpos)
     print(f"✓ Saved: {csv_filename}")
 
     # Also save with lat/lon/alt format with readable dates
-    lla_filename = f"results/{name}_latlonalt.csv"
-    lla_data = []
-    for row in svpos:
-        if not np.isnan(row[2]):  # If X coordinate is not NaN
-            lat, lon, alt = ecef_to_lla(row[2], row[3], row[4])
-            # Convert GPS time to readable datetime
-            readable_time = gps_time_to_datetime_iso(row[0], year, month, day)
-            lla_data.append([readable_time, int(row[1]), lat, lon, alt])
-        else:
-            readable_time = gps_time_to_datetime_iso(row[0], year, month, day)
-            lla_data.append([readable_time, int(row[1]), np.nan, np.nan, np.nan])
-
-    # Save as CSV with proper formatting
-    with open(lla_filename, "w") as f:
-        f.write("Sat,Lat,Lon,Alt,Date\n")
-        for row in lla_data:
-            if np.isnan(row[2]):  # If lat is NaN
-                f.write(f"{row[1]},,,,{row[0]}\n")
-            else:
-                f.write(
-                    f"{row[1]},{row[2]:.10f},{row[3]:.10f},{row[4]:.10f},{row[0]}\n"
-                )
+    with open_text(lla_filename, "w") as f:
+        f.write(LLA_HEADER)
+        write_lla(f, svpos, year, month, day)
     print(f"✓ Saved: {lla_filename}")
 
+    if cache is not None:
+        cache.put_products(request_key, [csv_filename, lla_filename])
+        print(f"Cache stats: {cache.stats}")
+
     print("\nRINEX Processing Complete!")
     print(f"Data saved to: {csv_filename}")
-    print(f"Total epochs processed: {rwt}")
-    print(f"Total satellite positions calculated: {svpos.shape[0]}")
-    print(f"Number of satellites processed: {max_prn}")
+    print(f"Total epochs processed: {len(mytime)}")
+    print(f"Total satellite positions calculated: {len(svpos)}")
+    print(f"Number of satellites processed: {satellites}")
 
     # Generate plot if requested
     if args.plot:
         print("\nGenerating 3D plot...")
-        plot_satellites(csv_filename, args.max_epochs)
+        if selection:
+            plot_satellites(csv_filename, args.max_epochs)
+        else:
+            plot_cube(svpos, get_output_filename(csv_filename, None), args.max_epochs)
 
 
 if __name__ == "__main__":
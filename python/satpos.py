@@ -6,13 +6,45 @@ Based on MATLAB satpos.m
 @author: Based on Kai Borre's MATLAB implementation
 """
 
+import argparse
+import time
+
 import numpy as np
+from backends import dispatch, register
 from check_t import check_t
 
 # Constants
 GM = 3.986005e14  # Earth's universal gravitational parameter m^3/s^2
 omegae_dot = 7.2921151467e-5  # Earth rotation rate rad/s
 
+# Precision tiers: (float type, Kepler method, convergence tolerance in rad)
+PRECISIONS = {
+    "exact": (np.float64, "halley", 1e-15),
+    "float64": (np.float64, "newton", 1e-12),
+    "float32": (np.float32, "newton", 1e-6),
+    "fixed_point": (np.float64, "fixed_point", None),  # previous solver
+}
+
+# Ephemeris fields used by the orbit computation
+ORBIT_KEYS = (
+    "M0",
+    "sqrtA",
+    "DeltaN",
+    "Eccentricity",
+    "omega",
+    "Cuc",
+    "Cus",
+    "Crc",
+    "Crs",
+    "Io",
+    "IDOT",
+    "Cic",
+    "Cis",
+    "Omega0",
+    "OmegaDot",
+    "Toe",
+)
+
 
 def satpos(t, eph):
     """
@@ -122,7 +154,7 @@ def satpos(t, eph):
     for _ in range(10):
         E_old = E
         E = M + ecc * np.sin(E)
-        dE = np.mod(E - E_old, 2 * np.pi)
+        dE = E - E_old  # E is not wrapped inside the loop
         if abs(dE) < 1e-12:
             break
 
@@ -146,3 +178,298 @@ def satpos(t, eph):
     satp[2] = y1 * np.sin(i)
 
     return satp
+
+
+def kepler_fixed_point(M, ecc, iterations=10):
+    """Kepler's equation by fixed-point iteration E = M + e sin E"""
+    E = M
+    for _ in range(iterations):
+        E = M + ecc * np.sin(E)
+    return E
+
+
+def kepler_solve(M, ecc, tol=1e-12, max_iter=20, method="newton"):
+    """
+    Vectorized solution of Kepler's equation M = E - e sin E
+
+    Starts from the second-order series E0 = M + e sin M (1 + e cos M) and
+    refines with Newton-Raphson or Halley steps. Once most elements have
+    converged, only the remaining ones are updated, so the cost of later
+    iterations shrinks with the number of stragglers.
+
+    Parameters:
+    -----------
+    M : numpy.ndarray
+        Mean anomaly in radians
+    ecc : numpy.ndarray
+        Eccentricity, broadcastable with M (0 <= e < 1)
+    tol : float
+        Convergence threshold on the estimated remaining error in radians
+    max_iter : int
+        Maximum number of steps
+    method : str
+        'newton' or 'halley'
+
+    Returns:
+    --------
+    E : numpy.ndarray
+        Eccentric anomaly in radians, same shape and dtype as M
+    """
+    if method not in ("newton", "halley"):
+        raise ValueError(f"Unknown Kepler method: {method}")
+    M, ecc = np.broadcast_arrays(M, ecc)
+    shape = M.shape
+    M = M.ravel()
+    ecc = ecc.ravel()
+
+    sin_M = np.sin(M)
+    E = M + ecc * sin_M * (1 + ecc * np.cos(M))
+    active = None  # all elements, updated in place until most have converged
+    for _ in range(max_iter):
+        Ea = E if active is None else E[active]
+        ea = ecc if active is None else ecc[active]
+        e_sin = ea * np.sin(Ea)
+        f = Ea - e_sin - (M if active is None else M[active])
+        f1 = 1 - ea * np.cos(Ea)
+        if method == "halley":
+            step = f / (f1 - 0.5 * f * e_sin / f1)
+        else:
+            step = f / f1
+        # Error left after this step from quadratic (Newton) or cubic (Halley)
+        # convergence; NaN elements count as converged
+        order = 2 if method == "newton" else 3
+        moving = ea / (1 - ea) * np.abs(step) ** order > tol
+        if active is None:
+            E -= step
+            if 2 * np.count_nonzero(moving) < moving.size:
+                active = np.flatnonzero(moving)
+        else:
+            E[active] = Ea - step
+            active = active[moving]
+        if active is not None and active.size == 0:
+            break
+    return E.reshape(shape)
+
+
+def _eccentric_anomaly(t, eph, precision="float64", gm=GM):
+    """Return (E, tk, A) for arrays of times and gathered ephemerides"""
+    dtype, method, tol = PRECISIONS[precision]
+    A = eph["sqrtA"] * eph["sqrtA"]
+    tk = check_t(t - eph["Toe"])
+    n = np.sqrt(gm / A**3) + eph["DeltaN"]
+    M = np.mod(eph["M0"] + n * tk + 2 * np.pi, 2 * np.pi)
+
+    ecc = np.asarray(eph["Eccentricity"], dtype=dtype)
+    if method == "fixed_point":
+        E = kepler_fixed_point(M, ecc)
+    else:
+        E = kepler_solve(M.astype(dtype), ecc, tol, method=method)
+    return np.mod(E + 2 * np.pi, 2 * np.pi).astype(dtype, copy=False), tk, A
+
+
+def satpos_batch(t, eph, precision="float64"):
+    """
+    Vectorized satpos over arrays of times and ephemerides
+
+    The float64 tier runs on the compute backend selected in backends.py.
+
+    Parameters:
+    -----------
+    t : numpy.ndarray
+        GPS time in seconds of week
+    eph : dict
+        Ephemeris arrays broadcastable with t (see find_eph.gather_eph)
+    precision : str
+        'exact' (Halley steps to 1e-15 rad), 'float64' (Newton steps to
+        1e-12 rad), 'float32' (orbit evaluated in single precision after
+        the time terms; errors of tens of meters, for bulk maps) or
+        'fixed_point' (the previous 10-step iteration)
+
+    Returns:
+    --------
+    satp : numpy.ndarray
+        (..., 3) array of X, Y, Z coordinates in meters (float32 for the
+        float32 tier)
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+    t = np.asarray(t, dtype=np.float64)
+    if precision == "float64":
+        # The float64 tier is the one implemented by every compute backend
+        size = np.broadcast(t, eph["M0"]).size
+        return dispatch("satpos", t, eph, size=size)
+    return _satpos_numpy(t, eph, precision)
+
+
+@register("satpos", "numpy")
+def _satpos_numpy(t, eph, precision="float64", gm=GM, we=omegae_dot, geo=None):
+    """
+    satpos_batch on NumPy, with the constants of other Keplerian systems
+
+    gm and we are the gravitational parameter and Earth rotation rate of
+    the constellation (GPS by default). geo is an optional boolean array,
+    broadcastable with t, marking BeiDou GEO satellites.
+    """
+    dtype = PRECISIONS[precision][0]
+    E, tk, A = _eccentric_anomaly(t, eph, precision, gm)
+
+    # Node longitude mixes large terms (Earth rotation times Toe), so it is
+    # always formed in double precision before any single-precision work
+    Omega = eph["Omega0"] + (eph["OmegaDot"] - we) * tk - we * eph["Toe"]
+    Omega = np.mod(Omega + 2 * np.pi, 2 * np.pi).astype(dtype, copy=False)
+    if dtype is not np.float64:
+        keys = ("Eccentricity", "omega", "Cuc", "Cus", "Crc", "Crs")
+        keys += ("Io", "IDOT", "Cic", "Cis")
+        eph = {k: np.asarray(eph[k]).astype(dtype) for k in keys}
+        tk = tk.astype(dtype)
+        A = A.astype(dtype)
+    ecc = eph["Eccentricity"]
+
+    v = np.arctan2(np.sqrt(1 - ecc**2) * np.sin(E), np.cos(E) - ecc)
+    phi = np.mod(v + eph["omega"], 2 * np.pi)
+    cos2phi = np.cos(2 * phi)
+    sin2phi = np.sin(2 * phi)
+
+    u = phi + eph["Cuc"] * cos2phi + eph["Cus"] * sin2phi
+    r = A * (1 - ecc * np.cos(E)) + eph["Crc"] * cos2phi + eph["Crs"] * sin2phi
+    i = eph["Io"] + eph["IDOT"] * tk + eph["Cic"] * cos2phi + eph["Cis"] * sin2phi
+
+    x1 = np.cos(u) * r
+    y1 = np.sin(u) * r
+    satp = np.empty(np.shape(x1) + (3,), dtype=dtype)
+    satp[..., 0] = x1 * np.cos(Omega) - y1 * np.cos(i) * np.sin(Omega)
+    satp[..., 1] = x1 * np.sin(Omega) + y1 * np.cos(i) * np.cos(Omega)
+    satp[..., 2] = y1 * np.sin(i)
+    if geo is not None and np.any(geo):
+        satp = np.where(
+            np.asarray(geo)[..., None], _geo_position(x1, y1, i, tk, eph, we), satp
+        )
+    return satp
+
+
+def _geo_position(x1, y1, i, tk, eph, we):
+    """
+    BeiDou GEO position: orbit in a frame without Earth rotation, tilted by
+    -5 degrees about X, then rotated by we * tk about Z (BDS ICD 5.2.4.12)
+    """
+    Omega = eph["Omega0"] + eph["OmegaDot"] * tk - we * eph["Toe"]
+    xg = x1 * np.cos(Omega) - y1 * np.cos(i) * np.sin(Omega)
+    yg = x1 * np.sin(Omega) + y1 * np.cos(i) * np.cos(Omega)
+    zg = y1 * np.sin(i)
+    tilt = np.deg2rad(-5.0)
+    y5 = np.cos(tilt) * yg + np.sin(tilt) * zg
+    z5 = -np.sin(tilt) * yg + np.cos(tilt) * zg
+    spin = we * tk
+    satp = np.empty(np.shape(xg) + (3,), dtype=xg.dtype)
+    satp[..., 0] = np.cos(spin) * xg + np.sin(spin) * y5
+    satp[..., 1] = -np.sin(spin) * xg + np.cos(spin) * y5
+    satp[..., 2] = z5
+    return satp
+
+
+def satclock_batch(t, eph):
+    """
+    Satellite clock offset from the broadcast polynomial
+
+    Parameters:
+    -----------
+    t : numpy.ndarray
+        GPS time in seconds of week
+    eph : dict
+        Ephemeris arrays broadcastable with t
+
+    Returns:
+    --------
+    dt : numpy.ndarray
+        Clock offset in seconds, including the relativistic correction and
+        the L1 group delay (TGD) when available
+    """
+    F = -4.442807633e-10  # Relativistic constant s/m^0.5
+    t = np.asarray(t, dtype=np.float64)
+    dt = check_t(t - eph["toc"])
+    E, _, _ = _eccentric_anomaly(t, eph)
+    clock = (
+        eph["SVclockBias"]
+        + eph["SVclockDrift"] * dt
+        + eph["SVclockDriftRate"] * dt**2
+        + F * eph["Eccentricity"] * eph["sqrtA"] * np.sin(E)
+    )
+    if "TGD" in eph:
+        clock = clock - np.nan_to_num(eph["TGD"])
+    return clock
+
+
+def benchmark_precision(nav_file, interval=1, repeat=3):
+    """
+    Time each precision tier over a day of positions and compare them
+
+    Parameters:
+    -----------
+    nav_file : str
+        RINEX navigation file
+    interval : int
+        Seconds per epoch
+    repeat : int
+        Timing runs per tier (the best is kept)
+
+    Returns:
+    --------
+    results : list of dict
+        'precision', 'seconds', 'positions_per_s', and 'max_error_m' against
+        the fixed-point output used so far
+    """
+    from find_eph import ephemeris_table, find_eph_batch, gather_eph
+    from gpsweekcal import gpsweekcal
+    from positions import nav_day
+    from readrinex import readrinex
+
+    nav_data = readrinex(nav_file)
+    table = ephemeris_table(nav_data)
+    tow = gpsweekcal(nav_day(nav_data), interval)[:, 1].astype(np.float64)
+    sv = np.unique(table["sv"])
+    index = find_eph_batch(table, sv[None, :], tow[:, None])
+    eph = gather_eph(table, index)
+
+    reference = satpos_batch(tow[:, None], eph, "fixed_point")
+    results = []
+    for precision in PRECISIONS:
+        best = np.inf
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            satp = satpos_batch(tow[:, None], eph, precision)
+            best = min(best, time.perf_counter() - t0)
+        error = np.linalg.norm(satp - reference, axis=-1)
+        results.append(
+            {
+                "precision": precision,
+                "seconds": best,
+                "positions_per_s": np.count_nonzero(np.isfinite(error)) / best,
+                "max_error_m": float(np.nanmax(error)),
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Kepler solver precision tiers"
+    )
+    parser.add_argument(
+        "--file", type=str, default="data/brdc0680.20n", help="RINEX navigation file"
+    )
+    parser.add_argument("--interval", type=int, default=1, help="Seconds per epoch")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per tier")
+    args = parser.parse_args()
+
+    results = benchmark_precision(args.file, args.interval, args.repeat)
+    print(f"{'Precision':<12}{'Time s':>9}{'Positions/s':>14}{'Max error m':>14}")
+    for r in results:
+        print(
+            f"{r['precision']:<12}{r['seconds']:>9.3f}"
+            f"{r['positions_per_s']:>14.0f}{r['max_error_m']:>14.2e}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+"""
+Archive Work Queue
+Coordinator/worker sharding of (file, day) units over a shared-filesystem queue
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from checkpoint import file_date
+from gpsweekcal import gpsweekcal
+from rinexnav import run_pipeline
+
+STATES = ("pending", "leased", "done", "failed")
+
+
+def _write_json(path, data):
+    """Write JSON under a temporary name, then rename it into place"""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def read_manifest(manifest):
+    """
+    Units listed in a manifest file
+
+    Parameters:
+    -----------
+    manifest : str
+        Text file with one RINEX navigation file per line ('#' comments)
+
+    Returns:
+    --------
+    units : list of dict
+        'unit', 'file' and 'date' for each (file, day)
+    """
+    base = os.path.dirname(os.path.abspath(manifest))
+    units = []
+    with open(manifest) as f:
+        for line in f:
+            path = line.split("#")[0].strip()
+            if not path:
+                continue
+            if not os.path.isabs(path) and not os.path.exists(path):
+                path = os.path.join(base, path)
+            date = file_date(path)
+            name = os.path.splitext(os.path.basename(path))[0]
+            units.append(
+                {
+                    "unit": f"{name}_{date[0]:04d}{date[1]:02d}{date[2]:02d}",
+                    "file": os.path.abspath(path),
+                    "date": date,
+                }
+            )
+    return units
+
+
+class WorkQueue:
+    """
+    Work queue kept as JSON files in pending/, leased/, done/ and failed/
+
+    A worker claims a unit by renaming it from pending/ to leased/, which
+    only one worker can win. While working it touches the leased file; a
+    lease whose file is older than lease_timeout belongs to a lost worker
+    and is moved back to pending/ by reclaim_expired(). Results are written
+    as done/ records, so a unit finished twice is harmless.
+    """
+
+    def __init__(self, queue_dir):
+        self.queue_dir = queue_dir
+        self.config = _read_json(os.path.join(queue_dir, "queue.json"))
+
+    @classmethod
+    def create(cls, queue_dir, units, **config):
+        """
+        Create a queue, or reopen an existing one keeping finished units
+
+        Parameters:
+        -----------
+        queue_dir : str
+            Directory on a filesystem shared by all workers
+        units : list of dict
+            Units from read_manifest()
+        **config
+            Settings read by the workers: lease_timeout, max_attempts,
+            interval, out_dir, compute_workers
+        """
+        for state in STATES:
+            os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+        config["total"] = len(units)
+        _write_json(os.path.join(queue_dir, "queue.json"), config)
+        queue = cls(queue_dir)
+        for unit in units:
+            if not any(
+                os.path.exists(queue._path(state, unit["unit"])) for state in STATES
+            ):
+                _write_json(queue._path("pending", unit["unit"]), unit)
+        return queue
+
+    def _path(self, state, unit_id):
+        return os.path.join(self.queue_dir, state, f"{unit_id}.json")
+
+    def _ids(self, state):
+        names = os.listdir(os.path.join(self.queue_dir, state))
+        return sorted(n[:-5] for n in names if n.endswith(".json"))
+
+    def counts(self):
+        return {state: len(self._ids(state)) for state in STATES}
+
+    def settled(self):
+        """True when every unit is done or failed"""
+        counts = self.counts()
+        return counts["done"] + counts["failed"] >= self.config["total"]
+
+    def claim(self, worker_id):
+        """Lease the next pending unit, or return None if there is none"""
+        for unit_id in self._ids("pending"):
+            pending = self._path("pending", unit_id)
+            leased = self._path("leased", unit_id)
+            try:
+                os.utime(pending)  # fresh mtime so the new lease is not expired
+                os.rename(pending, leased)
+            except FileNotFoundError:
+                continue  # another worker got it
+            if os.path.exists(self._path("done", unit_id)):
+                os.remove(leased)  # a reclaimed unit finished after all
+                continue
+            unit = _read_json(leased)
+            unit["attempts"] = unit.get("attempts", 0) + 1
+            unit["worker"] = worker_id
+            _write_json(leased, unit)
+            return unit
+        return None
+
+    def renew(self, unit_id):
+        """Extend a lease; False if it was reclaimed"""
+        try:
+            os.utime(self._path("leased", unit_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, unit, record):
+        """Store the result record of a unit and drop its lease"""
+        _write_json(self._path("done", unit["unit"]), {**unit, **record})
+        try:
+            os.remove(self._path("leased", unit["unit"]))
+        except FileNotFoundError:
+            pass
+
+    def release(self, unit, error):
+        """Return a unit whose processing raised, or fail it after max_attempts"""
+        unit = {**unit, "error": error}
+        state = (
+            "failed" if unit["attempts"] >= self.config["max_attempts"] else "pending"
+        )
+        _write_json(self._path(state, unit["unit"]), unit)
+        try:
+            os.remove(self._path("leased", unit["unit"]))
+        except FileNotFoundError:
+            pass
+
+    def reclaim_expired(self):
+        """
+        Move leases not renewed within lease_timeout back to pending
+
+        Returns:
+        --------
+        reclaimed : list
+            Unit ids returned to the queue
+        """
+        reclaimed = []
+        deadline = time.time() - self.config["lease_timeout"]
+        for unit_id in self._ids("leased"):
+            leased = self._path("leased", unit_id)
+            try:
+                if os.path.getmtime(leased) >= deadline:
+                    continue
+                os.rename(leased, self._path("pending", unit_id))
+            except FileNotFoundError:
+                continue  # completed meanwhile
+            reclaimed.append(unit_id)
+        return reclaimed
+
+    def records(self):
+        """Result records of all finished units"""
+        return [_read_json(self._path("done", u)) for u in self._ids("done")]
+
+
+def process_unit(unit, config):
+    """
+    Run the rinexnav positions pipeline for one (file, day) unit
+
+    Returns:
+    --------
+    record : dict
+        Timings, stage statistics and output paths of the unit
+    """
+    name = os.path.splitext(os.path.basename(unit["file"]))[0]
+    os.makedirs(config["out_dir"], exist_ok=True)
+    csv_filename = os.path.join(config["out_dir"], f"{name}.csv")
+    lla_filename = os.path.join(config["out_dir"], f"{name}_latlonalt.csv")
+    suffix = f".{os.getpid()}.tmp"
+
+    started = time.time()
+    t0 = time.perf_counter()
+    mytime = gpsweekcal(unit["date"], config["interval"])
+    stats, counts = run_pipeline(
+        unit["file"],
+        mytime,
+        unit["date"],
+        csv_filename + suffix,
+        lla_filename + suffix,
+        workers=config["compute_workers"],
+    )
+    os.replace(csv_filename + suffix, csv_filename)
+    os.replace(lla_filename + suffix, lla_filename)
+    return {
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        "started": started,
+        "elapsed_s": time.perf_counter() - t0,
+        "positions": counts["positions"],
+        "stages": stats,
+        "outputs": [csv_filename, lla_filename],
+    }
+
+
+def run_worker(queue_dir, worker_id=None, poll=0.2):
+    """
+    Process units from the queue until every unit is settled
+
+    Parameters:
+    -----------
+    queue_dir : str
+        Queue directory created by the coordinator
+    worker_id : str, optional
+        Name recorded with each unit (default host:pid)
+    poll : float
+        Seconds to wait when no unit is pending
+
+    Returns:
+    --------
+    processed : int
+        Number of units this worker completed
+    """
+    queue = WorkQueue(queue_dir)
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    heartbeat = queue.config["lease_timeout"] / 3
+    processed = 0
+    while True:
+        unit = queue.claim(worker_id)
+        if unit is None:
+            if queue.settled():
+                return processed
+            time.sleep(poll)
+            continue
+
+        stop = threading.Event()
+
+        def renew(unit_id=unit["unit"], stop=stop):
+            while not stop.wait(heartbeat):
+                queue.renew(unit_id)
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            record = process_unit(unit, queue.config)
+        except Exception as e:
+            queue.release(unit, f"{type(e).__name__}: {e}")
+        else:
+            queue.complete(unit, record)
+            processed += 1
+        finally:
+            stop.set()
+            thread.join()
+
+
+def run_coordinator(
+    manifest,
+    queue_dir,
+    lease_timeout=60.0,
+    max_attempts=3,
+    interval=15,
+    out_dir="results",
+    compute_workers=2,
+    local_workers=0,
+    poll=0.5,
+):
+    """
+    Shard a manifest into units, supervise leases until all are settled
+
+    Parameters:
+    -----------
+    manifest : str
+        Text file listing navigation files (see read_manifest)
+    queue_dir : str
+        Shared queue directory; an existing queue is resumed
+    lease_timeout : float
+        Seconds without a heartbeat before a unit is handed to another worker
+    max_attempts : int
+        Claims per unit before it is marked failed
+    interval : int
+        Seconds per epoch for the positions
+    out_dir : str
+        Directory for the CSV outputs (shared by the workers)
+    compute_workers : int
+        Compute threads inside each worker's pipeline
+    local_workers : int
+        Worker processes to start on this machine
+    poll : float
+        Seconds between lease checks
+
+    Returns:
+    --------
+    summary : dict
+        'counts' per state, 'reclaimed' unit ids and 'records' of done units
+    """
+    units = read_manifest(manifest)
+    queue = WorkQueue.create(
+        queue_dir,
+        units,
+        lease_timeout=lease_timeout,
+        max_attempts=max_attempts,
+        interval=interval,
+        out_dir=out_dir,
+        compute_workers=compute_workers,
+    )
+    processes = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker"]
+            + ["--queue_dir", queue_dir, "--worker_id", f"local{k}"]
+        )
+        for k in range(local_workers)
+    ]
+
+    reclaimed = []
+    try:
+        while not queue.settled():
+            reclaimed += queue.reclaim_expired()
+            time.sleep(poll)
+    finally:
+        for process in processes:
+            process.wait()
+
+    summary = {
+        "counts": queue.counts(),
+        "reclaimed": reclaimed,
+        "records": queue.records(),
+    }
+    _write_json(os.path.join(queue_dir, "summary.json"), summary)
+    return summary
+
+
+def format_records(records):
+    """Per-unit timing table with the slowest pipeline stage of each unit"""
+    lines = [f"{'Unit':<22}{'Worker':<12}{'Tries':>6}{'Time s':>9}  Bottleneck"]
+    for r in sorted(records, key=lambda r: r["unit"]):
+        slowest = max(r["stages"], key=lambda s: s["utilization"])["stage"]
+        lines.append(
+            f"{r['unit']:<22}{r['worker']:<12}{r['attempts']:>6}"
+            f"{r['elapsed_s']:>9.2f}  {slowest}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Coordinator/worker processing of a navigation file archive"
+    )
+    parser.add_argument("--worker", action="store_true", help="Run as a worker instead")
+    parser.add_argument(
+        "--manifest", type=str, help="Text file listing navigation files"
+    )
+    parser.add_argument(
+        "--queue_dir", type=str, default="results/queue", help="Shared queue directory"
+    )
+    parser.add_argument("--worker_id", type=str, default=None, help="Worker name")
+    parser.add_argument(
+        "--local_workers", type=int, default=0, help="Worker processes to start here"
+    )
+    parser.add_argument(
+        "--lease_timeout", type=float, default=60.0, help="Lease timeout in seconds"
+    )
+    parser.add_argument(
+        "--max_attempts", type=int, default=3, help="Claims per unit before failing"
+    )
+    parser.add_argument("--interval", type=int, default=15, help="Seconds per epoch")
+    parser.add_argument(
+        "--compute_workers", type=int, default=2, help="Compute threads per worker"
+    )
+    args = parser.parse_args()
+
+    if args.worker:
+        processed = run_worker(args.queue_dir, args.worker_id)
+        print(f"Worker {args.worker_id or os.getpid()} processed {processed} units")
+        return 0
+
+    if args.manifest is None:
+        parser.error("--manifest is required for the coordinator")
+    summary = run_coordinator(
+        args.manifest,
+        args.queue_dir,
+        args.lease_timeout,
+        args.max_attempts,
+        args.interval,
+        "results",
+        args.compute_workers,
+        args.local_workers,
+    )
+    print(format_records(summary["records"]))
+    print(f"Units: {summary['counts']}, reclaimed leases: {len(summary['reclaimed'])}")
+    for record in summary["records"]:
+        for filename in record["outputs"]:
+            print(f"✓ Saved: {filename}")
+    return 1 if summary["counts"]["failed"] else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+"""
+SP3 Orbit Products
+Streaming SP3-c/d writer and vectorized SP3 reader into position tables
+
+@author: Based on the SP3-c and SP3-d format specifications
+"""
+
+import argparse
+import datetime
+import os
+import time
+
+import numpy as np
+from check_t import check_t
+from find_eph import ephemeris_table, find_eph_batch, gather_eph
+from gpsweekcal import gpsweekcal
+from positions import iter_position_chunks, position_cube
+from postable import PositionTable
+from readrinex import read_nav
+
+GPS_EPOCH = datetime.datetime(1980, 1, 6)
+SATS_PER_LINE = 17
+BAD_CLOCK = 999999.999999  # SP3 value for a missing clock (microseconds)
+
+
+def gps_datetime(week, tow):
+    """Calendar time of a GPS week and seconds of week"""
+    return GPS_EPOCH + datetime.timedelta(weeks=int(week), seconds=float(tow))
+
+
+def _epoch_line(week, tow):
+    t = gps_datetime(week, tow)
+    seconds = t.second + t.microsecond * 1e-6
+    return (
+        f"*  {t.year:4d} {t.month:2d} {t.day:2d} "
+        f"{t.hour:2d} {t.minute:2d} {seconds:11.8f}"
+    )
+
+
+def broadcast_clock(table, sv, tow):
+    """
+    Broadcast satellite clock offsets in the SP3 convention
+
+    The polynomial af0 + af1 dt + af2 dt^2 only: SP3 clocks exclude the
+    periodic relativistic term and refer to the ionosphere-free
+    combination, so TGD is not applied (unlike satpos.satclock_batch).
+
+    Returns:
+    --------
+    clock : numpy.ndarray
+        (epochs, svs) offsets in seconds, NaN without ephemeris
+    """
+    tow = np.asarray(tow, dtype=np.float64)[:, None]
+    eph = gather_eph(table, find_eph_batch(table, np.asarray(sv)[None, :], tow))
+    dt = check_t(tow - eph["toc"])
+    return (
+        eph["SVclockBias"] + eph["SVclockDrift"] * dt + eph["SVclockDriftRate"] * dt**2
+    )
+
+
+class SP3Writer:
+    """
+    SP3-c or SP3-d file written one block of epochs at a time
+
+    The header needs the satellite list and epoch count up front; the
+    position records are then streamed, so a long file never has to be
+    held in memory. Use as a context manager, or call close().
+    """
+
+    def __init__(
+        self,
+        filename,
+        sv,
+        week,
+        t0,
+        interval,
+        epochs,
+        version="d",
+        coord_system="IGS14",
+        agency="RNXP",
+        comments=(),
+    ):
+        """
+        Parameters:
+        -----------
+        filename : str
+            Output path
+        sv : array of str
+            Satellite ids ('G01', 'E11', ...) in column order of the cubes
+        week, t0 : int, float
+            GPS week and seconds of week of the first epoch
+        interval : float
+            Epoch spacing in seconds
+        epochs : int
+            Number of epochs that will be written
+        version : str
+            'c' or 'd'
+        coord_system, agency : str
+            Header labels
+        comments : sequence of str
+            Extra '/*' comment lines
+        """
+        if version not in ("c", "d"):
+            raise ValueError(f"Unknown SP3 version: {version}")
+        self.sv = [str(s) for s in sv]
+        self.week = int(week)
+        self.epochs = int(epochs)
+        self.written = 0
+        self._f = open(filename, "w")
+        self._f.write(
+            self._header(version, t0, interval, coord_system, agency, comments)
+        )
+
+    def _header(self, version, t0, interval, coord_system, agency, comments):
+        start = gps_datetime(self.week, t0)
+        seconds = start.second + start.microsecond * 1e-6
+        mjd = (start - datetime.datetime(1858, 11, 17)).total_seconds() / 86400.0
+        lines = [
+            f"#{version}P{start.year:4d} {start.month:2d} {start.day:2d} "
+            f"{start.hour:2d} {start.minute:2d} {seconds:11.8f} {self.epochs:7d} "
+            f"ORBIT {coord_system:<5.5s} BCT {agency:<4.4s}",
+            f"## {self.week:4d} {t0:15.8f} {interval:14.8f} {int(mjd):5d} "
+            f"{mjd % 1:15.13f}",
+        ]
+        # At least 5 satellite and accuracy lines keeps the file valid SP3-c
+        nlines = max(5, -(-len(self.sv) // SATS_PER_LINE))
+        ids = self.sv + ["  0"] * (nlines * SATS_PER_LINE - len(self.sv))
+        for k in range(nlines):
+            chunk = "".join(ids[k * SATS_PER_LINE : (k + 1) * SATS_PER_LINE])
+            lead = f"+  {len(self.sv):3d}   " if k == 0 else "+        "
+            lines.append(lead + chunk)
+        for _ in range(nlines):
+            lines.append("++       " + "  0" * SATS_PER_LINE)
+        systems = {s[0] for s in self.sv}
+        file_type = systems.pop() if len(systems) == 1 else "M"
+        lines += [
+            f"%c {file_type}  cc GPS ccc cccc cccc cccc cccc ccccc ccccc ccccc ccccc",
+            "%c cc cc ccc ccc cccc cccc cccc cccc ccccc ccccc ccccc ccccc",
+            "%f  1.2500000  1.025000000  0.00000000000  0.000000000000000",
+            "%f  0.0000000  0.000000000  0.00000000000  0.000000000000000",
+            "%i    0    0    0    0      0      0      0      0         0",
+            "%i    0    0    0    0      0      0      0      0         0",
+        ]
+        comments = list(comments) + ["Broadcast orbits computed by rinexpos"]
+        comments += [""] * max(0, 4 - len(comments))
+        lines += [f"/* {c[:57]}" for c in comments]
+        return "\n".join(lines) + "\n"
+
+    def write(self, tow, cube, clock=None):
+        """
+        Append a block of epochs
+
+        Parameters:
+        -----------
+        tow : numpy.ndarray
+            (block,) GPS seconds of week (of the writer's week)
+        cube : numpy.ndarray
+            (block, svs, 3) positions in meters; NaN rows are written as
+            the SP3 'bad' value 0.0
+        clock : numpy.ndarray, optional
+            (block, svs) clock offsets in seconds; NaN as 999999.999999
+        """
+        if self.written + len(tow) > self.epochs:
+            raise ValueError("More epochs than announced in the SP3 header")
+        km = np.nan_to_num(np.asarray(cube) / 1000.0, nan=0.0)
+        if clock is None:
+            us = np.full(km.shape[:2], BAD_CLOCK)
+        else:
+            us = np.nan_to_num(np.asarray(clock) * 1e6, nan=BAD_CLOCK)
+        values = np.concatenate([km, us[..., None]], axis=-1)
+        record = "".join(f"P{s}%14.6f%14.6f%14.6f%14.6f\n" for s in self.sv)
+        self._f.write(
+            "".join(
+                _epoch_line(self.week, t) + "\n" + record % tuple(v.ravel())
+                for t, v in zip(tow, values, strict=True)
+            )
+        )
+        self.written += len(tow)
+
+    def close(self):
+        """Finish the file with the EOF line"""
+        if self._f.closed:
+            return
+        self._f.write("EOF\n")
+        self._f.close()
+        if self.written != self.epochs:
+            raise ValueError(
+                f"SP3 header announced {self.epochs} epochs, {self.written} written"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+
+
+def _columns(records, start, width):
+    """
+    Fixed-width float fields of many records at once
+
+    records is a (lines, columns) uint8 array; blank fields become NaN.
+    """
+    field = records[:, start : start + width].copy()
+    field[field == 0] = ord(" ")
+    empty = (field == ord(" ")).all(axis=1)
+    field[empty, -3:] = np.frombuffer(b"nan", np.uint8)
+    return field.view(f"S{width}").ravel().astype(np.float64)
+
+
+def _records(lines, kind, width=60):
+    """(lines, width) uint8 matrix of the lines starting with kind"""
+    selected = [line for line in lines if line[:1] == kind]
+    return np.array(selected, dtype=f"S{width}").view(np.uint8).reshape(-1, width)
+
+
+def read_sp3(filename):
+    """
+    Read an SP3-c or SP3-d orbit file into a position table
+
+    Position ('P') and optional velocity ('V') records are copied into a
+    fixed-width byte matrix and converted column by column, without a
+    Python loop over fields. Missing positions (0.0 or blank) become NaN,
+    as do missing clocks (999999.999999). Without velocity records the
+    velocity part of the states is NaN, so only Lagrange interpolation
+    applies.
+
+    Parameters:
+    -----------
+    filename : str
+        SP3 file path
+
+    Returns:
+    --------
+    ptable : postable.PositionTable
+        Nodes at the SP3 epochs (t0 in seconds of the header's GPS week)
+    clock : numpy.ndarray
+        (epochs, svs) clock offsets in seconds
+    week : int
+        GPS week of ptable.t0
+    """
+    with open(filename, "rb") as f:
+        lines = f.read().splitlines()
+    week = int(lines[1][3:7])
+    t0 = float(lines[1][8:23])
+    step = float(lines[1][24:38])
+
+    kind = np.array([line[:1] for line in lines])
+    epoch_of_line = np.cumsum(kind == b"*") - 1
+    epochs = int(epoch_of_line[-1]) + 1
+
+    pos = _records(lines, b"P")
+    ids = pos[:, 1:4].copy().view("S3").ravel()
+    sv = np.unique(ids)
+    e, s = epoch_of_line[kind == b"P"], np.searchsorted(sv, ids)
+
+    states = np.full((epochs, len(sv), 6), np.nan)
+    clock = np.full((epochs, len(sv)), np.nan)
+    xyz = np.column_stack([_columns(pos, c, 14) for c in (4, 18, 32)])
+    xyz[(xyz == 0).all(axis=1)] = np.nan
+    states[e, s, :3] = xyz * 1000.0
+    us = _columns(pos, 46, 14)
+    clock[e, s] = np.where(np.abs(us) >= BAD_CLOCK - 1, np.nan, us * 1e-6)
+
+    vel = _records(lines, b"V")
+    if len(vel):
+        vs = np.searchsorted(sv, vel[:, 1:4].copy().view("S3").ravel())
+        dms = np.column_stack([_columns(vel, c, 14) for c in (4, 18, 32)])
+        states[epoch_of_line[kind == b"V"], vs, 3:] = dms * 0.1  # dm/s -> m/s
+    return PositionTable(t0, step, sv.astype(str), states), clock, week
+
+
+def write_sp3(
+    filename, table, week, tow, sv, clock=True, chunk_epochs=2880, version="d"
+):
+    """
+    Stream broadcast positions (and clocks) for a time grid to SP3
+
+    Parameters:
+    -----------
+    filename : str
+        Output path
+    table : dict
+        Output of find_eph.ephemeris_table
+    week : int
+        GPS week of tow
+    tow : numpy.ndarray
+        (epochs,) uniformly spaced GPS seconds of week
+    sv : numpy.ndarray
+        (svs,) satellite ids
+    clock : bool
+        Also write broadcast clock offsets
+    chunk_epochs : int
+        Epochs computed and written per block
+    version : str
+        'c' or 'd'
+    """
+    interval = float(tow[1] - tow[0]) if len(tow) > 1 else 0.0
+    with SP3Writer(filename, sv, week, tow[0], interval, len(tow), version) as writer:
+        for t, cube in iter_position_chunks(table, tow, sv, chunk_epochs):
+            writer.write(t, cube, broadcast_clock(table, sv, t) if clock else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write broadcast orbits as SP3 and interpolate SP3 files"
+    )
+    parser.add_argument(
+        "--file", type=str, default="data/brdc0680.20n", help="RINEX navigation file"
+    )
+    parser.add_argument("--interval", type=int, default=300, help="Seconds per epoch")
+    parser.add_argument(
+        "--version", type=str, default="d", choices=("c", "d"), help="SP3 version"
+    )
+    parser.add_argument(
+        "--no_clock", action="store_true", help="Write 999999.999999 clocks"
+    )
+    parser.add_argument(
+        "--chunk_epochs", type=int, default=2880, help="Epochs per write block"
+    )
+    parser.add_argument(
+        "--queries",
+        type=int,
+        default=1_000_000,
+        help="(time, SV) points interpolated in the benchmark",
+    )
+    parser.add_argument("--order", type=int, default=9, help="Lagrange order")
+    args = parser.parse_args()
+
+    try:
+        header, nav_data = read_nav(args.file)
+    except Exception as e:
+        print(f"Failed to read {args.file}: {e}")
+        return 1
+    table = ephemeris_table(nav_data)
+    sv = np.unique(table["sv"])
+    mytime = gpsweekcal(header.date, args.interval)
+    week, tow = int(mytime[0, 0]), mytime[:, 1].astype(float)
+
+    os.makedirs("results", exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.file))[0]
+    filename = f"results/{name}.sp3"
+    t0 = time.perf_counter()
+    write_sp3(
+        filename,
+        table,
+        week,
+        tow,
+        sv,
+        not args.no_clock,
+        args.chunk_epochs,
+        args.version,
+    )
+    written = time.perf_counter() - t0
+    records = len(tow) * len(sv)
+    print(
+        f"Wrote {len(tow)} epochs x {len(sv)} SVs in {written:.2f} s "
+        f"({records / written:.0f} records/s)"
+    )
+
+    t0 = time.perf_counter()
+    ptable, clock, _ = read_sp3(filename)
+    loaded = time.perf_counter() - t0
+    print(f"Read back in {loaded:.2f} s ({records / loaded:.0f} records/s)")
+
+    # Interpolate inside the span that has a full Lagrange window
+    margin = (args.order // 2) * ptable.step
+    epochs = max(1, args.queries // len(ptable.sv))
+    t = np.random.default_rng(0).uniform(
+        ptable.times[0] + margin, ptable.times[-1] - margin, epochs
+    )
+    t0 = time.perf_counter()
+    xyz = ptable.interpolate(t, "lagrange", args.order)
+    elapsed = time.perf_counter() - t0
+    print(
+        f"Interpolated {xyz.shape[0] * xyz.shape[1]} points in {elapsed:.2f} s "
+        f"({xyz.shape[0] * xyz.shape[1] / elapsed:.0f} points/s)"
+    )
+    check = np.sort(t[:2000])
+    error = np.linalg.norm(
+        ptable.interpolate(check, "lagrange", args.order)
+        - position_cube(table, check, ptable.sv),
+        axis=-1,
+    )
+    print(
+        f"SP3 interpolation vs broadcast satpos: median "
+        f"{np.nanmedian(error):.3f} m, max {np.nanmax(error):.3f} m"
+    )
+    print(f"✓ Saved: {filename}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Satellite Position Spatial Index
+Per-epoch uniform grid index for radius and close approach queries
+"""
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+from find_eph import ephemeris_table
+from gpsweekcal import gpsweekcal
+from positions import nav_day, position_cube
+from readrinex import readrinex
+
+GRID_ORIGIN = -5.0e7  # meters, below any GNSS orbit coordinate
+GRID_SPAN = 1.0e8  # meters covered along each axis
+MIN_CELL_SIZE = 1.0e5  # keeps the combined int64 keys from overflowing
+
+
+def _concat_ranges(starts, ends):
+    """Indices start..end-1 of every range, concatenated, with range owners"""
+    lengths = ends - starts
+    owner = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    return starts[owner] + offsets, owner
+
+
+class PositionIndex:
+    """
+    Uniform grid over satellite positions, bucketed by epoch
+
+    Every position is keyed by (epoch, cell) in one sorted int64 array, so
+    the candidates for any cell at any epoch are found with a binary search.
+    """
+
+    def __init__(self, times, sv, xyz, cell_size=2.0e6):
+        """
+        Build the index from flat position records
+
+        Parameters:
+        -----------
+        times : numpy.ndarray
+            (N,) GPS seconds of week of each position
+        sv : numpy.ndarray
+            (N,) satellite id of each position
+        xyz : numpy.ndarray
+            (N, 3) ECEF positions in meters (NaN rows are dropped)
+        cell_size : float
+            Grid cell edge in meters
+        """
+        if cell_size < MIN_CELL_SIZE:
+            raise ValueError(f"cell_size must be at least {MIN_CELL_SIZE:.0f} m")
+        keep = np.isfinite(xyz).all(axis=1)
+        times, sv, xyz = np.asarray(times)[keep], np.asarray(sv)[keep], xyz[keep]
+
+        self.cell_size = cell_size
+        self.ncells = int(np.ceil(GRID_SPAN / cell_size))
+        self.epochs, epoch = np.unique(times, return_inverse=True)
+
+        keys = self._keys(epoch, self._cells(xyz))
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.epoch = epoch[order]
+        self.sv = sv[order]
+        self.xyz = xyz[order]
+        self.cell_keys, self.cell_start, self.cell_count = np.unique(
+            self.keys, return_index=True, return_counts=True
+        )
+
+    @classmethod
+    def from_svpos(cls, svpos, cell_size=2.0e6):
+        """Index an rinexnav svpos array of [time, sv, X, Y, Z] rows"""
+        return cls(svpos[:, 0], svpos[:, 1].astype(int), svpos[:, 2:5], cell_size)
+
+    @classmethod
+    def from_cube(cls, tow, sv, cube, cell_size=2.0e6):
+        """Index an (epochs, svs, 3) position cube"""
+        nep, nsv, _ = cube.shape
+        return cls(
+            np.repeat(tow, nsv), np.tile(sv, nep), cube.reshape(-1, 3), cell_size
+        )
+
+    def _cells(self, xyz):
+        cells = np.floor((xyz - GRID_ORIGIN) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, self.ncells - 1)
+
+    def _keys(self, epoch, cells):
+        n = self.ncells
+        return ((epoch * n + cells[..., 0]) * n + cells[..., 1]) * n + cells[..., 2]
+
+    def epoch_index(self, t):
+        """Nearest indexed epoch for each time"""
+        t = np.asarray(t, dtype=np.float64)
+        i = np.clip(np.searchsorted(self.epochs, t), 1, len(self.epochs) - 1)
+        before = np.abs(t - self.epochs[i - 1]) <= np.abs(self.epochs[i] - t)
+        return np.where(before, i - 1, i)
+
+    def _candidates(self, epoch, cells, offsets):
+        """Record indices in the offset cells around each (epoch, cell) query"""
+        # Offset-major layout keeps each offset's keys sorted when the
+        # queries are, which makes the binary searches cache friendly
+        n = len(cells)
+        q_cells = (offsets[:, None, :] + cells[None, :, :]).reshape(-1, 3)
+        keys = self._keys(np.tile(epoch, len(offsets)), q_cells)
+        inside = ((q_cells >= 0) & (q_cells < self.ncells)).all(axis=1)
+
+        pos = np.searchsorted(self.cell_keys, keys)
+        pos = np.minimum(pos, len(self.cell_keys) - 1)
+        occupied = inside & (self.cell_keys[pos] == keys)
+        starts = self.cell_start[pos]
+        ends = np.where(occupied, starts + self.cell_count[pos], starts)
+        records, owner = _concat_ranges(starts, ends)
+        return records, owner % n, owner // n
+
+    def _offsets(self, radius):
+        k = int(np.ceil(radius / self.cell_size))
+        return np.array(list(itertools.product(range(-k, k + 1), repeat=3)))
+
+    def query_radius(self, points, radius, t):
+        """
+        Satellites within radius of points at given times
+
+        Parameters:
+        -----------
+        points : numpy.ndarray
+            (Q, 3) ECEF query points in meters
+        radius : float
+            Search radius in meters
+        t : numpy.ndarray
+            (Q,) GPS seconds of week (snapped to the nearest indexed epoch)
+
+        Returns:
+        --------
+        query, sv, distance : numpy.ndarray
+            Query number, satellite id and distance of every match
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        epoch = np.broadcast_to(self.epoch_index(t), (len(points),))
+        records, query, _ = self._candidates(
+            epoch, self._cells(points), self._offsets(radius)
+        )
+        distance = np.linalg.norm(self.xyz[records] - points[query], axis=1)
+        hit = distance <= radius
+        return query[hit], self.sv[records[hit]], distance[hit]
+
+    def close_approaches(self, radius, t0=None, t1=None, block=100000):
+        """
+        All satellite pairs closer than radius within a time window
+
+        Parameters:
+        -----------
+        radius : float
+            Separation threshold in meters
+        t0, t1 : float, optional
+            Inclusive time window in GPS seconds of week
+        block : int
+            Positions searched together, bounding temporary memory
+
+        Returns:
+        --------
+        approaches : dict
+            'time', 'sv_a', 'sv_b' and 'distance' arrays, one per pair and
+            epoch
+        """
+        # The index is sorted by epoch first, so a window is a contiguous slice
+        e0 = 0 if t0 is None else np.searchsorted(self.epochs, t0, side="left")
+        e1 = (
+            len(self.epochs)
+            if t1 is None
+            else np.searchsorted(self.epochs, t1, side="right")
+        )
+        lo, hi = np.searchsorted(self.epoch, [e0, e1], side="left")
+
+        # Own cell plus the half of the neighbour cells after it, so each
+        # unordered pair is generated exactly once
+        offsets = self._offsets(radius)
+        offsets = offsets[_lexicographic_positive(offsets) | ~offsets.any(axis=1)]
+
+        found = {"time": [], "sv_a": [], "sv_b": [], "distance": []}
+        for start in range(lo, hi, block):
+            sel = np.arange(start, min(hi, start + block))
+            cells = self._cells(self.xyz[sel])
+            records, owner, which = self._candidates(self.epoch[sel], cells, offsets)
+            a, b = sel[owner], records
+            keep = offsets[which].any(axis=1) | (b > a)
+            a, b = a[keep], b[keep]
+
+            distance = np.linalg.norm(self.xyz[a] - self.xyz[b], axis=1)
+            hit = distance <= radius
+            a, b = a[hit], b[hit]
+            found["time"].append(self.epochs[self.epoch[a]])
+            found["sv_a"].append(self.sv[a])
+            found["sv_b"].append(self.sv[b])
+            found["distance"].append(distance[hit])
+
+        if not found["time"]:
+            return {
+                "time": np.empty(0),
+                "sv_a": self.sv[:0],
+                "sv_b": self.sv[:0],
+                "distance": np.empty(0),
+            }
+        return {key: np.concatenate(values) for key, values in found.items()}
+
+
+def _lexicographic_positive(offsets):
+    """True for cell offsets after (0, 0, 0) in lexicographic order"""
+    dx, dy, dz = offsets[:, 0], offsets[:, 1], offsets[:, 2]
+    return (dx > 0) | ((dx == 0) & (dy > 0)) | ((dx == 0) & (dy == 0) & (dz > 0))
+
+
+def brute_force_radius(svpos, points, radius, t):
+    """Radius query by scanning the svpos rows of each query time"""
+    matches = []
+    for q, (point, tq) in enumerate(zip(points, t, strict=True)):
+        rows = svpos[svpos[:, 0] == tq]
+        distance = np.linalg.norm(rows[:, 2:5] - point, axis=1)
+        hit = distance <= radius
+        for row, d in zip(rows[hit], distance[hit], strict=True):
+            matches.append((q, int(row[1]), d))
+    return matches
+
+
+def brute_force_close_approaches(cube, radius, chunk_epochs=1000):
+    """Pairs closer than radius by full pairwise distances per epoch"""
+    found = []
+    for start in range(0, len(cube), chunk_epochs):
+        block = cube[start : start + chunk_epochs]
+        diff = block[:, :, None, :] - block[:, None, :, :]
+        distance = np.linalg.norm(diff, axis=-1)
+        epoch, a, b = np.nonzero(np.triu(distance <= radius, k=1))
+        found.append((epoch + start, a, b, distance[epoch, a, b]))
+    return tuple(np.concatenate(parts) for parts in zip(*found, strict=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the satellite position spatial index"
+    )
+    parser.add_argument(
+        "--file", type=str, default="data/brdc0680.20n", help="RINEX navigation file"
+    )
+    parser.add_argument("--interval", type=int, default=30, help="Seconds per epoch")
+    parser.add_argument(
+        "--radius", type=float, default=5000.0, help="Query radius in km"
+    )
+    parser.add_argument(
+        "--conjunction",
+        type=float,
+        default=1000.0,
+        help="Close approach threshold in km",
+    )
+    parser.add_argument(
+        "--queries", type=int, default=200, help="Number of random radius queries"
+    )
+    parser.add_argument(
+        "--cell_size", type=float, default=None, help="Grid cell in km (default radius)"
+    )
+    args = parser.parse_args()
+
+    nav_data = readrinex(args.file)
+    if nav_data is None:
+        return 1
+    table = ephemeris_table(nav_data)
+    tow = gpsweekcal(nav_day(nav_data), args.interval)[:, 1].astype(float)
+    sv = np.unique(table["sv"])
+    prn = np.char.lstrip(np.char.lstrip(sv, "G"), "0").astype(int)
+    cube = position_cube(table, tow, sv)
+    radius = args.radius * 1e3
+    cell_size = radius if args.cell_size is None else args.cell_size * 1e3
+
+    svpos = np.column_stack(
+        [np.repeat(tow, len(sv)), np.tile(prn, len(tow)), cube.reshape(-1, 3)]
+    )
+    print(f"Positions: {len(svpos)} ({len(tow)} epochs x {len(sv)} SVs)")
+
+    t0 = time.perf_counter()
+    index = PositionIndex.from_svpos(svpos, cell_size)
+    print(f"Index build: {time.perf_counter() - t0:.3f} s")
+
+    rng = np.random.default_rng(0)
+    qt = rng.choice(tow, args.queries)
+    points = cube[np.searchsorted(tow, qt), rng.integers(0, len(sv), args.queries)]
+    points = points + rng.normal(0, radius / 2, points.shape)
+    points = np.nan_to_num(points)
+
+    t0 = time.perf_counter()
+    query, _, _ = index.query_radius(points, radius, qt)
+    t_index = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    brute = brute_force_radius(svpos, points, radius, qt)
+    t_brute = time.perf_counter() - t0
+    print(
+        f"Radius queries: index {t_index:.4f} s, brute force {t_brute:.4f} s "
+        f"({len(query)} vs {len(brute)} matches, {t_brute / t_index:.1f}x)"
+    )
+
+    t0 = time.perf_counter()
+    conjunction = args.conjunction * 1e3
+    pair_index = PositionIndex.from_svpos(svpos, max(conjunction, MIN_CELL_SIZE))
+    pairs = pair_index.close_approaches(conjunction)
+    t_index = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    brute = brute_force_close_approaches(cube, conjunction)
+    t_brute = time.perf_counter() - t0
+    print(
+        f"Close approaches: index {t_index:.4f} s, brute force {t_brute:.4f} s "
+        f"({len(pairs['time'])} vs {len(brute[0])} pairs, {t_brute / t_index:.1f}x)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
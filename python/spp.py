@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Single Point Positioning
+Batch least-squares receiver positions from pseudoranges and broadcast orbits
+
+@author: Based on standard GNSS single point positioning algorithms
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+from ecef_to_lla import ecef_to_lla, lla_to_ecef
+from find_eph import ephemeris_table, find_eph_batch, gather_eph
+from geometry import dop, look_angles
+from gpsweekcal import gpsweekcal
+from positions import nav_day
+from readrinex import readrinex
+from readrinexobs import iter_obs_chunks, read_obs_header
+from satpos import omegae_dot, satclock_batch, satpos_batch
+
+C = 299792458.0  # Speed of light m/s
+
+
+def rotate_earth(sat_xyz, tau):
+    """
+    Rotate satellite ECEF positions by the Earth rotation during signal travel
+
+    Parameters:
+    -----------
+    sat_xyz : numpy.ndarray
+        (..., 3) positions in the ECEF frame at transmit time
+    tau : numpy.ndarray
+        Signal travel time in seconds
+
+    Returns:
+    --------
+    rotated : numpy.ndarray
+        (..., 3) positions in the ECEF frame at receive time
+    """
+    theta = omegae_dot * tau
+    c, s = np.cos(theta), np.sin(theta)
+    rotated = np.empty_like(sat_xyz)
+    rotated[..., 0] = c * sat_xyz[..., 0] + s * sat_xyz[..., 1]
+    rotated[..., 1] = -s * sat_xyz[..., 0] + c * sat_xyz[..., 1]
+    rotated[..., 2] = sat_xyz[..., 2]
+    return rotated
+
+
+def transmit_state(tow, sv, pseudorange, table):
+    """
+    Satellite positions and clock offsets at signal transmit time
+
+    Parameters:
+    -----------
+    tow : numpy.ndarray
+        (epochs,) receiver time tags in GPS seconds of week
+    sv : numpy.ndarray
+        (svs,) satellite ids
+    pseudorange : numpy.ndarray
+        (epochs, svs) pseudoranges in meters (NaN where missing)
+    table : dict
+        Output of find_eph.ephemeris_table
+
+    Returns:
+    --------
+    sat_xyz : numpy.ndarray
+        (epochs, svs, 3) ECEF positions at transmit time
+    sat_clock : numpy.ndarray
+        (epochs, svs) satellite clock offsets in seconds
+    valid : numpy.ndarray
+        (epochs, svs) True where a pseudorange and an ephemeris exist
+    """
+    index = find_eph_batch(table, sv[None, :], tow[:, None])
+    valid = np.isfinite(pseudorange) & (index >= 0)
+    eph = gather_eph(table, index)
+
+    # Transmit time by the satellite clock, then corrected to GPS time
+    t_sv = tow[:, None] - pseudorange / C
+    sat_clock = satclock_batch(t_sv, eph)
+    sat_clock = satclock_batch(t_sv - sat_clock, eph)
+
+    sat_xyz = satpos_batch(t_sv - sat_clock, eph)
+    valid &= np.isfinite(sat_xyz).all(axis=-1)
+    sat_xyz[~valid] = 0.0
+    return sat_xyz, np.where(valid, sat_clock, 0.0), valid
+
+
+def solve_spp(
+    tow, sv, pseudorange, table, x0=None, elev_mask=10.0, max_iter=10, tol=1e-4
+):
+    """
+    Least-squares single point positions for many epochs at once
+
+    All epochs are iterated together: every iteration builds the stacked
+    (epochs, 4, 4) normal equations with einsum and solves them in one call.
+
+    Parameters:
+    -----------
+    tow : numpy.ndarray
+        (epochs,) receiver time tags in GPS seconds of week
+    sv : numpy.ndarray
+        (svs,) satellite ids
+    pseudorange : numpy.ndarray
+        (epochs, svs) pseudoranges in meters (NaN where missing)
+    table : dict
+        Output of find_eph.ephemeris_table
+    x0 : array, optional
+        Approximate receiver ECEF position; Earth centre if not given
+    elev_mask : float
+        Elevation mask in degrees, applied once the solution is near the
+        Earth's surface
+    max_iter : int
+        Maximum number of Gauss-Newton iterations
+    tol : float
+        Position update in meters below which iteration stops
+
+    Returns:
+    --------
+    solution : dict
+        'tow', 'xyz' (epochs, 3), 'lat', 'lon', 'alt', 'clock_bias' (s),
+        'nsat' and the DOP arrays from geometry.dop
+    """
+    tow = np.asarray(tow, dtype=np.float64)
+    sv = np.asarray(sv)
+    nep = len(tow)
+    sat_xyz, sat_clock, valid = transmit_state(tow, sv, pseudorange, table)
+    corrected = np.where(valid, pseudorange + C * sat_clock, 0.0)
+
+    x = np.zeros((nep, 4))
+    if x0 is not None:
+        x[:, :3] = x0
+    use = valid
+    tau = np.where(valid, pseudorange / C, 0.0)
+    G = np.zeros(valid.shape + (4,))
+    G[..., 3] = 1.0
+
+    for _ in range(max_iter):
+        sat = rotate_earth(sat_xyz, tau)
+        diff = sat - x[:, None, :3]
+        rho = np.linalg.norm(diff, axis=-1)
+        rho = np.where(valid, rho, 1.0)
+        tau = rho / C
+        G[..., :3] = -diff / rho[..., None]
+
+        use = valid
+        near_surface = np.linalg.norm(x[:, :3], axis=-1) > 6.0e6
+        if elev_mask is not None and near_surface.any():
+            elevation, _ = look_angles(x[:, None, :3], sat)
+            use = valid & (~near_surface[:, None] | (elevation >= elev_mask))
+
+        w = use.astype(np.float64)
+        residual = np.where(use, corrected - rho - x[:, 3:4], 0.0)
+        N = np.einsum("eki,ek,ekj->eij", G, w, G)
+        rhs = np.einsum("eki,ek->ei", G, w * residual)
+
+        ok = use.sum(axis=1) >= 4
+        ok[ok] = np.abs(np.linalg.det(N[ok])) > 1e-6
+        dx = np.zeros((nep, 4))
+        dx[ok] = np.linalg.solve(N[ok], rhs[ok][..., None])[..., 0]
+        x += dx
+        if np.all(np.abs(dx[:, :3]) < tol):
+            break
+
+    x[~ok] = np.nan
+    lat, lon, alt = ecef_to_lla(x[:, 0], x[:, 1], x[:, 2])
+    solution = {
+        "tow": tow,
+        "xyz": x[:, :3],
+        "lat": lat,
+        "lon": lon,
+        "alt": alt,
+        "clock_bias": x[:, 3] / C,
+        "nsat": use.sum(axis=1),
+    }
+    solution.update(dop(G, lat, lon, use))
+    return solution
+
+
+def iter_spp_chunks(obs_file, nav_data, code="C1", chunk_epochs=3600, elev_mask=10.0):
+    """
+    Solve positions chunk by chunk from a RINEX observation file
+
+    Parameters:
+    -----------
+    obs_file : str
+        Path to RINEX 2.x observation file
+    nav_data : xarray.Dataset
+        Navigation data loaded by georinex
+    code : str
+        Pseudorange observation type to use
+    chunk_epochs : int
+        Epochs solved together
+    elev_mask : float
+        Elevation mask in degrees
+
+    Yields:
+    -------
+    solution : dict
+        solve_spp output for each chunk
+    """
+    table = ephemeris_table(nav_data)
+    with open(obs_file) as f:
+        x0 = read_obs_header(f).get("approx_position")
+    if x0 is not None and not np.any(x0):
+        x0 = None
+
+    for chunk in iter_obs_chunks(obs_file, chunk_epochs, obs_types=[code]):
+        yield solve_spp(chunk.tow, chunk.sv, chunk.obs[code].T, table, x0, elev_mask)
+
+
+def write_spp_csv(solutions, csv_filename):
+    """
+    Write SPP solutions to CSV
+
+    Parameters:
+    -----------
+    solutions : iterable of dict
+        solve_spp outputs
+    csv_filename : str
+        Output file path
+
+    Returns:
+    --------
+    nepochs : int
+        Number of epochs written
+    """
+    columns = ["GDOP", "PDOP", "HDOP", "VDOP", "TDOP"]
+    nepochs = 0
+    with open(csv_filename, "w") as f:
+        f.write("Time,X,Y,Z,Lat,Lon,Alt,ClockBias_ns,NSat," + ",".join(columns) + "\n")
+        for sol in solutions:
+            data = np.column_stack(
+                [sol["tow"], sol["xyz"], sol["lat"], sol["lon"], sol["alt"]]
+                + [sol["clock_bias"] * 1e9, sol["nsat"]]
+                + [sol[c] for c in columns]
+            )
+            np.savetxt(
+                f,
+                data,
+                delimiter=",",
+                fmt=["%.1f"]
+                + ["%.4f"] * 3
+                + ["%.10f"] * 2
+                + ["%.4f", "%.3f", "%d"]
+                + ["%.3f"] * len(columns),
+            )
+            nepochs += len(data)
+    return nepochs
+
+
+def simulate_pseudoranges(table, tow, sv, rx_xyz, clock_bias=1e-4, elev_mask=10.0):
+    """
+    Error-free pseudoranges for a static receiver
+
+    Parameters:
+    -----------
+    table : dict
+        Output of find_eph.ephemeris_table
+    tow : numpy.ndarray
+        (epochs,) receiver clock time tags in GPS seconds of week
+    sv : numpy.ndarray
+        (svs,) satellite ids
+    rx_xyz : array
+        Receiver ECEF position in meters
+    clock_bias : float
+        Receiver clock offset in seconds
+    elev_mask : float
+        Satellites below this elevation get NaN
+
+    Returns:
+    --------
+    pseudorange : numpy.ndarray
+        (epochs, svs) pseudoranges in meters
+    """
+    rx_xyz = np.asarray(rx_xyz, dtype=np.float64)
+    t_rx = np.asarray(tow, dtype=np.float64)[:, None] - clock_bias
+    eph = gather_eph(table, find_eph_batch(table, sv[None, :], tow[:, None]))
+
+    tau = np.full((len(tow), len(sv)), 0.075)
+    for _ in range(3):
+        sat = rotate_earth(satpos_batch(t_rx - tau, eph), tau)
+        tau = np.linalg.norm(sat - rx_xyz, axis=-1) / C
+    pseudorange = C * (tau + clock_bias - satclock_batch(t_rx - tau, eph))
+
+    elevation, _ = look_angles(rx_xyz, sat)
+    return np.where(elevation >= elev_mask, pseudorange, np.nan)
+
+
+def benchmark_spp(nav_file, interval=1, chunk_epochs=3600, site=(46.87, 9.53, 600.0)):
+    """
+    Time solve_spp on simulated observations for a nav file's day
+
+    Parameters:
+    -----------
+    nav_file : str
+        Path to RINEX navigation file
+    interval : int
+        Epoch spacing in seconds
+    chunk_epochs : int
+        Epochs solved together
+    site : tuple
+        Receiver latitude, longitude (degrees) and altitude (meters)
+
+    Returns:
+    --------
+    stats : dict
+        'epochs', 'seconds', 'epochs_per_second' and 'max_error' (meters)
+    """
+    nav_data = readrinex(nav_file)
+    if nav_data is None:
+        return None
+    table = ephemeris_table(nav_data)
+    tow = gpsweekcal(nav_day(nav_data), interval)[:, 1].astype(float)
+    sv = np.unique(table["sv"])
+    rx_xyz = np.array(lla_to_ecef(*site))
+
+    elapsed = 0.0
+    max_error = 0.0
+    for start in range(0, len(tow), chunk_epochs):
+        t = tow[start : start + chunk_epochs]
+        pseudorange = simulate_pseudoranges(table, t, sv, rx_xyz)
+        t0 = time.perf_counter()
+        sol = solve_spp(t, sv, pseudorange, table)
+        elapsed += time.perf_counter() - t0
+        max_error = max(max_error, np.nanmax(np.abs(sol["xyz"] - rx_xyz)))
+
+    return {
+        "epochs": len(tow),
+        "seconds": elapsed,
+        "epochs_per_second": len(tow) / elapsed,
+        "max_error": max_error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Batch single point positioning from RINEX files"
+    )
+    parser.add_argument("--obs", type=str, help="RINEX observation file")
+    parser.add_argument(
+        "--nav", type=str, default="data/chur1610.19n", help="RINEX navigation file"
+    )
+    parser.add_argument("--code", type=str, default="C1", help="Pseudorange type")
+    parser.add_argument(
+        "--chunk_epochs", type=int, default=3600, help="Epochs solved together"
+    )
+    parser.add_argument(
+        "--elev_mask", type=float, default=10.0, help="Elevation mask in degrees"
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Benchmark on simulated observations for the nav file",
+    )
+    parser.add_argument(
+        "--interval", type=int, default=1, help="Benchmark epoch interval (s)"
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        stats = benchmark_spp(args.nav, args.interval, args.chunk_epochs)
+        if stats is None:
+            return 1
+        print(
+            f"Solved {stats['epochs']} epochs in {stats['seconds']:.2f} s "
+            f"({stats['epochs_per_second']:.0f} epochs/s), "
+            f"max position error {stats['max_error']:.2e} m"
+        )
+        return 0
+
+    if args.obs is None:
+        parser.error("--obs is required unless --benchmark is given")
+
+    nav_data = readrinex(args.nav)
+    if nav_data is None:
+        return 1
+
+    os.makedirs("results", exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.obs))[0]
+    csv_filename = f"results/{name}_spp.csv"
+    solutions = iter_spp_chunks(
+        args.obs, nav_data, args.code, args.chunk_epochs, args.elev_mask
+    )
+    nepochs = write_spp_csv(solutions, csv_filename)
+    print(f"✓ Saved: {csv_filename} ({nepochs} epochs)")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Compact Position Cube
+Typed (epoch x SV) satellite positions with a validity bitmask
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from find_eph import ephemeris_table
+from gpsweekcal import gpsweekcal
+from positions import position_cube
+from readrinex import read_nav
+
+DTYPES = {"float64": np.float64, "float32": np.float32}
+
+
+class PositionCube:
+    """
+    Satellite positions as dense typed arrays instead of [time, sv, X, Y, Z]
+    float64 rows
+
+    The time axis is int32 seconds of week and the satellite axis uint8
+    (uint16 for sv codes above 255). Coordinates are one C-ordered
+    (epochs, svs, 3) array, float64 or float32 (float32 rounds to about
+    2 m at GPS orbit radius). Validity is a bitmask packed along the SV
+    axis; invalid cells also hold NaN, so coordinate views stay safe to
+    plot.
+
+    Slices of epochs, satellite tracks and the coordinate columns handed
+    to writers are views: nothing is copied but the repeated time and SV
+    labels of a writer chunk.
+    """
+
+    __slots__ = ("week", "tow", "sv", "xyz", "mask")
+
+    def __init__(self, tow, sv, xyz, valid=None, week=0):
+        """
+        Parameters:
+        -----------
+        tow : array
+            (epochs,) whole GPS seconds of week
+        sv : array
+            (svs,) GPS PRNs or gnss.sv_code values
+        xyz : numpy.ndarray
+            (epochs, svs, 3) float64 or float32 ECEF coordinates in meters,
+            used without copying when C-ordered
+        valid : numpy.ndarray, optional
+            (epochs, svs) bool; finite coordinates by default
+        week : int
+            GPS week of the time axis
+        """
+        tow = np.asarray(tow)
+        if np.any(tow != np.round(tow)):
+            raise ValueError("The time axis must be whole seconds of week")
+        sv = np.asarray(sv)
+        xyz = np.ascontiguousarray(xyz)
+        if xyz.dtype not in (np.float64, np.float32):
+            raise ValueError(f"Coordinates must be float64 or float32, not {xyz.dtype}")
+        if xyz.shape != (len(tow), len(sv), 3):
+            raise ValueError(f"Coordinates {xyz.shape} do not match the axes")
+        if valid is None:
+            valid = np.isfinite(xyz[..., 0])
+        self.week = int(week)
+        self.tow = tow.astype(np.int32)
+        self.sv = sv.astype(np.min_scalar_type(int(sv.max(initial=0))))
+        self.xyz = xyz
+        self.mask = np.packbits(valid, axis=1)
+
+    @classmethod
+    def build(cls, nav_data, mytime, max_prn=32, precision="float64", dtype="float64"):
+        """
+        Positions for every epoch and PRN 1..max_prn (rinexnav.compute_svpos
+        in cube form)
+
+        Parameters:
+        -----------
+        nav_data : xarray.Dataset or dict
+            Navigation data loaded by georinex, or its ephemeris_table
+        mytime : numpy.ndarray
+            (epochs, 2) [week, seconds of week] from gpsweekcal
+        max_prn : int
+            Highest GPS PRN to compute
+        precision : str
+            Precision tier of satpos.satpos_batch
+        dtype : str
+            Coordinate type, a key of DTYPES
+        """
+        table = (
+            ephemeris_table(nav_data) if hasattr(nav_data, "data_vars") else nav_data
+        )
+        prn = np.arange(1, max_prn + 1)
+        cube = position_cube(table, mytime[:, 1].astype(np.float64), prn, precision)
+        week = mytime[0, 0] if len(mytime) else 0
+        return cls(
+            mytime[:, 1], prn, cube.astype(DTYPES[dtype], copy=False), None, week
+        )
+
+    @classmethod
+    def from_rows(cls, svpos, week=0, dtype="float64"):
+        """
+        Cube of [time, sv, X, Y, Z] rows; cells without a row are invalid
+
+        Parameters:
+        -----------
+        svpos : numpy.ndarray
+            (n, 5) rows from rinexnav.compute_svpos or query_svpos
+        week : int
+            GPS week of the time axis
+        dtype : str
+            Coordinate type, a key of DTYPES
+        """
+        tow, it = np.unique(svpos[:, 0], return_inverse=True)
+        sv, isv = np.unique(svpos[:, 1], return_inverse=True)
+        xyz = np.full((len(tow), len(sv), 3), np.nan, dtype=DTYPES[dtype])
+        xyz[it, isv] = svpos[:, 2:5]
+        return cls(tow, sv, xyz, None, week)
+
+    def __len__(self):
+        """Cells, the row count of the [time, sv, X, Y, Z] layout"""
+        return self.xyz.shape[0] * self.xyz.shape[1]
+
+    @property
+    def valid(self):
+        """(epochs, svs) bool validity unpacked from the bitmask"""
+        return np.unpackbits(self.mask, axis=1, count=len(self.sv)).astype(bool)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the arrays of the cube"""
+        return self.tow.nbytes + self.sv.nbytes + self.xyz.nbytes + self.mask.nbytes
+
+    def epochs(self, start=0, stop=None):
+        """Cube of a slice of epochs sharing this cube's memory"""
+        part = object.__new__(PositionCube)
+        part.week = self.week
+        part.sv = self.sv
+        part.tow = self.tow[start:stop]
+        part.xyz = self.xyz[start:stop]
+        part.mask = self.mask[start:stop]
+        return part
+
+    def track(self, sv):
+        """(epochs, 3) coordinate view of one satellite"""
+        j = np.nonzero(self.sv == sv)[0]
+        if len(j) == 0:
+            raise KeyError(f"Satellite {sv} is not in the cube")
+        return self.xyz[:, j[0]]
+
+    def columns(self):
+        """
+        time, sv, X, Y, Z columns in [time, sv, X, Y, Z] row order
+
+        X, Y and Z are views of the coordinate array; time and sv are the
+        repeated labels.
+        """
+        epochs, svs = self.xyz.shape[:2]
+        flat = self.xyz.reshape(-1, 3)
+        return [
+            np.repeat(self.tow, svs),
+            np.tile(self.sv, epochs),
+            flat[:, 0],
+            flat[:, 1],
+            flat[:, 2],
+        ]
+
+    def rows(self):
+        """The float64 (cells, 5) [time, sv, X, Y, Z] layout of compute_svpos"""
+        return np.column_stack(self.columns()).astype(np.float64, copy=False)
+
+
+def memory_per_day(nav_data, date, interval=30, max_prn=32, precision="float64"):
+    """
+    Bytes held by one day of positions and the traced peak while computing
+    them, for the row layout and the cube with each coordinate type
+
+    Parameters:
+    -----------
+    nav_data : xarray.Dataset or dict
+        Navigation data loaded by georinex, or its ephemeris_table
+    date : list
+        [year, month, day] of the time axis
+    interval : int
+        Seconds per epoch
+    max_prn : int
+        Highest GPS PRN
+    precision : str
+        Precision tier of satpos.satpos_batch
+
+    Returns:
+    --------
+    usage : dict
+        Layout name -> (bytes held, peak traced bytes)
+    """
+    from rinexnav import compute_svpos  # rinexnav imports this module
+
+    table = ephemeris_table(nav_data) if hasattr(nav_data, "data_vars") else nav_data
+    mytime = gpsweekcal(date, interval)
+    layouts = {"rows float64": lambda: compute_svpos(table, mytime, max_prn, precision)}
+    for name in DTYPES:
+        layouts[f"cube {name}"] = lambda name=name: PositionCube.build(
+            table, mytime, max_prn, precision, name
+        )
+    layouts["rows float64"]()  # first full-size call allocates caches
+    usage = {}
+    for name, compute in layouts.items():
+        tracemalloc.start()
+        result = compute()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        usage[name] = (result.nbytes, peak)
+    return usage
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Memory of a day of positions: row layout vs typed cube"
+    )
+    parser.add_argument(
+        "--file", type=str, default="data/brdc0680.20n", help="RINEX navigation file"
+    )
+    parser.add_argument("--interval", type=int, default=30, help="Seconds per epoch")
+    parser.add_argument("--max_prn", type=int, default=32, help="Highest GPS PRN")
+    args = parser.parse_args()
+
+    try:
+        header, nav_data = read_nav(args.file)
+    except Exception as e:
+        print(f"Failed to read {args.file}: {e}")
+        return 1
+    table = ephemeris_table(nav_data)
+    t0 = time.perf_counter()
+    usage = memory_per_day(table, header.date, args.interval, args.max_prn)
+    print(f"{args.file}, {86400 // args.interval} epochs x {args.max_prn} PRNs")
+    rows = usage["rows float64"][0]
+    for name, (held, peak) in usage.items():
+        print(
+            f"{name:>13}: {held / 1e6:6.2f} MB held ({held / rows:.0%} of rows), "
+            f"peak {peak / 1e6:6.2f} MB while computing"
+        )
+    print(f"{time.perf_counter() - t0:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic Navigation Files
+Seeded RINEX 2.11 GPS nav files of any size built from real records
+
+@author: Based on the RINEX 2.11 format specification
+"""
+
+import argparse
+import datetime
+import gzip
+import io
+import os
+import time
+
+import numpy as np
+from readrinex import GPS_NAV_FIELDS, read_text
+from satpos import GM, omegae_dot
+
+GPS_EPOCH = datetime.datetime(1980, 1, 6)
+WEEK = 604800.0
+
+COLUMN = {name: k for k, name in enumerate(GPS_NAV_FIELDS)}
+
+RECORD_FORMAT = (
+    "%2d %02d%3d%3d%3d%3d%5.1f%19.12E%19.12E%19.12E\n"
+    + "   %19.12E%19.12E%19.12E%19.12E\n" * 6
+    + "   %19.12E%19.12E\n"
+)
+RECORD_BYTES = len(RECORD_FORMAT % ((0,) * 6 + (0.0,) * 30))
+
+
+def _gps_seconds(year, month, day, hour=0, minute=0, second=0.0):
+    """Seconds since the GPS epoch (no leap seconds) of a calendar time"""
+    t = datetime.datetime(year, month, day, hour, minute)
+    return (t - GPS_EPOCH).total_seconds() + second
+
+
+def read_template(nav_file):
+    """
+    Header lines and records of a RINEX 2 GPS navigation file
+
+    Parameters:
+    -----------
+    nav_file : str
+        RINEX 2.x GPS nav file (optionally .gz)
+
+    Returns:
+    --------
+    header : list of str
+        Header lines without END OF HEADER
+    prn : numpy.ndarray
+        (records,) PRNs
+    toc : numpy.ndarray
+        (records,) clock reference times in seconds since the GPS epoch
+    values : numpy.ndarray
+        (records, 29) broadcast orbit values in file order
+    """
+    lines = read_text(nav_file)[1].splitlines()
+    end = next(k for k, line in enumerate(lines) if "END OF HEADER" in line)
+    header = lines[:end]
+    if not header[0][:9].strip().startswith("2") or header[0][20:21] != "N":
+        raise ValueError(f"{nav_file} is not a RINEX 2 GPS navigation file")
+
+    body = [line for line in lines[end + 1 :] if line.strip()]
+    prn, toc, values = [], [], []
+    for k in range(0, len(body) - 7, 8):
+        epoch = body[k]
+        yy = int(epoch[3:5])
+        year = yy + 2000 if yy < 80 else yy + 1900
+        prn.append(int(epoch[:2]))
+        toc.append(
+            _gps_seconds(
+                year,
+                int(epoch[6:8]),
+                int(epoch[9:11]),
+                int(epoch[12:14]),
+                int(epoch[15:17]),
+                float(epoch[17:22]),
+            )
+        )
+        fields = [epoch[22 + 19 * i : 41 + 19 * i] for i in range(3)]
+        for line in body[k + 1 : k + 8]:
+            fields += [line[3 + 19 * i : 22 + 19 * i] for i in range(4)]
+        values.append(
+            [float(f.replace("D", "E")) if f.strip() else 0.0 for f in fields[:29]]
+        )
+    return header, np.array(prn), np.array(toc), np.array(values)
+
+
+def shift_records(values, toc, dt):
+    """
+    Move broadcast records to new reference times along the same orbit
+
+    The secular terms are carried forward (M0 by the mean motion, Omega0 by
+    OmegaDot and the change of GPS week, i0 by IDOT, the clock polynomial
+    by its drift), so a shifted record gives exactly the positions of its
+    template at every time. Far from the template epoch the orbit drifts
+    from the real one, but each record stays self-consistent.
+
+    Parameters:
+    -----------
+    values : numpy.ndarray
+        (n, 29) template records
+    toc : numpy.ndarray
+        (n,) template reference times (seconds since the GPS epoch)
+    dt : numpy.ndarray
+        (n,) shift in seconds
+
+    Returns:
+    --------
+    shifted : numpy.ndarray
+        (n, 29) records referenced to toc + dt
+    """
+    c = COLUMN
+    out = values.copy()
+    a = values[:, c["sqrtA"]] ** 2
+    n = np.sqrt(GM / a**3) + values[:, c["DeltaN"]]
+    toe_abs = values[:, c["GPSWeek"]] * WEEK + values[:, c["Toe"]] + dt
+    week = np.floor(toe_abs / WEEK)
+
+    m0 = values[:, c["M0"]] + n * dt
+    omega0 = values[:, c["Omega0"]] + values[:, c["OmegaDot"]] * dt
+    omega0 -= omegae_dot * WEEK * (week - values[:, c["GPSWeek"]])
+    out[:, c["M0"]] = np.mod(m0 + np.pi, 2 * np.pi) - np.pi
+    out[:, c["Omega0"]] = np.mod(omega0 + np.pi, 2 * np.pi) - np.pi
+    out[:, c["Io"]] = values[:, c["Io"]] + values[:, c["IDOT"]] * dt
+
+    af0, af1, af2 = (values[:, c[k]] for k in GPS_NAV_FIELDS[:3])
+    out[:, c["SVclockBias"]] = af0 + af1 * dt + af2 * dt**2
+    out[:, c["SVclockDrift"]] = af1 + 2 * af2 * dt
+
+    out[:, c["Toe"]] = toe_abs - week * WEEK
+    out[:, c["GPSWeek"]] = week
+    out[:, c["TransTime"]] = out[:, c["Toe"]] + (
+        values[:, c["TransTime"]] - values[:, c["Toe"]]
+    )
+    return out
+
+
+def format_records(prn, toc, values):
+    """RINEX 2.11 text of records (D exponents, 2-digit years)"""
+    t = np.datetime64("1980-01-06T00:00", "ms") + np.round(toc * 1000).astype(
+        "timedelta64[ms]"
+    )
+    month_start = t.astype("datetime64[M]")
+    day_start = t.astype("datetime64[D]")
+    sod = (t - day_start).astype(np.int64) / 1000.0
+    fields = np.column_stack(
+        [
+            prn,
+            (t.astype("datetime64[Y]").astype(np.int64) + 1970) % 100,
+            month_start.astype(np.int64) % 12 + 1,
+            (day_start - month_start).astype(np.int64) + 1,
+            sod // 3600,
+            sod % 3600 // 60,
+            sod % 60,
+            values,
+        ]
+    )
+    return "".join(RECORD_FORMAT % tuple(r) for r in fields.tolist()).replace("E", "D")
+
+
+def day_records(prn, toc, values, day_start, update=7200.0, rng=None, dup=0, swap=0):
+    """
+    One day of records: every template PRN every `update` seconds
+
+    Each new record is shifted from the template record that find_eph
+    would use for the same PRN at the same time of the template's day, so
+    on that day the generated file reproduces the template's positions.
+
+    Parameters:
+    -----------
+    prn, toc, values
+        Template records (read_template)
+    day_start : float
+        Seconds since the GPS epoch of 00:00 of the day
+    update : float
+        Seconds between records of one satellite
+    rng : numpy.random.Generator, optional
+        Source for duplicates and reordering
+    dup : float
+        Fraction of records written twice
+    swap : float
+        Fraction of records moved to a random place in the day
+
+    Returns:
+    --------
+    prn, toc, values : numpy.ndarray
+        Records in file order
+    """
+    times = day_start + np.arange(0.0, 86400.0, update)
+    sats = np.unique(prn)
+    new_prn = np.tile(sats, len(times))
+    new_toc = np.repeat(times, len(sats))
+    # Same time of day in the template's day, then the record find_eph
+    # would use there: the latest at or before it, else the earliest
+    template_day = np.floor(np.median(toc) / 86400.0) * 86400.0
+    mapped = template_day + np.mod(new_toc - template_day, 86400.0)
+    source = np.empty(len(new_toc), dtype=np.int64)
+    for sat in sats:
+        rows, own = np.nonzero(new_prn == sat)[0], np.nonzero(prn == sat)[0]
+        own = own[np.argsort(toc[own], kind="stable")]
+        k = np.searchsorted(toc[own], mapped[rows], side="right") - 1
+        source[rows] = own[np.maximum(k, 0)]
+    shifted = shift_records(values[source], toc[source], new_toc - toc[source])
+    # IODE/IODC change with every new record of a satellite
+    issue = (np.floor(new_toc / update) % 255 + 1).astype(float)
+    shifted[:, COLUMN["IODE"]] = issue
+    shifted[:, COLUMN["IODC"]] = issue
+
+    order = np.arange(len(new_toc))
+    if rng is not None and dup > 0:
+        extra = rng.choice(order, int(dup * len(order)))
+        order = np.sort(np.concatenate([order, extra]))
+    if rng is not None and swap > 0:
+        moved = rng.choice(len(order), int(swap * len(order)), replace=False)
+        order[moved] = order[rng.permutation(moved)]
+    return new_prn[order], new_toc[order], shifted[order]
+
+
+def _gzip_text(filename, mode="w"):
+    """
+    gzip text writer with a zero header mtime, so the same seed always
+    gives the same bytes; level 6 is ~2x faster than gzip's default 9 for
+    a few % in size
+    """
+    return io.TextIOWrapper(
+        gzip.GzipFile(filename, f"{mode}b", compresslevel=6, mtime=0)
+    )
+
+
+def generate_nav(
+    template,
+    filename,
+    start=None,
+    days=1,
+    update=7200.0,
+    duplicates=0.0,
+    shuffle=0.0,
+    seed=0,
+    size_mb=None,
+):
+    """
+    Write a synthetic RINEX 2.11 GPS nav file day by day
+
+    The output depends only on the arguments: the same seed gives the same
+    bytes. Memory use is one day of records, whatever the file size.
+
+    Parameters:
+    -----------
+    template : str
+        Real RINEX 2 GPS nav file providing satellites, orbits and header
+    filename : str
+        Output path; a '.gz' suffix writes gzip
+    start : list, optional
+        [year, month, day] of the first day (default: the template's day)
+    days : int
+        Number of days
+    update : float
+        Seconds between records of one satellite (7200 in real files)
+    duplicates : float
+        Fraction of records written twice
+    shuffle : float
+        Fraction of records moved out of time order within their day
+    seed : int
+        Seed of the duplicate and reordering choices
+    size_mb : float, optional
+        Stop after the day that reaches this uncompressed size instead
+
+    Returns:
+    --------
+    stats : dict
+        'records', 'bytes' (uncompressed) and 'days'
+    """
+    header, prn, toc, values = read_template(template)
+    if start is None:
+        first = GPS_EPOCH + datetime.timedelta(seconds=float(np.median(toc)))
+        start = [first.year, first.month, first.day]
+    day0 = _gps_seconds(*start)
+    if size_mb is not None:
+        per_day = len(np.unique(prn)) * int(np.ceil(86400 / update))
+        per_day *= RECORD_BYTES * (1 + duplicates)
+        days = max(1, int(np.ceil(size_mb * 1e6 / per_day)))
+
+    kept = [
+        line
+        for line in header
+        if "PGM / RUN BY / DATE" not in line and "COMMENT" not in line
+    ]
+    stamp = f"{start[0]:04d}{start[1]:02d}{start[2]:02d} 000000 GPS"
+    comment = (
+        f"synthetic: {days} d, {update:g} s, dup {duplicates:g}, "
+        f"shuffle {shuffle:g}, seed {seed}"
+    )
+    text = "\n".join(
+        kept[:1]
+        + [f"{'synthnav.py':<20}{'rinexpos':<20}{stamp:<20}PGM / RUN BY / DATE"]
+        + [f"{comment[:60]:<60}COMMENT"]
+        + kept[1:]
+        + [f"{'':<60}END OF HEADER"]
+    )
+
+    if str(filename).endswith(".gz"):
+        opener = _gzip_text
+    else:
+        opener = open
+    records = written = 0
+    with opener(filename, "w") as f:
+        f.write(text + "\n")
+        written += len(text) + 1
+        for day in range(days):
+            rng = np.random.default_rng([seed, day])
+            block = format_records(
+                *day_records(
+                    prn,
+                    toc,
+                    values,
+                    day0 + 86400.0 * day,
+                    update,
+                    rng,
+                    duplicates,
+                    shuffle,
+                )
+            )
+            f.write(block)
+            records += len(block) // RECORD_BYTES
+            written += len(block)
+    return {"records": records, "bytes": written, "days": days}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate large synthetic RINEX 2.11 navigation files"
+    )
+    parser.add_argument(
+        "--template", type=str, default="data/brdc0680.20n", help="Real nav file"
+    )
+    parser.add_argument("--out", type=str, default=None, help="Output file")
+    parser.add_argument(
+        "--start", type=str, default=None, help="First day as YYYY,MM,DD"
+    )
+    parser.add_argument("--days", type=int, default=7, help="Number of days")
+    parser.add_argument(
+        "--size_mb", type=float, default=None, help="Target size (overrides --days)"
+    )
+    parser.add_argument(
+        "--update", type=float, default=7200.0, help="Seconds between records per SV"
+    )
+    parser.add_argument(
+        "--duplicates", type=float, default=0.0, help="Fraction of repeated records"
+    )
+    parser.add_argument(
+        "--shuffle", type=float, default=0.0, help="Fraction of out-of-order records"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--gzip", action="store_true", help="Compress with gzip")
+    args = parser.parse_args()
+
+    start = None
+    if args.start is not None:
+        start = [int(x) for x in args.start.split(",")]
+    filename = args.out
+    if filename is None:
+        os.makedirs("results", exist_ok=True)
+        name = os.path.splitext(os.path.basename(args.template))[0]
+        filename = f"results/{name}_synthetic_s{args.seed}.{args.template[-3:-1]}n"
+    if args.gzip and not filename.endswith(".gz"):
+        filename += ".gz"
+
+    t0 = time.perf_counter()
+    try:
+        stats = generate_nav(
+            args.template,
+            filename,
+            start,
+            args.days,
+            args.update,
+            args.duplicates,
+            args.shuffle,
+            args.seed,
+            args.size_mb,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Failed to generate from {args.template}: {e}")
+        return 1
+    elapsed = time.perf_counter() - t0
+    print(
+        f"{stats['records']} records over {stats['days']} days, "
+        f"{stats['bytes'] / 1e6:.1f} MB uncompressed in {elapsed:.2f} s "
+        f"({stats['bytes'] / 1e6 / elapsed:.1f} MB/s)"
+    )
+    print(f"✓ Saved: {filename}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
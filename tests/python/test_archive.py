@@ -0,0 +1,87 @@
+import os
+import sys
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+pytest.importorskip("dask")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+import archive
+from archive import open_archive, open_positions, write_archive
+from find_eph import ephemeris_table
+from gps_time import gps_time_from_calendar
+from positions import position_cube
+from readrinex import readrinex
+from synthnav import generate_nav
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+FILES = ["brdc1610.19n", "brdc0680.20n", "brdc1530.19n"]
+
+
+@pytest.mark.parametrize("store", ["positions.zarr", "positions.nc"])
+def test_archive_matches_per_file_positions(tmp_path, store):
+    if store.endswith(".zarr"):
+        pytest.importorskip("zarr")
+    ds = open_archive([os.path.join(DATA, f) for f in FILES], 300, 96)
+    assert ds.sizes == {"time": 3 * 288, "sv": 32}
+    assert ds.x.data.chunks[0] == (96,) * 9
+    assert ds.attrs["files"] == "brdc1530.19n,brdc1610.19n,brdc0680.20n"
+    assert str(ds.time.values[288]) == "2019-06-10T00:00:00.000000000"
+
+    path = str(tmp_path / store)
+    write_archive(ds, path, scheduler="threads", workers=2)
+    out = open_positions(path)
+    assert out.x.chunks[0][0] == 96
+    day = out.isel(time=slice(2 * 288, 3 * 288)).compute()
+    table = ephemeris_table(readrinex(os.path.join(DATA, "brdc0680.20n")))
+    tow = np.arange(0.0, 86400.0, 300.0) + gps_time_from_calendar(2020, 3, 8)[1]
+    expected = position_cube(table, tow, np.arange(1, 33))
+    got = np.stack([day.x, day.y, day.z], axis=-1)
+    np.testing.assert_allclose(got, expected, atol=1e-6)
+
+
+def test_memory_follows_chunks_not_archive(tmp_path):
+    files = []
+    for k in range(8):
+        date = [int(x) for x in str(np.datetime64("2020-03-08") + k).split("-")]
+        files.append(str(tmp_path / f"syn{k}.20n"))
+        generate_nav(os.path.join(DATA, "brdc0680.20n"), files[-1], start=date)
+
+    peaks = []
+    for days in (2, 8):
+        ds = open_archive(files[:days], 60, 360)
+        tracemalloc.start()
+        write_archive(ds, str(tmp_path / f"out{days}.nc"), scheduler="synchronous")
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    assert peaks[1] < 1.5 * peaks[0]
+
+    with pytest.raises(ValueError, match="cover the same day"):
+        open_archive(files[:1] * 2)
+    with pytest.raises(ValueError, match="does not divide"):
+        open_archive(files, 60, 1000)
+
+
+def test_days_parse_concurrently_and_each_file_once(monkeypatch):
+    both_days = threading.Barrier(2, timeout=5)
+    parsed = []
+
+    def parse(nav_file):
+        parsed.append(nav_file)
+        both_days.wait()  # returns only while the other day parses too
+        return {"file": nav_file}
+
+    monkeypatch.setattr(archive, "readrinex", parse)
+    monkeypatch.setattr(archive, "ephemeris_table", lambda nav_data: nav_data)
+    archive._load_table.cache_clear()
+    files = ["day1.20n", "day2.20n", "day1.20n", "day2.20n"]
+    try:
+        with ThreadPoolExecutor(4) as pool:
+            tables = list(pool.map(archive._day_table, files))
+    finally:
+        archive._load_table.cache_clear()
+    assert [table["file"] for table in tables] == files
+    assert sorted(parsed) == ["day1.20n", "day2.20n"]
@@ -0,0 +1,142 @@
+import math
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from atmosphere import (
+    C,
+    iter_delays,
+    iter_position_csv,
+    iter_position_table,
+    klobuchar,
+    main,
+    positions_from_rows,
+    saastamoinen,
+)
+from ecef_to_lla import lla_to_ecef
+from find_eph import ephemeris_table
+from geometry import look_angles
+from gnss import sv_code
+from positions import position_cube
+from readrinex import read_nav
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+def klobuchar_scalar(lat, lon, el, az, tow, alpha, beta):
+    """Step-by-step IS-GPS-200 algorithm for one ray"""
+    E = el / 180.0
+    psi = 0.0137 / (E + 0.11) - 0.022
+    phi_i = lat / 180.0 + psi * math.cos(math.radians(az))
+    phi_i = min(max(phi_i, -0.416), 0.416)
+    lam_i = lon / 180.0 + psi * math.sin(math.radians(az)) / math.cos(phi_i * math.pi)
+    phi_m = phi_i + 0.064 * math.cos((lam_i - 1.617) * math.pi)
+    t = (4.32e4 * lam_i + tow) % 86400.0
+    amp = max(sum(a * phi_m**n for n, a in enumerate(alpha)), 0.0)
+    per = max(sum(b * phi_m**n for n, b in enumerate(beta)), 72000.0)
+    x = 2 * math.pi * (t - 50400.0) / per
+    F = 1.0 + 16.0 * (0.53 - E) ** 3
+    if abs(x) < 1.57:
+        return C * F * (5e-9 + amp * (1 - x**2 / 2 + x**4 / 24))
+    return C * F * 5e-9
+
+
+def test_klobuchar_matches_the_scalar_algorithm_with_header_coefficients():
+    header, _ = read_nav(os.path.join(DATA, "brdc1530.19n"))
+    rng = np.random.default_rng(3)
+    lat, lon = rng.uniform(-90, 90, 500), rng.uniform(-180, 180, 500)
+    el, az = rng.uniform(0, 90, 500), rng.uniform(0, 360, 500)
+    tow = rng.uniform(0, 604800, 500)
+
+    got = klobuchar(lat, lon, el, az, tow, header.ion_alpha, header.ion_beta)
+    expected = [
+        klobuchar_scalar(*args, header.ion_alpha, header.ion_beta)
+        for args in zip(lat, lon, el, az, tow, strict=True)
+    ]
+    np.testing.assert_allclose(got, expected, rtol=1e-12)
+    # Night-time zenith floor is 5 ns; low rays are longer
+    assert got.min() >= C * 5e-9 * 0.99
+    assert klobuchar(0, 0, 5, 0, 0, header.ion_alpha, header.ion_beta) > klobuchar(
+        0, 0, 90, 0, 0, header.ion_alpha, header.ion_beta
+    )
+
+
+def test_saastamoinen_zenith_and_mapping():
+    zenith = saastamoinen(45.0, 0.0, 90.0)
+    assert 2.3 < zenith < 2.6
+    assert saastamoinen(45.0, 3000.0, 90.0) < zenith
+    np.testing.assert_allclose(
+        saastamoinen(45.0, 0.0, 30.0), zenith / np.sin(np.radians(30.0))
+    )
+    assert saastamoinen(45.0, 0.0, -5.0) == 0.0
+    assert saastamoinen(45.0, 20000.0, 45.0) == 0.0
+
+
+def test_chunked_delays_follow_position_output(tmp_path):
+    header, nav_data = read_nav(os.path.join(DATA, "brdc0680.20n"))
+    table = ephemeris_table(nav_data)
+    tow = np.arange(0.0, 3600.0, 300.0)
+    sv = np.unique(table["sv"])
+    cube = position_cube(table, tow, sv)
+
+    # rinexnav CSV rows, read back in blocks that split epochs
+    it, isv = np.nonzero(np.isfinite(cube[..., 0]))
+    rows = np.column_stack([tow[it], sv_code(sv)[isv], cube[it, isv]])
+    csv_file = tmp_path / "positions.csv"
+    np.savetxt(csv_file, rows, delimiter=",", fmt="%.10f")
+    chunks = list(iter_position_csv(csv_file, chunk_rows=50))
+    np.testing.assert_array_equal(np.concatenate([c[0] for c in chunks]), tow)
+    np.testing.assert_allclose(
+        positions_from_rows(rows)[2], cube[:, np.isin(sv_code(sv), rows[:, 1])]
+    )
+
+    sites = np.array([[47.0, 8.0, 500.0], [-33.9, 151.2, 40.0]])
+    alpha, beta = header.ion_alpha, header.ion_beta
+    timings = {}
+    blocks = list(
+        iter_delays(
+            chunks, sites, alpha, beta, 10.0, max_memory_mb=0.01, timings=timings
+        )
+    )
+    assert len(blocks) > len(chunks)
+    assert set(timings) == {"geometry", "iono", "tropo"}
+    whole = list(iter_delays([positions_from_rows(rows)], sites, alpha, beta, 10.0))
+    assert len(whole) == 1
+    for key in ("elevation", "azimuth", "iono", "tropo"):
+        np.testing.assert_allclose(
+            np.concatenate([b[2][key] for b in blocks]), whole[0][2][key]
+        )
+
+    delays = whole[0][2]
+    rx = np.column_stack(lla_to_ecef(sites[:, 0], sites[:, 1], sites[:, 2]))
+    el, az = look_angles(rx[None, :, None, :], positions_from_rows(rows)[2][:, None])
+    ok = np.isfinite(delays["iono"])
+    assert ok.any() and (el[ok] >= 10.0).all()
+    assert (el[~ok & np.isfinite(el)] < 10.0).all()
+    assert np.isnan(delays["tropo"][~ok]).all()
+    np.testing.assert_allclose(delays["elevation"][ok], el[ok], atol=1e-9)
+    np.testing.assert_allclose(delays["azimuth"][ok], az[ok], atol=1e-9)
+
+
+def test_main_over_several_position_chunks(tmp_path, monkeypatch):
+    nav_file = os.path.join(DATA, "brdc0680.20n")
+    _, nav_data = read_nav(nav_file)
+    table = ephemeris_table(nav_data)
+    tow = np.arange(0.0, 3600.0, 300.0)
+    chunks = list(iter_position_table(table, tow, chunk_epochs=5))
+    assert len(chunks) == 3
+    for _, codes, _ in chunks:
+        np.testing.assert_array_equal(codes, sv_code(np.unique(table["sv"])))
+    np.testing.assert_array_equal(
+        np.concatenate([c[2] for c in chunks]),
+        position_cube(table, tow, np.unique(table["sv"])),
+    )
+
+    monkeypatch.chdir(tmp_path)
+    argv = ["--file", nav_file, "--interval", "3600", "--step", "60"]
+    assert main(argv + ["--chunk_epochs", "5", "--out"]) == 0
+    rows = np.loadtxt(tmp_path / "results" / "brdc0680_atmosphere.csv", delimiter=",")
+    assert len(np.unique(rows[:, 0])) > 5
+    assert set(rows[:, 3]) <= set(sv_code(np.unique(table["sv"])))
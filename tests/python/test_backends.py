@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+import backends
+from ecef_to_lla import ecef_to_lla
+from find_eph import ephemeris_table, find_eph_batch, gather_eph
+from gps_time import gps_time
+from julday import julday
+from readrinex import readrinex
+from satpos import satpos_batch
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+@pytest.fixture(autouse=True)
+def automatic_selection():
+    backends.set_backend(None)
+    yield
+    backends.set_backend(None)
+
+
+@pytest.fixture(scope="module")
+def orbit_inputs():
+    table = ephemeris_table(readrinex(os.path.join(DATA, "brdc0680.20n")))
+    tow = np.arange(0.0, 86400.0, 60.0)
+    sv = np.unique(table["sv"])
+    eph = gather_eph(table, find_eph_batch(table, sv[None, :], tow[:, None]))
+    return tow[:, None], eph
+
+
+@pytest.mark.parametrize("backend", backends.available("satpos"))
+def test_every_backend_matches_numpy(backend, orbit_inputs):
+    t, eph = orbit_inputs
+    backends.set_backend("numpy")
+    xyz = satpos_batch(t, eph)
+    lla = ecef_to_lla(xyz[..., 0], xyz[..., 1], xyz[..., 2])
+    jd = julday(2020, 3, 8, np.linspace(0.0, 24.0, 5000, endpoint=False))
+    week, sow = gps_time(jd)
+
+    backends.set_backend(backend)
+    np.testing.assert_allclose(satpos_batch(t, eph), xyz, atol=1e-3)
+    for got, expected in zip(
+        ecef_to_lla(xyz[..., 0], xyz[..., 1], xyz[..., 2]), lla, strict=True
+    ):
+        np.testing.assert_allclose(got, expected, atol=1e-6)
+    got_week, got_sow = gps_time(jd)
+    np.testing.assert_array_equal(got_week, week)
+    np.testing.assert_allclose(got_sow, sow, atol=1e-6)
+
+
+def test_missing_backend_falls_back_with_warning():
+    backends.set_backend("no_such_backend")
+    with pytest.warns(UserWarning, match="not available"):
+        lat, lon, alt = ecef_to_lla(np.full(5000, 7e6), np.zeros(5000), np.zeros(5000))
+    assert backends.select("ecef_to_lla") in backends.BACKENDS
+    np.testing.assert_allclose(alt, 7e6 - 6378137.0)
+
+
+def test_failing_backend_falls_back_and_small_inputs_use_numpy():
+    calls = []
+
+    @backends.register("test_kernel", "numpy")
+    def numpy_kernel(x):
+        calls.append("numpy")
+        return x + 1
+
+    @backends.register("test_kernel", "numexpr")
+    def broken_kernel(x):
+        calls.append("numexpr")
+        raise RuntimeError("kernel compilation failed")
+
+    backends.set_backend("numexpr")
+    assert backends.dispatch("test_kernel", 1, size=1) == 2
+    assert calls == ["numpy"]
+    with pytest.warns(UserWarning, match="falling back"):
+        assert backends.dispatch("test_kernel", 1, size=10**6) == 2
+    assert backends.select("test_kernel") == "numpy"
+    assert calls == ["numpy", "numexpr", "numpy"]
+
+
+@pytest.mark.skipif(
+    "numba" not in backends.available("gps_time"), reason="numba not installed"
+)
+def test_numba_first_launched_from_a_thread_lets_the_process_exit():
+    code = (
+        "import sys, threading; sys.path.insert(0, 'python'); import numpy as np; "
+        "import backends, gps_time; backends.set_backend('numba'); "
+        "t = threading.Thread(target=gps_time.gps_time, args=(np.ones(10**4),)); "
+        "t.start(); t.join()"
+    )
+    root = os.path.join(os.path.dirname(__file__), "..", "..")
+    subprocess.run([sys.executable, "-c", code], cwd=root, timeout=60, check=True)
@@ -0,0 +1,81 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from checkpoint import Journal, run_checkpointed, verify_run
+from rinexnav import compute_svpos
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+NAV_FILES = [os.path.join(DATA, "brdc0680.20n"), os.path.join(DATA, "brdc1530.19n")]
+
+
+def test_resume_after_crash_skips_completed_units(tmp_path):
+    run_dir = str(tmp_path / "run")
+    calls = []
+    crash = [True]
+
+    def crashing(nav_data, times, max_prn):
+        if crash[0] and len(calls) == 5:
+            raise RuntimeError("simulated crash")
+        calls.append(times[0, 1])
+        return compute_svpos(nav_data, times, max_prn)
+
+    with pytest.raises(RuntimeError):
+        run_checkpointed(NAV_FILES, 1800, run_dir, str(tmp_path / "a"), 8, 32, crashing)
+    assert len(Journal(run_dir).units) == 5
+
+    calls.clear()
+    crash[0] = False
+    summary = run_checkpointed(
+        NAV_FILES, 1800, run_dir, str(tmp_path / "a"), 8, 32, crashing
+    )
+    assert summary["skipped"] == 5
+    assert summary["computed"] == len(calls) == 7
+
+    # Merged output equals an uninterrupted run
+    fresh = run_checkpointed(
+        NAV_FILES, 1800, str(tmp_path / "fresh"), str(tmp_path / "b"), 8
+    )
+    for resumed, expected in zip(summary["merged"], fresh["merged"], strict=True):
+        with open(resumed) as f, open(expected) as g:
+            assert f.read() == g.read()
+
+
+def test_verify_detects_and_rerun_repairs_damaged_part(tmp_path):
+    run_dir = str(tmp_path / "run")
+    out_dir = str(tmp_path / "out")
+    run_checkpointed(NAV_FILES[:1], 3600, run_dir, out_dir, 6)
+    assert verify_run(run_dir) == {}
+
+    entry = next(iter(Journal(run_dir).units.values()))
+    with open(os.path.join(run_dir, entry["part"]), "r+b") as f:
+        f.seek(-8, os.SEEK_END)
+        f.write(b"\x00" * 8)
+    assert verify_run(run_dir) == {entry["unit"]: "checksum mismatch"}
+
+    summary = run_checkpointed(NAV_FILES[:1], 3600, run_dir, out_dir, 6)
+    assert summary["computed"] == 1
+    assert verify_run(run_dir) == {}
+
+    with pytest.raises(ValueError):
+        run_checkpointed(NAV_FILES[:1], 900, run_dir, out_dir, 6)
+
+
+def test_replaced_file_with_the_same_name_is_recomputed(tmp_path):
+    nav_file = str(tmp_path / "brdc.nav")
+    run_dir, out_dir = str(tmp_path / "run"), str(tmp_path / "out")
+    shutil.copy(NAV_FILES[0], nav_file)
+    run_checkpointed([nav_file], 3600, run_dir, out_dir, 6)
+
+    shutil.copy(NAV_FILES[1], nav_file)
+    summary = run_checkpointed([nav_file], 3600, run_dir, out_dir, 6)
+    assert summary["skipped"] == 0 and summary["computed"] == 4
+    assert verify_run(run_dir) == {}
+
+    fresh = run_checkpointed([NAV_FILES[1]], 3600, str(tmp_path / "fresh"), out_dir, 6)
+    for resumed, expected in zip(summary["merged"], fresh["merged"], strict=True):
+        with open(resumed) as f, open(expected) as g:
+            assert f.read() == g.read()
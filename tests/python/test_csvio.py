@@ -0,0 +1,57 @@
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from csvio import base_name, load_rows, open_text, write_ecef, write_lla
+from ecef_to_lla import ecef_to_lla
+from gps_time import gps_time_to_datetime_iso
+
+
+@pytest.fixture
+def svpos():
+    rng = np.random.default_rng(0)
+    rows = np.column_stack(
+        [
+            np.repeat(np.arange(0.0, 600.0, 30.0) + 86400.0, 8),
+            np.tile(np.arange(1, 9), 20),
+            rng.uniform(-2.6e7, 2.6e7, (160, 3)),
+        ]
+    )
+    rows[::7, 2:] = np.nan
+    return rows
+
+
+def test_bulk_text_matches_the_per_row_writers(svpos):
+    f = io.StringIO()
+    write_ecef(f, svpos, chunk_rows=50)
+    expected = io.StringIO()
+    np.savetxt(expected, svpos, delimiter=",", fmt="%.10f")
+    assert f.getvalue() == expected.getvalue()
+
+    f = io.StringIO()
+    write_lla(f, svpos, 2020, 3, 8, chunk_rows=50)
+    lat, lon, alt = ecef_to_lla(svpos[:, 2], svpos[:, 3], svpos[:, 4])
+    lines = []
+    for row, la, lo, al in zip(svpos, lat, lon, alt, strict=True):
+        date = gps_time_to_datetime_iso(row[0], 2020, 3, 8)
+        if np.isnan(row[2]):
+            lines.append(f"{int(row[1])},,,,{date}\n")
+        else:
+            lines.append(f"{int(row[1])},{la:.10f},{lo:.10f},{al:.10f},{date}\n")
+    assert f.getvalue() == "".join(lines)
+    assert lines[0].endswith(",2020-03-09T00:00:00Z\n")
+
+
+@pytest.mark.parametrize("suffix", ["", ".gz", ".zst"])
+def test_compressed_files_read_back_transparently(svpos, tmp_path, suffix):
+    if suffix == ".zst":
+        pytest.importorskip("zstandard")
+    filename = tmp_path / f"brdc0680.csv{suffix}"
+    with open_text(filename, "w") as f:
+        write_ecef(f, svpos)
+    np.testing.assert_allclose(load_rows(filename), svpos, rtol=0, atol=1e-9)
+    assert base_name(filename) == "brdc0680"
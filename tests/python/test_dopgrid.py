@@ -0,0 +1,34 @@
+import os
+import sys
+
+import georinex as gr
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from dopgrid import dop_grid
+from ecef_to_lla import lla_to_ecef
+from find_eph import ephemeris_table
+from positions import position_cube
+from spp import simulate_pseudoranges, solve_spp
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+def test_dop_grid_blocks_and_spp_agree():
+    table = ephemeris_table(gr.load(os.path.join(DATA, "chur1610.19n")))
+    tow = np.arange(86400.0, 90000.0, 600.0)
+    sv = np.unique(table["sv"])
+    cube = position_cube(table, tow, sv)
+    lats = np.array([-30.0, 0.0, 46.0])
+    lons = np.array([-120.0, 9.0])
+
+    whole = dop_grid(cube, lats, lons, max_memory_mb=100)
+    blocked = dop_grid(cube, lats, lons, max_memory_mb=0.001)
+    np.testing.assert_array_equal(whole, blocked)
+    assert whole.shape == (4, len(tow), 3, 2)
+
+    # Same geometry as a position solution at one of the grid cells
+    rx_xyz = np.array(lla_to_ecef(46.0, 9.0, 0.0))
+    pseudorange = simulate_pseudoranges(table, tow, sv, rx_xyz, clock_bias=0.0)
+    sol = solve_spp(tow, sv, pseudorange, table)
+    np.testing.assert_allclose(whole[1, :, 2, 1], sol["PDOP"], rtol=1e-3)
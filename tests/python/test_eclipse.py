@@ -0,0 +1,121 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from eclipse import (
+    AU,
+    PENUMBRA,
+    SUNLIT,
+    UMBRA,
+    beta_angle,
+    eclipse_events,
+    satellite_states,
+    shadow_fraction,
+    shadow_state,
+    sun_position,
+    write_eclipse_table,
+)
+from ephstore import WEEK, EphemerisStore
+from gps_time import gps_time_from_calendar
+from gpsweekcal import gpsweekcal
+from satpos import omegae_dot
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+PRN = np.arange(1, 33)
+
+
+@pytest.fixture(scope="module")
+def day(tmp_path_factory):
+    store = EphemerisStore(str(tmp_path_factory.mktemp("store")))
+    store.add([os.path.join(DATA, "brdc0680.20n")])
+    mytime = gpsweekcal([2020, 3, 8], 30)
+    return store, mytime[:, 0] * WEEK + mytime[:, 1]
+
+
+def test_sun_at_equinox_and_solstice():
+    # 2020-03-20 03:50 UTC equinox and 2019-06-21 15:54 UTC solstice
+    week, sow = gps_time_from_calendar(2020, 3, 20, 3, 50, 18)
+    sun = sun_position(week, sow)
+    r = np.linalg.norm(sun)
+    assert abs(np.degrees(np.arcsin(sun[2] / r))) < 0.05
+    # Subsolar longitude: noon where UTC + lon / 15 + equation of time = 12 h
+    assert np.degrees(np.arctan2(sun[1], sun[0])) == pytest.approx(124.4, abs=0.3)
+    assert r / AU == pytest.approx(0.9959, abs=1e-3)
+
+    week, sow = gps_time_from_calendar(2019, 6, 21, 15, 54, 18)
+    sun = sun_position(week, sow)
+    declination = np.degrees(np.arcsin(sun[2] / np.linalg.norm(sun)))
+    assert declination == pytest.approx(23.437, abs=0.01)
+
+
+def test_shadow_fraction_across_the_shadow_edge():
+    sun = np.array([AU, 0.0, 0.0])
+    r = 26560e3
+    # Angle from the anti-Sun direction in the plane of the Sun
+    angle = np.radians(np.linspace(0.0, 40.0, 4001))
+    sat = r * np.column_stack([-np.cos(angle), np.sin(angle), np.zeros_like(angle)])
+    fraction = shadow_fraction(sat, sun)
+    state = shadow_state(fraction)
+    assert fraction[0] == 0.0 and fraction[-1] == 1.0
+    assert np.all(np.diff(fraction) >= 0)
+    assert set(np.unique(state)) == {SUNLIT, PENUMBRA, UMBRA}
+    # The penumbra spans about the Sun's apparent diameter of orbit angle
+    width = np.ptp(np.degrees(angle[state == PENUMBRA]))
+    assert width == pytest.approx(np.degrees(2 * 696000e3 / AU), rel=0.05)
+    assert shadow_state(np.array(np.nan)) == -1
+
+
+def test_beta_matches_inertial_orbit_normal(day):
+    store, t = day
+    t = t[::120]
+    pos, vel = satellite_states(store, t[:, None], PRN[None, :])
+    beta = beta_angle(pos, vel, sun_position(0, t)[:, None, :])
+
+    # Orbit normal from two positions a minute apart in the frame of t
+    later, _ = satellite_states(store, t[:, None] + 60.0, PRN[None, :])
+    angle = omegae_dot * 60.0
+    rotated = later.copy()
+    rotated[..., 0] = np.cos(angle) * later[..., 0] - np.sin(angle) * later[..., 1]
+    rotated[..., 1] = np.sin(angle) * later[..., 0] + np.cos(angle) * later[..., 1]
+    normal = np.cross(pos, rotated)
+    normal /= np.linalg.norm(normal, axis=-1, keepdims=True)
+    sun = sun_position(0, t)[:, None, :]
+    sun = sun / np.linalg.norm(sun, axis=-1, keepdims=True)
+    expected = np.degrees(np.arcsin(np.sum(normal * sun, axis=-1)))
+    np.testing.assert_allclose(beta, expected, atol=0.01)
+
+
+def test_eclipse_events(day, tmp_path):
+    store, t = day
+    events, stats = eclipse_events(store, t, PRN, chunk_epochs=2880, tol=0.1)
+    chunked, _ = eclipse_events(store, t, PRN, chunk_epochs=100, tol=0.1)
+    for name in events:
+        np.testing.assert_array_equal(events[name], chunked[name])
+
+    # Only satellites whose orbit sees the Sun at a low beta angle enter shadow
+    low = np.abs(stats["beta_range"]).min(axis=1) < 13.0
+    high = np.abs(stats["beta_range"]).min(axis=1) > 14.5
+    assert set(PRN[low]) <= set(events["sv"])
+    assert not set(PRN[high]) & set(events["sv"])
+    assert np.all(events["duration"] < 60 * 60)
+    assert np.all(events["umbra_duration"] <= events["duration"])
+
+    # Refined edges: sunlit just before a full entry, shadowed just after
+    inner = (events["start"] > t[0]) & (events["end"] < t[-1])
+    sv = events["sv"][inner]
+    for offset, sunlit in ((-0.2, True), (0.2, False)):
+        for edge in (events["start"][inner] + offset, events["end"][inner] - offset):
+            pos, _ = satellite_states(store, edge, sv)
+            fraction = shadow_fraction(pos, sun_position(0, edge))
+            assert np.all((fraction == 1.0) == sunlit)
+
+    filename = str(tmp_path / "eclipses.csv")
+    write_eclipse_table(filename, events)
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == "sv,start,end,duration,umbra_start,umbra_end,umbra_duration,beta"
+    assert len(lines) == len(events["sv"]) + 1
+    assert lines[1].startswith(f"G{events['sv'][0]:02d},2020-03-0")
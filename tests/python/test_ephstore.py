@@ -0,0 +1,79 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from ephstore import DAY, WEEK, EphemerisStore
+from find_eph import ephemeris_table
+from positions import position_cube
+from readrinex import readrinex
+from synthnav import generate_nav
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+PRN = np.arange(1, 33)
+
+
+@pytest.fixture(scope="module")
+def days(tmp_path_factory):
+    """Three synthetic days; the last two lack their records before 02:00"""
+    root = tmp_path_factory.mktemp("nav")
+    files = []
+    for k in range(3):
+        filename = str(root / f"day{k}.20n")
+        generate_nav(
+            os.path.join(DATA, "brdc0680.20n"), filename, start=[2020, 3, 8 + k]
+        )
+        if k:
+            with open(filename) as f:
+                lines = f.readlines()
+            head = next(i for i, line in enumerate(lines) if "END OF HEADER" in line)
+            records = [lines[i : i + 8] for i in range(head + 1, len(lines), 8)]
+            late = [line for r in records if int(r[0][12:14]) >= 2 for line in r]
+            with open(filename, "w") as f:
+                f.writelines(lines[: head + 1] + late)
+        files.append(filename)
+    return files
+
+
+def _single(filename, t):
+    return position_cube(ephemeris_table(readrinex(filename)), t % WEEK, PRN)
+
+
+def test_early_epochs_use_the_previous_day(days, tmp_path):
+    store = EphemerisStore(str(tmp_path / "store")).add(days)
+    day1 = store.days[1] * DAY
+    early = day1 + np.arange(0.0, 7200.0, 60.0)
+    late = day1 + np.arange(7200.0, DAY, 600.0)
+
+    # Before 02:00 the best records are the 22:00 ones of the day before
+    np.testing.assert_allclose(
+        store.positions(early, PRN), _single(days[0], early), atol=1e-6
+    )
+    assert np.abs(store.positions(early, PRN) - _single(days[1], early)).max() > 100
+    np.testing.assert_allclose(
+        store.positions(late, PRN), _single(days[1], late), atol=1e-6
+    )
+    # The first day has no earlier file: same as its single-file run
+    first = store.days[0] * DAY + np.arange(0.0, DAY, 600.0)
+    np.testing.assert_allclose(
+        store.positions(first, PRN), _single(days[0], first), atol=1e-6
+    )
+
+    index, row = store.lookup(np.array(["G05", "E11", "G33"]), day1)
+    assert index[0] == 0 and (index[1:] == -1).all() and (row[1:] == -1).all()
+
+
+def test_store_persists_and_evicts(days, tmp_path):
+    root = str(tmp_path / "store")
+    t = np.arange(0.0, 3 * DAY, 900.0)
+    first = EphemerisStore(root).add(days)
+    t += first.days[0] * DAY
+    expected = first.positions(t, PRN)
+    assert first.stats["parsed"] == 3
+
+    again = EphemerisStore(root, max_days=1).add(days)
+    np.testing.assert_array_equal(again.positions(t, PRN), expected)
+    assert again.stats["parsed"] == 0
+    assert again.stats["evicted"] > 0 and len(again._mapped) == 1
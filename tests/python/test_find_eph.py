@@ -0,0 +1,30 @@
+import os
+import sys
+
+import georinex as gr
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from find_eph import ephemeris_table, find_eph, find_eph_batch, gather_eph
+from satpos import satpos, satpos_batch
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+def test_batch_matches_scalar():
+    nav_data = gr.load(os.path.join(DATA, "chur1610.19n"))
+    table = ephemeris_table(nav_data)
+    times = np.array([0.0, 86400.0, 100000.0, 130000.0, 172785.0])
+    svs = np.arange(1, 33)
+
+    index = find_eph_batch(table, svs[None, :], times[:, None])
+    positions = satpos_batch(times[:, None], gather_eph(table, index))
+
+    for i, t in enumerate(times):
+        for j, sv in enumerate(svs):
+            eph = find_eph(nav_data, sv, t)
+            if eph is None:
+                assert index[i, j] == -1
+                continue
+            assert table["Toe"][index[i, j]] == float(eph["Toe"])
+            np.testing.assert_allclose(positions[i, j], satpos(t, eph), atol=1e-3)
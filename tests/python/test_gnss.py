@@ -0,0 +1,85 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from ecef_to_lla import ecef_to_lla
+from gnss import (
+    KEPLER,
+    find_glonass,
+    glonass_propagate,
+    gnss_position_cube,
+    keplerian_batch,
+    nav_tables,
+    synthetic_tables,
+)
+from readrinex import readrinex
+from rinexnav import query_svpos
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+DAY_START = 0.0  # brdc0680.20n is a Sunday
+
+
+@pytest.fixture(scope="module")
+def tables():
+    nav = nav_tables(readrinex(os.path.join(DATA, "brdc0680.20n")))
+    return synthetic_tables(nav["kepler"], DAY_START)
+
+
+def test_beidou_geo_is_geostationary():
+    gm, we, _ = KEPLER["C"]
+    eph = {k: np.array([0.0]) for k in ("DeltaN", "Eccentricity", "omega", "IDOT")}
+    eph.update({k: np.array([0.0]) for k in ("Cuc", "Cus", "Crc", "Crs", "Cic", "Cis")})
+    eph.update(
+        sqrtA=np.array([(gm / we**2) ** (1 / 6)]),
+        Toe=np.array([3600.0]),
+        M0=np.array([1.0]),
+        Io=np.array([np.deg2rad(5.0)]),
+        Omega0=np.array([np.pi + we * 3600.0]),
+        OmegaDot=np.array([0.0]),
+    )
+    t = np.arange(0.0, 7200.0, 60.0)
+    xyz = keplerian_batch(t, eph, "C", geo=np.array([True]))
+    lat, lon, alt = ecef_to_lla(xyz[:, 0], xyz[:, 1], xyz[:, 2])
+    np.testing.assert_allclose(lat, 0.0, atol=1e-9)
+    assert np.ptp(lon) < 1e-6 and np.ptp(alt) < 1e-3
+
+    meo = keplerian_batch(t, eph, "C", geo=np.array([False]))
+    assert np.abs(meo[:, 2]).max() > 1e6  # the tilt is only removed for GEO
+
+
+def test_constellations_follow_their_gps_source(tables):
+    tow = np.arange(DAY_START + 3600.0, DAY_START + 80000.0, 300.0)
+    cube = gnss_position_cube(tables, tow, ["G05", "E05", "C10", "R05", "C02"])
+    gps = cube[:, 0]
+    galileo_error = np.linalg.norm(cube[:, 1] - gps, axis=-1)
+    assert np.nanmax(galileo_error) < 10.0  # only GM differs
+    # The BeiDou copy runs on BDT, 14 s behind GPS time
+    gps_bdt = gnss_position_cube(tables, tow - 14.0, ["G05"])[:, 0]
+    assert np.nanmax(np.linalg.norm(cube[:, 2] - gps_bdt, axis=-1)) < 10.0
+    glonass_error = np.linalg.norm(cube[:, 3] - gps, axis=-1)
+    assert np.nanmedian(glonass_error) < 5.0
+    assert np.isfinite(cube[:, 4]).all()
+
+
+def test_glonass_records_and_integration(tables):
+    glo = tables["glonass"]
+    i = np.flatnonzero(glo["sv"] == "R05")[3]
+    index = find_glonass(glo, ["R05", "R05", "R99"], glo["tb"][i] + [100.0, 1000.0, 0])
+    np.testing.assert_array_equal(index, [i, i + 1, -1])
+
+    pos = np.array([glo["X"][i], glo["Y"][i], glo["Z"][i]])
+    vel = np.array([glo["dX"][i], glo["dY"][i], glo["dZ"][i]])
+    dt = np.array([900.0, -900.0])
+    coarse = glonass_propagate(pos, vel, np.zeros(3), dt)
+    fine = glonass_propagate(pos, vel, np.zeros(3), dt, max_step=5.0)
+    np.testing.assert_allclose(coarse, fine, atol=0.01)
+
+
+def test_query_includes_every_constellation(tables):
+    mytime = np.column_stack([np.full(12, 2095), np.arange(0.0, 3600.0, 300.0)])
+    rows = query_svpos(tables, mytime, sv=["G05", "E05", "R05", "C01"])
+    assert set(rows[:, 1]) == {5.0, 105.0, 205.0, 301.0}
+    assert np.isfinite(rows).all()
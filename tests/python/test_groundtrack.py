@@ -0,0 +1,32 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from groundtrack import CoverageAccumulator
+
+
+def test_chunked_accumulation_matches_single_pass():
+    rng = np.random.default_rng(3)
+    direction = rng.normal(size=(40, 8, 3))
+    cube = direction / np.linalg.norm(direction, axis=-1, keepdims=True) * 26.56e6
+    cube[5, 2] = np.nan
+
+    whole = CoverageAccumulator(step=5.0, elev_mask=10.0)
+    whole.add(cube)
+    chunked = CoverageAccumulator(step=5.0, elev_mask=10.0, max_memory_mb=0.01)
+    for start in range(0, 40, 7):
+        chunked.add(cube[start : start + 7])
+
+    assert whole.positions == chunked.positions == 40 * 8 - 1
+    assert whole.density.sum() == whole.positions
+    np.testing.assert_array_equal(whole.density, chunked.density)
+    np.testing.assert_array_equal(whole.footprint, chunked.footprint)
+
+    rasters = chunked.rasters()
+    assert rasters["density"].shape == (36, 72)
+    # A GPS satellite above a 10 degree mask is seen from about 30% of Earth
+    area = np.cos(np.radians(np.arange(-87.5, 90, 5)))[:, None] * np.ones((1, 72))
+    per_satellite = np.average(rasters["footprint"], weights=area) / 8
+    assert 0.27 < per_satellite < 0.33
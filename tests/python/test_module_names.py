@@ -0,0 +1,20 @@
+import importlib.metadata
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def test_modules_do_not_shadow_packages():
+    # python/ is first on sys.path, so a module named like a package hides it:
+    # a coverage.py would break pytest-cov and the numba import
+    taken = set(sys.stdlib_module_names) | {"coverage"}
+    taken |= set(importlib.metadata.packages_distributions())
+    for name in ("requirements.txt", "requirements-test.txt"):
+        for line in (ROOT / name).read_text().splitlines():
+            match = re.match(r"[A-Za-z0-9_.-]+", line.strip())
+            if match and not line.startswith("-"):
+                taken.add(match.group().lower().replace("-", "_"))
+    modules = {path.stem for path in (ROOT / "python").glob("*.py")}
+    assert not modules & taken
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from ecef_to_lla import lla_to_ecef
+from find_eph import ephemeris_table
+from geometry import enu_matrix
+from passes import _elevation, predict_passes, scan_passes, write_pass_table
+from readrinex import readrinex
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+def test_refined_passes_match_a_fine_scan_with_fewer_evaluations(tmp_path):
+    table = ephemeris_table(readrinex(os.path.join(DATA, "brdc0680.20n")))
+    sites = np.array([[47.0, 8.0, 500.0], [-33.9, 151.2, 40.0], [0.0, -60.0, 0.0]])
+    start, stop = 0.0, 6 * 3600.0
+
+    passes, stats = predict_passes(table, sites, start, stop, coarse=600.0, tol=0.1)
+    reference, evaluations = scan_passes(table, sites, start, stop, interval=1.0)
+    for key in ("site", "sv"):
+        np.testing.assert_array_equal(passes[key], reference[key])
+    inner = (passes["rise"] > start) & (passes["set"] < stop)
+    assert inner.any()
+    np.testing.assert_allclose(passes["rise"], reference["rise"], atol=0.55)
+    np.testing.assert_allclose(passes["set"], reference["set"], atol=0.55)
+    assert stats["coarse_evaluations"] + stats["refine_evaluations"] < evaluations / 20
+
+    # Refined crossings sit on the mask
+    rx = np.column_stack(lla_to_ecef(sites[:, 0], sites[:, 1], sites[:, 2]))
+    up = enu_matrix(sites[:, 0], sites[:, 1])[:, 2, :]
+    site = passes["site"][inner]
+    for t in (passes["rise"][inner], passes["set"][inner]):
+        elevation = _elevation(table, passes["sv"][inner], t, rx[site], up[site])
+        np.testing.assert_allclose(elevation, 10.0, atol=0.01)
+    assert (passes["culmination"] >= passes["rise"]).all()
+    assert (passes["culmination"] <= passes["set"]).all()
+    assert (passes["max_elevation"] >= 10.0).all()
+
+    filename = tmp_path / "passes.csv"
+    write_pass_table(filename, passes, sites)
+    rows = np.loadtxt(filename, delimiter=",", skiprows=1, ndmin=2)
+    assert len(rows) == len(passes["rise"])
+    np.testing.assert_allclose(rows[:, 4], passes["rise"], atol=0.05)
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+import perfgate
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+def _result(ratio, memory_mb):
+    return {
+        "reference": 1e7,
+        "stages": {
+            "satpos": {
+                "items_per_s": ratio * 1e7,
+                "ratio": ratio,
+                "memory_mb": memory_mb,
+            }
+        },
+    }
+
+
+def test_compare_flags_slow_stages_and_memory_over_budget():
+    baseline = perfgate.baseline_entry(_result(0.08, 20.0))
+    assert baseline["satpos"] == {"ratio": 0.08, "memory_budget_mb": 30.0}
+
+    failures, report = perfgate.compare(_result(0.07, 25.0), baseline)
+    assert failures == []
+    assert "-12%" in report and "ok" in report
+
+    # satpos 10x slower and using twice the memory
+    failures, report = perfgate.compare(_result(0.008, 40.0), baseline)
+    assert len(failures) == 2 and "SLOW MEMORY" in report
+    assert "throughput at 10% of baseline" in failures[0]
+
+
+@pytest.mark.skipif(
+    not os.environ.get("RINEXPOS_PERF"),
+    reason="performance tier, set RINEXPOS_PERF=1 to run",
+)
+@pytest.mark.parametrize("name", perfgate.FILES)
+def test_stage_throughput_and_memory_against_baseline(name):
+    baseline = perfgate.load_baseline()["files"].get(name)
+    if baseline is None:
+        pytest.skip(f"no baseline for {name}, run python/perfgate.py --update")
+    result = perfgate.measure(os.path.join(DATA, name))
+    failures, report = perfgate.compare(result, baseline)
+    print(f"\n{name}\n{report}")
+    assert not failures, "\n".join([report, *failures])
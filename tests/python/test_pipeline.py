@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from csvio import write_lla
+from gpsweekcal import gpsweekcal
+from pipeline import Stage, run_stages
+from readrinex import readrinex
+from rinexnav import compute_svpos, run_pipeline
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+def test_parallel_stage_feeds_ordered_stage_in_source_order():
+    seen = []
+
+    def slow_square(x):
+        time.sleep(0.001 * (x % 3))
+        return x * x
+
+    stats = run_stages(
+        range(30),
+        [
+            Stage("square", slow_square, workers=4),
+            Stage("collect", seen.append, ordered=True),
+        ],
+        queue_size=2,
+    )
+
+    assert seen == [x * x for x in range(30)]
+    assert [s["stage"] for s in stats] == ["parse", "square", "collect"]
+    assert all(s["items"] == 30 for s in stats)
+    assert all(0.0 <= s["utilization"] <= 1.0 for s in stats)
+
+
+def test_stage_error_is_raised_without_deadlock():
+    def fail_on_five(x):
+        if x == 5:
+            raise RuntimeError("bad item")
+        return x
+
+    with pytest.raises(RuntimeError, match="bad item"):
+        run_stages(range(100), [Stage("check", fail_on_five, workers=2)], 1)
+
+
+def test_pipeline_matches_sequential_output(tmp_path):
+    nav_file = os.path.join(DATA, "brdc0680.20n")
+    date = [2020, 3, 8]
+    mytime = gpsweekcal(date, 1800)
+
+    svpos = compute_svpos(readrinex(nav_file), mytime)
+    seq_csv = tmp_path / "seq.csv"
+    seq_lla = tmp_path / "seq_lla.csv"
+    np.savetxt(seq_csv, svpos, delimiter=",", fmt="%.10f")
+    with open(seq_lla, "w") as f:
+        f.write("Sat,Lat,Lon,Alt,Date\n")
+        write_lla(f, svpos, *date)
+
+    pipe_csv = tmp_path / "pipe.csv"
+    pipe_lla = tmp_path / "pipe_lla.csv"
+    stats, counts = run_pipeline(
+        nav_file, mytime, date, pipe_csv, pipe_lla, workers=3, chunk_epochs=5
+    )
+
+    assert pipe_csv.read_text() == seq_csv.read_text()
+    assert pipe_lla.read_text() == seq_lla.read_text()
+    assert counts["positions"] == len(svpos)
+    assert stats[1]["items"] == 10
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from find_eph import ephemeris_table, find_eph_batch, gather_eph
+from postable import PositionTable, interpolation_error
+from readrinex import readrinex
+from satpos import satpos_batch
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+@pytest.fixture(scope="module")
+def table():
+    return ephemeris_table(readrinex(os.path.join(DATA, "brdc0680.20n")))
+
+
+def test_interpolation_matches_satpos_on_one_ephemeris(table):
+    sv = np.unique(table["sv"])
+    eph = gather_eph(table, find_eph_batch(table, sv[None, :], np.full((1, 1), 7e3)))
+    nodes = np.arange(0.0, 14400.0, 300.0)[:, None]
+    vel = satpos_batch(nodes + 0.5, eph, "exact") - satpos_batch(
+        nodes - 0.5, eph, "exact"
+    )
+    states = np.concatenate([satpos_batch(nodes, eph, "exact"), vel], axis=-1)
+    ptable = PositionTable(0.0, 300.0, sv, states)
+    t = np.arange(3600.0, 10800.0, 0.7)
+    exact = satpos_batch(t[:, None], eph, "exact")
+
+    np.testing.assert_allclose(ptable.interpolate(t), exact, atol=1e-4)
+    np.testing.assert_allclose(ptable.interpolate(t, "hermite"), exact, atol=1.0)
+    np.testing.assert_array_equal(ptable.interpolate(nodes[:, 0]), states[..., :3])
+    with pytest.raises(ValueError):
+        ptable.interpolate([14400.0])
+
+
+def test_saved_table_is_memory_mapped(table, tmp_path):
+    sv = np.unique(table["sv"])
+    built = PositionTable.build(table, sv, 0.0, 7200.0)
+    built.save(str(tmp_path / "table"))
+    ptable = PositionTable.open(str(tmp_path / "table"))
+
+    assert isinstance(ptable.states, np.memmap)
+    assert ptable.step == 300.0 and list(ptable.sv) == list(sv)
+    t = np.linspace(0.0, 7200.0, 500)
+    np.testing.assert_array_equal(ptable.interpolate(t), built.interpolate(t))
+    error = interpolation_error(ptable, table, t)
+    assert error["median_m"] < 1e-3 and error["max_m"] < 10.0
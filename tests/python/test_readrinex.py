@@ -1,10 +1,23 @@
+import gzip
+import io
 import os
+import shutil
 import sys
 import unittest
 from unittest.mock import MagicMock, patch
 
+import numpy as np
+
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
-from readrinex import get_eph, readrinex
+from readrinex import (
+    get_eph,
+    parse_nav_header,
+    read_nav,
+    read_nav_header,
+    readrinex,
+)
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
 
 
 def test_readrinex_success():
@@ -31,3 +44,61 @@ def test_get_eph_specific():
     mock_data.sel.return_value.dropna.return_value = mock_data
     result = get_eph(mock_data, "G01")
     unittest.TestCase().assertIsNotNone(result)
+
+
+def test_read_nav_returns_typed_header_with_the_records():
+    header, nav_data = read_nav(os.path.join(DATA, "brdc0680.20n"))
+    assert (header.version, header.file_type, header.leap_seconds) == (2.11, "N", 18)
+    np.testing.assert_allclose(header.ion_alpha, [1.0245e-08, 0, -5.9605e-08, 0])
+    np.testing.assert_allclose(header.ion_beta, [9.0112e04, 0, -1.9661e05, 0])
+    assert header.first_epoch == np.datetime64("2020-03-08T00:00:00")
+    assert header.last_epoch == np.datetime64("2020-03-09T01:59:44")
+    assert header.date == [2020, 3, 8] and len(header.sha256) == 64
+    assert nav_data.equals(readrinex(os.path.join(DATA, "brdc0680.20n")))
+
+
+def test_header_date_uses_records_not_the_evening_before(tmp_path):
+    path = os.path.join(DATA, "chur1610.19n")
+    header = read_nav(path)[0]
+    assert header.first_epoch < np.datetime64("2019-06-10")
+    assert header.date == [2019, 6, 10] and header.ion_alpha is None
+
+    gz = tmp_path / "chur1610.19n.gz"
+    with open(path, "rb") as f, gzip.open(gz, "wb") as out:
+        shutil.copyfileobj(f, out)
+    assert read_nav_header(str(gz)).date == [2019, 6, 10]
+    assert read_nav(str(gz))[0].sha256 == header.sha256
+
+
+def test_header_only_date_skips_a_record_from_the_evening_before(tmp_path):
+    with open(os.path.join(DATA, "brdc0680.20n")) as f:
+        lines = f.read().splitlines(keepends=True)
+    end = next(i for i, line in enumerate(lines) if "END OF HEADER" in line) + 1
+    record = lines[end : end + 8]
+    record[0] = " 1 20  3  7 23 59 44.0" + record[0][22:]
+    path = tmp_path / "brdc0680.20n"
+    path.write_text("".join(lines[:end] + record + lines[end:]))
+    header = read_nav(str(path))[0]
+    assert header.first_epoch == np.datetime64("2020-03-07T23:59:44")
+
+    # gzip is recognized by its magic bytes, not the suffix
+    packed = tmp_path / "brdc0680.20n.Z"
+    packed.write_bytes(gzip.compress(path.read_bytes()))
+    for file in (path, packed):
+        only = read_nav_header(str(file))
+        assert only.date == header.date == [2020, 3, 8]
+        assert only.first_epoch == header.first_epoch
+        assert only.last_epoch == header.last_epoch
+
+
+def test_rinex3_header_fields():
+    text = (
+        "     3.04           N: GNSS NAV DATA    M: MIXED            RINEX VERSION / TYPE\n"
+        "GPSA   1.1176D-08  7.4506D-09 -5.9605D-08 -5.9605D-08       IONOSPHERIC CORR\n"
+        "GPSB   9.0112D+04  0.0000D+00 -1.9661D+05 -6.5536D+04       IONOSPHERIC CORR\n"
+        "    18    18  2185     7                                    LEAP SECONDS\n"
+        "                                                            END OF HEADER\n"
+    )
+    header = parse_nav_header(io.StringIO(text))
+    assert (header.version, header.file_type, header.leap_seconds) == (3.04, "M", 18)
+    np.testing.assert_allclose(header.ion_beta, [90112.0, 0.0, -196610.0, -65536.0])
@@ -0,0 +1,132 @@
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from readrinexobs import (
+    iter_obs_chunks,
+    load_pseudorange_store,
+    save_pseudorange_store,
+)
+
+OBS_TYPES = ["C1", "L1", "L2", "P2", "S1", "S2"]
+
+
+def header_line(text, label):
+    return f"{text:<60}{label:<20}\n"
+
+
+def write_obs_file(path, nepochs=10, sats=("G01", "G02", "R03", "G14")):
+    lines = [
+        header_line(
+            "     2.11           OBSERVATION DATA    M", "RINEX VERSION / TYPE"
+        ),
+        header_line("TEST", "MARKER NAME"),
+        header_line(
+            "  4027893.9400   307045.8000  4919475.0100", "APPROX POSITION XYZ"
+        ),
+        header_line(
+            f"{len(OBS_TYPES):6d}" + "".join(f"{t:>6}" for t in OBS_TYPES),
+            "# / TYPES OF OBSERV",
+        ),
+        header_line("    30.000", "INTERVAL"),
+        header_line("", "END OF HEADER"),
+    ]
+    for ep in range(nepochs):
+        minute, second = divmod(ep * 30, 60)
+        sat_list = "".join(f"{s:>3}" for s in sats)
+        lines.append(
+            f" 19  6 10  0 {minute:2d} {second:10.7f}  0{len(sats):3d}{sat_list}\n"
+        )
+        for k, _ in enumerate(sats):
+            values = [20000000.0 + 1000 * ep + k, 1.5e8 + ep, 1.2e8, 0.0, 45.0, 30.0]
+            fields = []
+            for i, value in enumerate(values):
+                if i == 3 and k == 1:
+                    fields.append(" " * 16)  # blank P2 for the second satellite
+                else:
+                    lli = "1" if (i == 1 and ep == 2) else " "
+                    fields.append(f"{value:14.3f}{lli}7")
+            lines.append("".join(fields[:5]) + "\n")
+            lines.append("".join(fields[5:]) + "\n")
+    with open(path, "w") as f:
+        f.writelines(lines)
+
+
+def test_chunks_and_flags(tmp_path):
+    path = tmp_path / "test1610.19o"
+    write_obs_file(path, nepochs=10)
+    chunks = list(iter_obs_chunks(str(path), chunk_epochs=4))
+
+    assert [len(c.tow) for c in chunks] == [4, 4, 2]
+    chunk = chunks[0]
+    assert list(chunk.sv) == ["G01", "G02", "G14", "R03"]
+    assert chunk.obs["C1"].shape == (4, 4)
+    assert chunk.obs["C1"][0, 1] == 20001000.0
+    assert np.isnan(chunk.obs["P2"][1]).all()
+    assert chunk.lli["L1"][:, 2].tolist() == [1, 1, 1, 1]
+    assert chunk.lli["L1"][:, 0].tolist() == [0, 0, 0, 0]
+    assert (chunk.ssi["C1"] == 7).all()
+    assert chunk.lli["C1"].dtype == np.uint8
+    np.testing.assert_allclose(np.diff(chunk.tow), 30.0)
+
+
+def test_event_records_with_blank_dates_are_skipped(tmp_path):
+    path = tmp_path / "test1610.19o"
+    write_obs_file(path, nepochs=4)
+    with open(path) as f:
+        lines = f.readlines()
+    # Flag 4 (header information) and flag 3 (new site) records after the
+    # second epoch, both with the date fields left blank
+    events = [
+        " " * 28 + "4  2\n",
+        header_line("RECEIVER RESTARTED", "COMMENT"),
+        header_line("TEST", "MARKER NAME"),
+        " " * 28 + "3  1\n",
+        header_line("TEST2", "MARKER NAME"),
+    ]
+    second_epoch = next(
+        i for i, line in enumerate(lines) if line.startswith(" 19  6 10  0  0 30")
+    )
+    lines[second_epoch + 9 : second_epoch + 9] = events
+    with open(path, "w") as f:
+        f.writelines(lines)
+
+    (chunk,) = iter_obs_chunks(str(path))
+    assert len(chunk.tow) == 4
+    np.testing.assert_allclose(np.diff(chunk.tow), 30.0)
+    assert chunk.obs["C1"][0, 3] == 20003000.0
+
+
+def test_filtering(tmp_path):
+    path = tmp_path / "test1610.19o"
+    write_obs_file(path, nepochs=10)
+    chunks = list(
+        iter_obs_chunks(
+            str(path),
+            svs=[1, "G14"],
+            tstart=datetime(2019, 6, 10, 0, 1),
+            tend=datetime(2019, 6, 10, 0, 3),
+            obs_types=["C1", "P2"],
+        )
+    )
+
+    assert len(chunks) == 1
+    chunk = chunks[0]
+    assert list(chunk.sv) == ["G01", "G14"]
+    assert len(chunk.tow) == 5
+    assert set(chunk.obs) == {"C1", "P2"}
+
+
+def test_pseudorange_store_roundtrip(tmp_path):
+    path = tmp_path / "test1610.19o"
+    write_obs_file(path, nepochs=6)
+    store = tmp_path / "store"
+    parts = save_pseudorange_store(iter_obs_chunks(str(path), chunk_epochs=4), store)
+
+    assert len(parts) == 2
+    loaded = list(load_pseudorange_store(store))
+    assert set(loaded[0].obs) == {"C1", "P2"}
+    assert loaded[1].obs["C1"].shape == (4, 2)
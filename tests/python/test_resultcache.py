@@ -0,0 +1,104 @@
+import gzip
+import os
+import shutil
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from readrinex import read_nav
+from resultcache import ResultCache, file_hash
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+def fake_positions(mytime):
+    times = mytime[:, 1].astype(float)
+    return np.column_stack(
+        [times, np.ones_like(times), times * 2, times * 3, times * 4]
+    )
+
+
+def test_partial_hit_computes_only_missing_blocks(tmp_path):
+    nav_file = tmp_path / "test0010.20n"
+    nav_file.write_text("navigation data")
+    mytime = np.column_stack([np.full(48, 2100), np.arange(0, 86400, 1800)])
+    params = {"date": [2020, 1, 1], "interval": 1800}
+    calls = []
+
+    def compute(times):
+        calls.append(len(times))
+        return fake_positions(times)
+
+    cache = ResultCache(str(tmp_path / "cache"))
+    first = cache.positions(str(nav_file), params, mytime[:10], compute)
+    second = cache.positions(str(nav_file), params, mytime, compute)
+    third = cache.positions(str(nav_file), params, mytime, compute)
+
+    assert calls == [10, 38]
+    np.testing.assert_array_equal(first, fake_positions(mytime[:10]))
+    np.testing.assert_array_equal(second, fake_positions(mytime))
+    np.testing.assert_array_equal(third, second)
+    assert cache.stats == {"hits": 1, "partial_hits": 1, "misses": 1}
+
+    # Counters and entries persist in the manifest
+    reopened = ResultCache(str(tmp_path / "cache"))
+    assert reopened.stats == cache.stats
+    assert len(reopened.manifest["entries"]) == 24
+
+
+def test_partial_blocks_of_shorter_requests_are_not_reused(tmp_path):
+    nav_file = tmp_path / "test0010.20n"
+    nav_file.write_text("navigation data")
+    mytime = np.column_stack([np.full(48, 2100), np.arange(0, 86400, 1800)])
+    params = {"date": [2020, 1, 1], "interval": 1800}
+    calls = []
+
+    def compute(times):
+        calls.append(len(times))
+        return fake_positions(times)
+
+    cache = ResultCache(str(tmp_path / "cache"))
+    cache.positions(str(nav_file), params, mytime[:9], compute)
+    full = cache.positions(str(nav_file), params, mytime, compute)
+    np.testing.assert_array_equal(full, fake_positions(mytime))
+    assert calls == [9, 40]  # the half-filled 4th hour is computed again
+
+    # A request starting off the hour reuses only its complete hours
+    shifted = cache.positions(str(nav_file), params, mytime[3:20], compute)
+    np.testing.assert_array_equal(shifted, fake_positions(mytime[3:20]))
+    assert calls[2:] == [1]  # only 01:30 of the partial 2nd hour
+
+
+def test_products_and_lru_eviction(tmp_path):
+    nav_file = tmp_path / "test0010.20n"
+    nav_file.write_text("navigation data")
+    product = tmp_path / "out.csv"
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1500)
+
+    keys = []
+    for interval in (15, 30, 60):
+        product.write_text("x" * 600)
+        key = cache.request_key(str(nav_file), {"interval": interval})
+        cache.put_products(key, [str(product)])
+        keys.append(key)
+
+    assert keys[0] not in cache.manifest["entries"]
+    restored = tmp_path / "restored.csv"
+    assert not cache.get_products(keys[0], [str(restored)])
+    assert cache.get_products(keys[2], [str(restored)])
+    assert restored.read_text() == "x" * 600
+
+    # Changing the input content changes the key
+    nav_file.write_text("other navigation data")
+    assert cache.request_key(str(nav_file), {"interval": 60}) != keys[2]
+
+
+def test_file_hash_is_the_header_digest_of_plain_and_gzip_files(tmp_path):
+    path = os.path.join(DATA, "brdc0680.20n")
+    gz = tmp_path / "brdc0680.20n.gz"
+    with open(path, "rb") as f, gzip.open(gz, "wb") as out:
+        shutil.copyfileobj(f, out)
+    digest = read_nav(path)[0].sha256
+    assert file_hash(path) == file_hash(str(gz)) == digest
+    assert read_nav(str(gz))[0].sha256 == digest
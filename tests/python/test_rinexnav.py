@@ -0,0 +1,50 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from gpsweekcal import gpsweekcal
+from readrinex import readrinex
+from resultcache import ResultCache
+from rinexnav import compute_svpos, main, parse_sv, query_svpos, select_window
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+def test_query_returns_only_requested_cells():
+    nav_data = readrinex(os.path.join(DATA, "brdc0680.20n"))
+    mytime = gpsweekcal([2020, 3, 8], 60)
+    dense = compute_svpos(nav_data, mytime)
+
+    rows = query_svpos(nav_data, mytime, sv=["G01", 5, "G99"], window=(6, 7))
+    assert len(rows) == 2 * 60 and not np.isnan(rows).any()
+    assert set(rows[:, 1]) == {1.0, 5.0}
+    hours = (rows[:, 0] - mytime[0, 1]) / 3600
+    assert hours.min() == 6.0 and hours.max() < 7.0
+    expected = dense[np.isin(dense[:, 0], rows[:, 0]) & np.isin(dense[:, 1], [1, 5])]
+    np.testing.assert_allclose(rows, expected, atol=1e-6)
+
+    full = query_svpos(nav_data, mytime)
+    np.testing.assert_allclose(full, dense[~np.isnan(dense[:, 2])], atol=1e-6)
+
+
+def test_selection_helpers():
+    assert parse_sv("g01, 5,G12").tolist() == ["G01", "G05", "G12"]
+    mytime = gpsweekcal([2020, 3, 8], 900)
+    assert len(select_window(mytime, (0.5, 1))) == 2
+    assert select_window(mytime, None) is mytime
+
+
+def test_windowed_runs_reuse_cached_position_blocks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    argv = ["--file", os.path.join(DATA, "brdc0680.20n"), "--interval", "300"]
+    argv += ["--sv", "G01,G05", "--cache"]
+    main(argv)
+    main(argv + ["--window", "2,5"])
+    main(argv + ["--compress", "gz"])
+    stats = ResultCache("results/.cache").stats
+    # The window's hours and the compressed run's positions were all
+    # computed by the first full-day run
+    assert stats == {"hits": 2, "partial_hits": 0, "misses": 1}
+    assert os.path.exists("results/brdc0680.csv.gz")
@@ -0,0 +1,49 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from find_eph import ephemeris_table, find_eph_batch, gather_eph
+from readrinex import readrinex
+from satpos import kepler_fixed_point, kepler_solve, satpos_batch
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+@pytest.mark.parametrize("method", ["newton", "halley"])
+def test_kepler_solve_converges_at_high_eccentricity(method):
+    M = np.linspace(-1.0, 2 * np.pi + 1.0, 2001).reshape(23, 87)
+    ecc = np.linspace(0.0, 0.9, 87)
+    E = kepler_solve(M, ecc, 1e-14, method=method)
+
+    assert E.shape == M.shape
+    assert np.abs(E - ecc * np.sin(E) - M).max() < 1e-12
+    # The fixed-point iteration is far from converged at e = 0.9
+    E_fp = kepler_fixed_point(M, ecc)
+    assert np.abs(E_fp - ecc * np.sin(E_fp) - M).max() > 1e-3
+
+
+def test_kepler_solve_passes_nan_through():
+    E = kepler_solve(np.array([np.nan, 1.0, 6.28]), 0.02)
+    assert np.isnan(E[0])
+    assert np.all(np.isfinite(E[1:]))
+
+
+def test_precision_tiers_against_fixed_point_output():
+    table = ephemeris_table(readrinex(os.path.join(DATA, "brdc0680.20n")))
+    tow = np.arange(0.0, 86400.0, 300.0)
+    sv = np.unique(table["sv"])
+    eph = gather_eph(table, find_eph_batch(table, sv[None, :], tow[:, None]))
+
+    reference = satpos_batch(tow[:, None], eph, "fixed_point")
+    for precision, limit in [("exact", 1e-6), ("float64", 1e-4), ("float32", 100.0)]:
+        satp = satpos_batch(tow[:, None], eph, precision)
+        error = np.linalg.norm(satp - reference, axis=-1)
+        assert np.array_equal(np.isnan(error), np.isnan(reference[..., 0]))
+        assert np.nanmax(error) < limit, precision
+    assert satpos_batch(tow[:, None], eph, "float32").dtype == np.float32
+
+    with pytest.raises(ValueError):
+        satpos_batch(tow[:, None], eph, "float16")
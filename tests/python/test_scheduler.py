@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from scheduler import WorkQueue, read_manifest, run_coordinator
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+NAV_FILES = ["brdc0680.20n", "brdc1530.19n", "brdc1610.19n"]
+
+
+def write_manifest(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    lines = ["# archive backfill"] + [os.path.join(DATA, f) for f in NAV_FILES]
+    manifest.write_text("\n".join(lines) + "\n")
+    return str(manifest)
+
+
+def test_claims_are_exclusive_and_expired_leases_return(tmp_path):
+    units = read_manifest(write_manifest(tmp_path))
+    assert [u["unit"] for u in units][0] == "brdc0680_20200308"
+    queue = WorkQueue.create(
+        str(tmp_path / "queue"), units, lease_timeout=5, max_attempts=3
+    )
+
+    claimed = [queue.claim("a"), queue.claim("b"), queue.claim("c"), queue.claim("d")]
+    assert claimed[3] is None
+    assert len({u["unit"] for u in claimed[:3]}) == 3
+    assert queue.reclaim_expired() == []
+
+    leased = os.path.join(queue.queue_dir, "leased", f"{claimed[0]['unit']}.json")
+    os.utime(leased, (time.time() - 10, time.time() - 10))
+    assert queue.reclaim_expired() == [claimed[0]["unit"]]
+    assert queue.claim("e")["attempts"] == 2
+
+
+def test_local_workers_finish_archive_after_worker_loss(tmp_path):
+    manifest = write_manifest(tmp_path)
+    queue_dir = str(tmp_path / "queue")
+    out_dir = str(tmp_path / "out")
+    config = {
+        "lease_timeout": 2.0,
+        "max_attempts": 3,
+        "interval": 3600,
+        "out_dir": out_dir,
+        "compute_workers": 1,
+    }
+
+    # A worker that claimed a unit and died without renewing its lease
+    queue = WorkQueue.create(queue_dir, read_manifest(manifest), **config)
+    lost = queue.claim("lost")
+    leased = os.path.join(queue_dir, "leased", f"{lost['unit']}.json")
+    os.utime(leased, (time.time() - 60, time.time() - 60))
+
+    summary = run_coordinator(manifest, queue_dir, local_workers=3, poll=0.1, **config)
+
+    assert summary["counts"]["done"] == 3
+    assert summary["reclaimed"] == [lost["unit"]]
+    records = {r["unit"]: r for r in summary["records"]}
+    assert records[lost["unit"]]["attempts"] == 2
+    for record in records.values():
+        assert record["worker"].startswith("local")
+        assert record["elapsed_s"] > 0
+        assert record["positions"] == 24 * 32
+        assert all(os.path.exists(f) for f in record["outputs"])
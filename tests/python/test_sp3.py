@@ -0,0 +1,66 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from find_eph import ephemeris_table
+from positions import position_cube
+from readrinex import readrinex
+from sp3 import SP3Writer, broadcast_clock, read_sp3, write_sp3
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+@pytest.fixture(scope="module")
+def table():
+    return ephemeris_table(readrinex(os.path.join(DATA, "brdc0680.20n")))
+
+
+@pytest.mark.parametrize("version", ["c", "d"])
+def test_written_sp3_reads_back_into_a_position_table(table, tmp_path, version):
+    week, tow = 2096, np.arange(0.0, 7200.0, 300.0)
+    sv = np.unique(table["sv"])
+    filename = tmp_path / "orbit.sp3"
+    write_sp3(filename, table, week, tow, sv, chunk_epochs=7, version=version)
+
+    with open(filename) as f:
+        lines = f.read().splitlines()
+    assert lines[0].startswith(f"#{version}P2020  3  8  0  0  0.00000000      24")
+    assert lines[-1] == "EOF"
+    assert sum(line.startswith("*") for line in lines) == len(tow)
+
+    ptable, clock, got_week = read_sp3(filename)
+    assert got_week == week
+    assert (ptable.t0, ptable.step) == (0.0, 300.0)
+    np.testing.assert_array_equal(ptable.sv, sv)
+    np.testing.assert_allclose(
+        ptable.states[..., :3], position_cube(table, tow, sv), atol=5e-4
+    )
+    assert np.isnan(ptable.states[..., 3:]).all()
+    np.testing.assert_allclose(clock, broadcast_clock(table, sv, tow), atol=1e-12)
+
+    # Same query API as broadcast tables
+    t = np.array([1234.5, 3000.0, 5000.25])
+    np.testing.assert_allclose(
+        ptable.interpolate(t), position_cube(table, t, sv), atol=0.01
+    )
+
+
+def test_missing_values_and_epoch_count(tmp_path):
+    filename = tmp_path / "gaps.sp3"
+    cube = np.full((2, 2, 3), 2.0e7)
+    cube[1, 0] = np.nan
+    with SP3Writer(filename, ["E01", "E02"], 2096, 0.0, 900.0, 2, "d") as writer:
+        writer.write(np.array([0.0, 900.0]), cube)
+    ptable, clock, _ = read_sp3(filename)
+    assert np.isnan(ptable.states[1, 0, :3]).all()
+    np.testing.assert_allclose(ptable.states[0, :, :3], 2.0e7)
+    assert np.isnan(clock).all()
+    with open(filename) as f:
+        assert "%c E  cc GPS" in f.read()
+
+    with pytest.raises(ValueError, match="announced 3 epochs"):
+        with SP3Writer(tmp_path / "short.sp3", ["G01"], 2096, 0.0, 900.0, 3) as w:
+            w.write(np.array([0.0]), np.ones((1, 1, 3)))
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from spatialindex import (
+    PositionIndex,
+    brute_force_close_approaches,
+    brute_force_radius,
+)
+
+
+def random_cube(nep=50, nsv=40, seed=1):
+    rng = np.random.default_rng(seed)
+    direction = rng.normal(size=(nep, nsv, 3))
+    direction /= np.linalg.norm(direction, axis=-1, keepdims=True)
+    cube = direction * 26.56e6
+    cube[3, 5] = np.nan
+    return np.arange(nep) * 30.0, np.arange(1, nsv + 1), cube
+
+
+def test_radius_query_matches_brute_force():
+    tow, sv, cube = random_cube()
+    svpos = np.column_stack(
+        [np.repeat(tow, len(sv)), np.tile(sv, len(tow)), cube.reshape(-1, 3)]
+    )
+    index = PositionIndex.from_svpos(svpos, cell_size=3.0e6)
+    rng = np.random.default_rng(2)
+    t = rng.choice(tow, 20)
+    points = rng.normal(size=(20, 3)) * 2.0e7
+
+    query, found_sv, distance = index.query_radius(points, 8.0e6, t)
+    expected = brute_force_radius(svpos, points, 8.0e6, t)
+
+    assert sorted(zip(query.tolist(), found_sv.tolist(), strict=True)) == sorted(
+        (q, s) for q, s, _ in expected
+    )
+    assert (distance <= 8.0e6).all()
+
+
+def test_close_approaches_match_brute_force():
+    tow, sv, cube = random_cube()
+    index = PositionIndex.from_cube(tow, sv, cube, cell_size=4.0e6)
+
+    pairs = index.close_approaches(4.0e6, t0=300.0, t1=900.0)
+    epoch, a, b, _ = brute_force_close_approaches(cube, 4.0e6)
+    window = (tow[epoch] >= 300.0) & (tow[epoch] <= 900.0)
+
+    found = {
+        (t, min(x, y), max(x, y))
+        for t, x, y in zip(pairs["time"], pairs["sv_a"], pairs["sv_b"], strict=True)
+    }
+    expected = set(zip(tow[epoch[window]], sv[a[window]], sv[b[window]], strict=True))
+    assert len(found) == len(pairs["time"])
+    assert found == expected
+    assert len(found) > 0
@@ -0,0 +1,93 @@
+import os
+import sys
+
+import georinex as gr
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from ecef_to_lla import lla_to_ecef
+from find_eph import ephemeris_table, find_eph
+from satpos import satpos
+from spp import simulate_pseudoranges, solve_spp
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+C = 299792458.0
+
+
+def test_solve_spp_recovers_site():
+    table = ephemeris_table(gr.load(os.path.join(DATA, "chur1610.19n")))
+    tow = np.arange(86400.0, 90000.0, 60.0)
+    sv = np.unique(table["sv"])
+    rx_xyz = np.array(lla_to_ecef(46.87, 9.53, 600.0))
+    pseudorange = simulate_pseudoranges(table, tow, sv, rx_xyz, clock_bias=2e-4)
+    pseudorange[:, :3] = np.nan  # drop a few satellites entirely
+
+    sol = solve_spp(tow, sv, pseudorange, table)
+
+    np.testing.assert_allclose(sol["xyz"], np.tile(rx_xyz, (len(tow), 1)), atol=1e-3)
+    np.testing.assert_allclose(sol["clock_bias"], 2e-4, atol=1e-12)
+    np.testing.assert_allclose(sol["lat"], 46.87, atol=1e-8)
+    assert (sol["nsat"] >= 4).all()
+    assert (sol["PDOP"] <= sol["GDOP"]).all()
+    np.testing.assert_allclose(
+        sol["PDOP"] ** 2, sol["HDOP"] ** 2 + sol["VDOP"] ** 2, rtol=1e-9
+    )
+
+
+def reference_pseudorange(eph, t_rx, rx_xyz, clock_bias):
+    """
+    Pseudorange built without spp.py or the batch kernels: the original
+    scalar satpos, a light-time loop with the Sagnac range term and the
+    IS-GPS-200 clock polynomial written out
+    """
+    tau = 0.075
+    for _ in range(5):
+        sat = satpos(t_rx - tau, eph)
+        sagnac = 7.2921151467e-5 * (sat[0] * rx_xyz[1] - sat[1] * rx_xyz[0]) / C
+        tau = (np.linalg.norm(sat - rx_xyz) + sagnac) / C
+    t_sv = t_rx - tau
+    toc = (eph.time.values - np.datetime64("1980-01-06")) / np.timedelta64(1, "s")
+    dt = t_sv - toc % 604800
+    e, sqrt_a = float(eph.Eccentricity), float(eph.sqrtA)
+    M = float(eph.M0) + (np.sqrt(3.986005e14) / sqrt_a**3 + float(eph.DeltaN)) * (
+        t_sv - float(eph.Toe)
+    )
+    E = M
+    for _ in range(20):
+        E = M + e * np.sin(E)
+    sat_clock = (
+        float(eph.SVclockBias)
+        + float(eph.SVclockDrift) * dt
+        + float(eph.SVclockDriftRate) * dt**2
+        - 4.442807633e-10 * e * sqrt_a * np.sin(E)
+        - float(eph.TGD)
+    )
+    los = sat - rx_xyz
+    elevation = np.degrees(
+        np.arcsin(los @ rx_xyz / np.linalg.norm(los) / np.linalg.norm(rx_xyz))
+    )
+    return C * (tau + clock_bias - sat_clock), elevation
+
+
+def test_solve_spp_against_independent_pseudoranges():
+    nav = gr.load(os.path.join(DATA, "chur1610.19n"))
+    table = ephemeris_table(nav)
+    tow = np.arange(86400.0, 90000.0, 600.0)
+    sv = np.unique(table["sv"])
+    rx_xyz = np.array([4308364.6514, 723292.2115, 4632334.4185])  # near Chur
+    clock_bias = 2e-4
+
+    pseudorange = np.full((len(tow), len(sv)), np.nan)
+    for i, t_rx in enumerate(tow - clock_bias):
+        for j, s in enumerate(sv):
+            eph = find_eph(nav, str(s), t_rx)
+            if eph is not None:
+                rho, elevation = reference_pseudorange(eph, t_rx, rx_xyz, clock_bias)
+                pseudorange[i, j] = rho if elevation >= 10.0 else np.nan
+
+    sol = solve_spp(tow, sv, pseudorange, table)
+
+    # Error-free inputs: the two implementations agree to 0.1 mm; allow 1 cm
+    assert (sol["nsat"] >= 8).all()
+    np.testing.assert_allclose(sol["xyz"], np.tile(rx_xyz, (len(tow), 1)), atol=0.01)
+    np.testing.assert_allclose(sol["clock_bias"], clock_bias, atol=0.01 / C)
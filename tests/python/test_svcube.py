@@ -0,0 +1,69 @@
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from csvio import write_ecef, write_lla
+from find_eph import ephemeris_table
+from gpsweekcal import gpsweekcal
+from readrinex import readrinex
+from rinexnav import compute_svpos, query_svpos
+from svcube import PositionCube
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+
+@pytest.fixture(scope="module")
+def day():
+    table = ephemeris_table(readrinex(os.path.join(DATA, "brdc0680.20n")))
+    return table, gpsweekcal([2020, 3, 8], 300)
+
+
+def test_cube_holds_the_row_layout_in_less_memory(day):
+    table, mytime = day
+    rows = compute_svpos(table, mytime, 32)
+    cube = PositionCube.build(table, mytime, 32)
+    assert cube.tow.dtype == np.int32 and cube.sv.dtype == np.uint8
+    assert cube.mask.shape == (288, 4) and cube.week == 2096
+    np.testing.assert_array_equal(cube.rows(), rows)
+    np.testing.assert_array_equal(cube.valid.ravel(), ~np.isnan(rows[:, 2]))
+    assert len(cube) == len(rows)
+    assert cube.nbytes < 0.62 * rows.nbytes
+
+    small = PositionCube.build(table, mytime, 32, dtype="float32")
+    assert small.nbytes < 0.32 * rows.nbytes
+    np.testing.assert_allclose(small.rows(), rows, rtol=0, atol=2.0)
+
+    with pytest.raises(ValueError, match="whole seconds"):
+        PositionCube(mytime[:, 1] + 0.5, np.arange(1, 33), cube.xyz)
+
+
+def test_views_and_writers(day):
+    table, mytime = day
+    cube = PositionCube.build(table, mytime, 32)
+    part = cube.epochs(10, 20)
+    assert np.shares_memory(part.xyz, cube.xyz)
+    assert np.shares_memory(cube.track(5), cube.xyz)
+    assert all(np.shares_memory(c, cube.xyz) for c in cube.columns()[2:])
+    np.testing.assert_array_equal(part.rows(), cube.rows()[320:640])
+    with pytest.raises(KeyError):
+        cube.track(40)
+
+    # Sparse rows: the cells without a row are invalid and written empty
+    sparse = query_svpos(table, mytime[:24], ["G05", "G07", "G12"])
+    sparse = sparse[np.arange(len(sparse)) % 5 != 0]
+    holes = PositionCube.from_rows(sparse, mytime[0, 0])
+    assert (~holes.valid).sum() == len(holes) - len(sparse)
+    full = holes.rows()
+    np.testing.assert_array_equal(full[holes.valid.ravel()], sparse)
+
+    for svpos in (cube, holes):
+        rows = svpos.rows()
+        for write, args in ((write_ecef, ()), (write_lla, (2020, 3, 8))):
+            expected, got = io.StringIO(), io.StringIO()
+            write(expected, rows, *args)
+            write(got, svpos, *args)
+            assert got.getvalue() == expected.getvalue()
@@ -0,0 +1,69 @@
+import gzip
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "python"))
+from find_eph import ephemeris_table
+from positions import position_cube
+from readrinex import GPS_NAV_FIELDS, read_nav, readrinex
+from satpos import satpos_batch
+from synthnav import WEEK, generate_nav, read_template, shift_records
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+TEMPLATE = os.path.join(DATA, "brdc0680.20n")
+
+
+def test_generated_day_reproduces_the_template_and_is_seeded(tmp_path):
+    first, again = tmp_path / "a.20n", tmp_path / "b.20n"
+    stats = generate_nav(TEMPLATE, first, update=900, shuffle=0.05, seed=3)
+    generate_nav(TEMPLATE, again, update=900, shuffle=0.05, seed=3)
+    assert first.read_bytes() == again.read_bytes()
+    assert stats["records"] == 96 * 32
+    generate_nav(TEMPLATE, again, update=900, shuffle=0.05, seed=4)
+    assert first.read_bytes() != again.read_bytes()
+
+    header, nav_data = read_nav(str(first))
+    assert header.version == 2.11 and header.leap_seconds == 18
+    assert header.date == [2020, 3, 8]
+    assert nav_data.sizes["time"] == 96
+    synthetic = ephemeris_table(nav_data)
+    template = ephemeris_table(readrinex(TEMPLATE))
+    sv = np.unique(template["sv"])
+    tow = np.arange(0.0, 86400.0, 60.0)
+    np.testing.assert_allclose(
+        position_cube(synthetic, tow, sv), position_cube(template, tow, sv), atol=1e-3
+    )
+
+
+def test_duplicates_and_gzip(tmp_path):
+    plain, packed = tmp_path / "a.20n", tmp_path / "a.20n.gz"
+    stats = generate_nav(TEMPLATE, plain, days=2, duplicates=0.1, seed=1)
+    generate_nav(TEMPLATE, packed, days=2, duplicates=0.1, seed=1)
+    assert stats["days"] == 2
+    assert stats["records"] == 2 * (12 * 32 + int(0.1 * 12 * 32))
+    with gzip.open(packed, "rb") as f:
+        assert f.read() == plain.read_bytes()
+    assert packed.stat().st_size < plain.stat().st_size / 3
+    # Same seed, same bytes: the header's MTIME field (bytes 4-8) is zero
+    assert packed.read_bytes()[4:8] == bytes(4)
+
+    stats = generate_nav(TEMPLATE, plain, size_mb=1.0)
+    assert stats["bytes"] >= 1e6 and stats["days"] == 5
+
+
+def test_shift_across_a_gps_week_keeps_the_orbit():
+    _, prn, toc, values = read_template(TEMPLATE)
+    dt = np.full(len(toc), -43200.0)  # Sunday 2020-03-08 -> previous week
+    shifted = shift_records(values, toc, dt)
+    assert (shifted[:, GPS_NAV_FIELDS.index("GPSWeek")] == 2095).any()
+
+    def positions(records, t_abs):
+        eph = {name: records[:, k] for k, name in enumerate(GPS_NAV_FIELDS)}
+        return satpos_batch(t_abs - eph["GPSWeek"] * WEEK, eph)
+
+    t_abs = toc + dt + 1800.0
+    np.testing.assert_allclose(
+        positions(shifted, t_abs), positions(values, t_abs), atol=1e-3
+    )